@@ -0,0 +1,771 @@
+"""Performance benchmarks for the DCA backend.
+
+Usage:
+    python benchmark.py fit [--wells 2000] [--months 120] [--model hyperbolic] [--workers 8]
+    python benchmark.py sync [--wells 2000] [--months 120]
+    python benchmark.py stats [--wells 20000] [--months 120]
+    python benchmark.py views [--wells 20000] [--months 120] [--pages 20]
+    python benchmark.py payload [--wells 200] [--months 360] [--max-points N]
+    python benchmark.py upload [--mb 256] [--chunk-mb 5] [--parallel 4] [--latency-ms 50]
+    python benchmark.py ingest [--wells 5000] [--months 240] [--chunk-mb 5] [--latency-ms 50]
+    python benchmark.py dates [--wells 20000] [--months 120]
+    python benchmark.py native [--wells 20000] [--months 120]
+    python benchmark.py excel [--wells 800] [--months 120] [--sheets 8]
+    python benchmark.py derived [--wells 20000] [--months 120] [--extra-columns 20]
+    python benchmark.py eur [--wells 20000] [--years 50]
+    python benchmark.py export [--wells 5000] [--months 120]
+    python benchmark.py jobs [--wells 5000] [--months 120]
+    python benchmark.py edits [--wells 2000] [--months 120] [--cells 10000]
+    python benchmark.py stress [--seconds 10] [--wells 200] [--threads 4] [--frame-budget-mb 1]
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import main
+
+
+def _synthetic_field(n_wells: int, months: int, seed: int = 0) -> pd.DataFrame:
+    """Build a long-format production table: one row per (well, month)."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    dates = pd.date_range("2000-01-01", periods=months, freq="MS")
+    t = (dates - dates[0]).days.values.astype(float)
+    for i in range(n_wells):
+        qi = rng.uniform(100, 5000)
+        di = rng.uniform(1e-4, 5e-3)
+        b = rng.uniform(0.1, 1.5)
+        q = main._hyperbolic(t, qi, di, b) * (1 + 0.05 * rng.standard_normal(months))
+        frames.append(pd.DataFrame({"well": f"W-{i:05d}", "date": dates, "rate": np.maximum(q, 0)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _series_legacy(df, wells):
+    """Per-well boolean mask over the whole frame (pre-batch behaviour)."""
+    out = []
+    for w in wells:
+        sub = df.loc[df["well"].astype(str) == w, ["date", "rate"]].dropna().sort_values("date")
+        t = (sub["date"] - sub["date"].min()).dt.total_seconds().values / 86400.0
+        out.append((t, sub["rate"].values.astype(float)))
+    return out
+
+
+def _series_grouped(df, wells):
+    """Group the frame once and slice every well from the groups."""
+    keys = df["well"].astype(str)
+    sel = keys.isin(wells)
+    groups = {k: g for k, g in df.loc[sel, ["date", "rate"]].groupby(keys[sel].values, sort=False)}
+    out = []
+    for w in wells:
+        sub = groups[w].dropna().sort_values("date")
+        t = (sub["date"] - sub["date"].min()).dt.total_seconds().values / 86400.0
+        out.append((t, sub["rate"].values.astype(float)))
+    return out
+
+
+def bench_fit(args):
+    df = _synthetic_field(args.wells, args.months)
+    wells = sorted(df["well"].unique().tolist())
+    print(f"{args.wells} wells x {args.months} months ({len(df):,} rows), model={args.model}")
+
+    t0 = time.perf_counter()
+    legacy = [main._fit_decline(t, q, args.model) for t, q in _series_legacy(df, wells)]
+    t1 = time.perf_counter()
+    batch = main._fit_decline_batch(_series_grouped(df, wells), args.model)
+    t2 = time.perf_counter()
+
+    worst = 0.0
+    for ref, got in zip(legacy, batch):
+        for name, val in ref.items():
+            worst = max(worst, abs(val - got[name]) / max(abs(val), 1e-6))
+    print(f"  per-well loop : {t1 - t0:8.2f} s")
+    print(f"  batched engine: {t2 - t1:8.2f} s  ({(t1 - t0) / max(t2 - t1, 1e-9):.1f}x)")
+    print(f"  max relative parameter deviation: {worst:.2e}")
+
+    if args.workers > 1:
+        main.FIT_WORKERS = args.workers
+        series = _series_grouped(df, wells)
+        main._get_fit_pool().submit(int).result()   # warm up the pool
+        t3 = time.perf_counter()
+        asyncio.run(main._fit_wells(series, args.model))
+        t4 = time.perf_counter()
+        print(f"  process pool x{args.workers}: {t4 - t3:8.2f} s  ({(t2 - t1) / max(t4 - t3, 1e-9):.1f}x vs batched)")
+
+
+def bench_sync(args):
+    """Monthly re-sync of the full history followed by a field-wide DCA:
+    replace (re-import, every well refitted) vs append/upsert by key. One
+    well in ten reports the new month."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    history = _synthetic_field(args.wells, args.months + 1)
+    history["month"] = history.groupby("well").cumcount().astype(float)
+    reporting = history["well"].isin(history["well"].unique()[::10])
+    old = history[history["date"] < history["date"].max()]
+    history = history[(history["date"] < history["date"].max()) | reporting]
+    wells = ",".join(sorted(history["well"].unique()))
+    client = TestClient(main.app)
+    print(f"{args.wells} wells x {args.months} months ({len(old):,} rows) + {len(history) - len(old)} new rows")
+    for mode in ("replace", "append", "upsert"):
+        csv = old.to_csv(index=False).encode()
+        ds_id = client.post("/api/upload", files={"file": ("h.csv", csv, "text/csv")}).json()["dataset_id"]
+        dca = f"/api/dca?x=month&y=rate&well_col=well&wells={wells}&dataset_id={ds_id}"
+        client.get(dca)   # warm the fit cache
+        csv = history.to_csv(index=False).encode()
+        t0 = time.perf_counter()
+        r = client.post(f"/api/sync/upload?dataset_id={ds_id}&mode={mode}&key=well,date",
+                        files={"file": ("h.csv", csv, "text/csv")}).json()
+        t1 = time.perf_counter()
+        misses = client.get("/api/dca/cache").json()["misses"]
+        client.get(dca)
+        t2 = time.perf_counter()
+        refits = client.get("/api/dca/cache").json()["misses"] - misses
+        print(f"  {mode:8s}: sync {t1 - t0:6.2f} s + DCA {t2 - t1:6.2f} s  ({refits} wells refitted, "
+              f"rows={r['rows']:,}, added={r.get('rows_added', '-')}, updated={r.get('rows_updated', '-')})")
+
+
+def bench_stats(args):
+    """/api/preview/stats: first call, cached call, call after a cell edit
+    (one column recomputed) and the approximate mode."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    df = _synthetic_field(args.wells, args.months)
+    df["month"] = df.groupby("well").cumcount()
+    ds_id = "bench-stats"
+    main._datasets[ds_id] = {"status": "ready", "date_columns": ["date"], "filename": "bench.csv"}
+    main._set_frame(ds_id, df)
+    client = TestClient(main.app)
+    url = f"/api/preview/stats?dataset_id={ds_id}"
+    print(f"{len(df):,} rows x {len(df.columns)} columns")
+
+    def timed(label, path):
+        t0 = time.perf_counter()
+        r = client.get(path)
+        print(f"  {label:14s}: {time.perf_counter() - t0:8.3f} s")
+        return r.json()
+
+    exact = timed("first call", url)
+    timed("cached", url)
+    client.post(f"/api/data/update?dataset_id={ds_id}", json={"row": 0, "column": "rate", "value": "1"})
+    timed("after edit", url)
+    approx = timed("approx", url + "&approx=true")
+    for e, a in zip(exact["columns"], approx["columns"]):
+        print(f"  {e['column']:6s} unique {e['unique']:>10,} exact, {a['unique']:>10,} approx")
+
+
+def bench_views(args):
+    """Scroll a sorted, filtered preview page by page: per-page filter+sort
+    of the whole frame (previous behaviour) vs the cached view."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    df = _synthetic_field(args.wells, args.months)
+    ds_id = "bench-views"
+    main._datasets[ds_id] = {"status": "ready", "date_columns": ["date"], "filename": "bench.csv"}
+    main._set_frame(ds_id, df)
+    client = TestClient(main.app)
+    print(f"{len(df):,} rows, sort by rate, filter well contains 'w-000', {args.pages} pages")
+
+    t0 = time.perf_counter()
+    for page in range(args.pages):
+        view = df[df["well"].astype(str).str.contains("w-000", case=False, na=False)]
+        view.sort_values(by="rate", ascending=False).iloc[page * 50:(page + 1) * 50].copy()
+    t1 = time.perf_counter()
+    for page in range(args.pages):
+        r = client.get(f"/api/preview/rows?offset={page * 50}&limit=50&sort_col=rate&sort_asc=false"
+                       f"&filter_col=well&filter_val=w-000&dataset_id={ds_id}")
+        if page == 0:
+            t_first = time.perf_counter() - t1
+    t2 = time.perf_counter()
+    print(f"  per-page filter+sort: {(t1 - t0) / args.pages:8.4f} s/page")
+    print(f"  cached view         : {t_first:8.4f} s first page, "
+          f"{(t2 - t1 - t_first) / max(args.pages - 1, 1):8.4f} s/page after  ({r.json()['total']:,} rows)")
+
+
+def bench_payload(args):
+    """Multi-well /api/dca response in each format (fits are cached after
+    the first call, so this is mostly response building and encoding)."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient   # needs httpx
+
+    df = _synthetic_field(args.wells, args.months)
+    ds_id = "bench-payload"
+    main._datasets[ds_id] = {"status": "ready", "date_columns": ["date"], "filename": "bench.csv"}
+    main._set_frame(ds_id, df)
+    client = TestClient(main.app)
+    wells = ",".join(sorted(df["well"].unique()))
+    url = f"/api/dca?x=date&y=rate&well_col=well&wells={wells}&forecast_months=24&dataset_id={ds_id}"
+    payload = client.get(url).json()   # warm the fit cache
+    print(f"{args.wells} wells x {args.months} months")
+
+    t0 = time.perf_counter()
+    body = json.dumps(jsonable_encoder(payload)).encode()
+    print(f"  jsonable_encoder: {time.perf_counter() - t0:8.3f} s encode only  {len(body) / 1e6:7.2f} MB")
+    for fmt in ("json", "binary", "arrow"):
+        t0 = time.perf_counter()
+        r = client.get(url + f"&format={fmt}")
+        print(f"  {fmt:16s}: {time.perf_counter() - t0:8.3f} s request     {len(r.content) / 1e6:7.2f} MB")
+    if args.max_points:
+        print(f"max_points={args.max_points}")
+        for fmt in ("json", "binary", "arrow"):
+            t0 = time.perf_counter()
+            r = client.get(url + f"&format={fmt}&max_points={args.max_points}")
+            print(f"  {fmt:16s}: {time.perf_counter() - t0:8.3f} s request     {len(r.content) / 1e6:7.2f} MB")
+
+
+def bench_upload(args):
+    """Chunked upload throughput, one chunk at a time vs several in flight.
+    --latency-ms adds a client-side delay per request to stand in for a WAN
+    round trip; the time includes finalize, which re-checks every chunk."""
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi.testclient import TestClient   # needs httpx
+
+    data = np.random.default_rng(0).bytes(int(args.mb * 1024 * 1024))
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    client = TestClient(main.app)
+    for parallel in sorted({1, args.parallel}):
+        r = client.post("/api/upload/init", json={"filename": "bench.bin", "file_size": len(data),
+                                                  "chunk_size": chunk_size}).json()
+        ds_id = r["dataset_id"]
+
+        def send(i):
+            body = data[i * chunk_size:(i + 1) * chunk_size]
+            time.sleep(args.latency_ms / 1000)
+            url = f"/api/upload/chunk?dataset_id={ds_id}&chunk_index={i}&checksum={hashlib.sha256(body).hexdigest()}"
+            assert client.post(url, files={"file": ("chunk", body)}).status_code == 200
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(parallel) as pool:
+            list(pool.map(send, range(r["total_chunks"])))
+        assert client.post(f"/api/upload/finalize?dataset_id={ds_id}").status_code == 200
+        elapsed = time.perf_counter() - t0
+        print(f"  {parallel} in flight: {elapsed:7.2f} s  {args.mb / elapsed:8.1f} MB/s")
+
+
+def bench_ingest(args):
+    """CSV upload through to a ready dataset, parsing after finalize vs while
+    the chunks arrive (PIPELINE_CSV)."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    data = _synthetic_field(args.wells, args.months).to_csv(index=False).encode()
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    client = TestClient(main.app)
+    print(f"{len(data) / 1e6:.0f} MB CSV, {args.wells * args.months} rows")
+    for pipelined in (False, True):
+        main.PIPELINE_CSV = pipelined
+        t0 = time.perf_counter()
+        r = client.post("/api/upload/init", json={"filename": "bench.csv", "file_size": len(data),
+                                                  "chunk_size": chunk_size}).json()
+        ds_id = r["dataset_id"]
+        for i in range(r["total_chunks"]):
+            time.sleep(args.latency_ms / 1000)
+            client.post(f"/api/upload/chunk?dataset_id={ds_id}&chunk_index={i}",
+                        files={"file": ("chunk", data[i * chunk_size:(i + 1) * chunk_size])})
+        t1 = time.perf_counter()
+        client.post(f"/api/upload/finalize?dataset_id={ds_id}")
+        while main._datasets[ds_id]["status"] not in ("ready", "error"):
+            time.sleep(0.005)
+        t2 = time.perf_counter()
+        print(f"  {'pipelined' if pipelined else 'after finalize':15s}: upload {t1 - t0:6.2f} s  "
+              f"finalize -> ready {t2 - t1:6.2f} s  total {t2 - t0:6.2f} s")
+
+
+def bench_dates(args):
+    """Date column parsing and storage encoding: pd.to_datetime without a
+    format on every row vs inferred format + one parse per distinct date."""
+    import warnings
+
+    dates = _synthetic_field(args.wells, args.months)["date"]
+    text = pd.Series(dates.dt.strftime("%d.%m.%Y").to_numpy(dtype=object))
+    print(f"{len(text)} rows, {text.nunique()} distinct dates")
+
+    t0 = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        old = pd.to_datetime(text, dayfirst=True, errors="coerce")
+    t_parse_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new = main._parse_dates(text)
+    t_parse_new = time.perf_counter() - t0
+    assert (old == new).all()
+    print(f"  parse      : to_datetime {t_parse_old:7.3f} s   _parse_dates  {t_parse_new:7.3f} s")
+
+    t0 = time.perf_counter()
+    old_text = old.dt.strftime(main.PARQUET_DATE_FORMAT).fillna("")
+    t_fmt_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new_text = main._format_dates(new, main.PARQUET_DATE_FORMAT)
+    t_fmt_new = time.perf_counter() - t0
+    assert (old_text.to_numpy(dtype=object) == new_text).all()
+    print(f"  encode     : strftime    {t_fmt_old:7.3f} s   _format_dates {t_fmt_new:7.3f} s")
+
+    stored = pd.Series(new_text)
+    t0 = time.perf_counter()
+    pd.to_datetime(stored, format=main.PARQUET_DATE_FORMAT, errors="coerce")
+    t_read_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    main._parse_dates(stored, main.PARQUET_DATE_FORMAT)
+    t_read_new = time.perf_counter() - t0
+    print(f"  read back  : to_datetime {t_read_old:7.3f} s   _parse_dates  {t_read_new:7.3f} s")
+
+
+def bench_native(args):
+    """Import of the same table as CSV (streamed parse) vs Parquet (taken as
+    is), Feather and a hive-partitioned Parquet directory."""
+    import tempfile
+    from pathlib import Path
+
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    # one chunk per column, as a warehouse export would be written
+    df = pa.Table.from_pandas(_synthetic_field(args.wells, args.months), preserve_index=False) \
+        .combine_chunks().to_pandas()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        df.assign(date=df["date"].dt.strftime("%d.%m.%Y")).to_csv(tmp / "f.csv", index=False)
+        df.to_parquet(tmp / "f.parquet", index=False, row_group_size=500_000)
+        feather.write_feather(df, tmp / "f.feather")
+        pq.write_to_dataset(pa.Table.from_pandas(df.assign(year=df["date"].dt.year), preserve_index=False),
+                            str(tmp / "part"), partition_cols=["year"])
+        print(f"{len(df)} rows, CSV {(tmp / 'f.csv').stat().st_size / 1e6:.0f} MB, "
+              f"Parquet {(tmp / 'f.parquet').stat().st_size / 1e6:.0f} MB")
+        out = tmp / "data.parquet"
+        runs = [
+            ("csv", lambda: main._stream_csv_to_parquet(tmp / "f.csv", out)),
+            ("parquet", lambda: main._import_arrow_source(tmp / "f.parquet", out)),
+            ("feather", lambda: main._import_arrow_source(tmp / "f.feather", out)),
+            ("partitioned", lambda: main._import_arrow_source(tmp / "part", out)),
+        ]
+        for label, run in runs:
+            t0 = time.perf_counter()
+            rows, dates = run()
+            t1 = time.perf_counter()
+            main._DatasetHandle(out, dates).read()
+            t2 = time.perf_counter()
+            print(f"  {label:12s}: import {t1 - t0:7.3f} s   first full read {t2 - t1:7.3f} s   ({rows} rows)")
+
+
+def bench_excel(args):
+    """Workbook import: pd.read_excel (openpyxl, first sheet) vs the
+    read-only engine over every sheet, sequential and in parallel."""
+    import io
+
+    import openpyxl
+
+    df = _synthetic_field(args.wells, args.months)
+    book = openpyxl.Workbook(write_only=True)
+    for k, part in enumerate(np.array_split(np.arange(len(df)), args.sheets)):
+        sheet = book.create_sheet(f"Field {k + 1}")
+        sheet.append(list(df.columns))
+        for row in df.iloc[part].itertuples(index=False):
+            sheet.append([row.well, row.date.to_pydatetime(), row.rate])
+    buf = io.BytesIO()
+    book.save(buf)
+    data = buf.getvalue()
+    print(f"{len(data) / 1e6:.0f} MB workbook, {len(df)} rows in {args.sheets} sheets, "
+          f"calamine {'on' if main.python_calamine is not None else 'not installed'}")
+
+    t0 = time.perf_counter()
+    first = pd.read_excel(io.BytesIO(data), engine="openpyxl")
+    print(f"  {'read_excel (first sheet)':30s}: {time.perf_counter() - t0:7.2f} s  ({len(first)} rows)")
+    t0 = time.perf_counter()
+    every = pd.read_excel(io.BytesIO(data), sheet_name=None, engine="openpyxl")
+    print(f"  {'read_excel (all sheets)':30s}: {time.perf_counter() - t0:7.2f} s  "
+          f"({sum(len(f) for f in every.values())} rows)")
+    workers = main.EXCEL_WORKERS
+    for main.EXCEL_WORKERS in (1, max(workers, 2)):
+        t0 = time.perf_counter()
+        got = main._read_excel(data)
+        label = "sequential" if main.EXCEL_WORKERS == 1 else f"{main.EXCEL_WORKERS} processes"
+        print(f"  {f'_read_excel ({label})':30s}: {time.perf_counter() - t0:7.2f} s  ({len(got)} rows)")
+    main.EXCEL_WORKERS = workers
+
+
+def bench_derived(args):
+    """Derived-column replay: DataFrame.eval per column in sequence vs the
+    dependency-aware engine, for a full replay and after a one-cell edit."""
+    df = _synthetic_field(args.wells, args.months)
+    df["m"] = df.groupby("well").cumcount().astype(float)
+    for k in range(args.extra_columns):   # a realistically wide frame
+        df[f"c{k}"] = np.float64(k)
+    derived = [
+        {"name": "oil_bbl", "formula": "rate * 30.4"},
+        {"name": "cum_proxy", "formula": "oil_bbl * m"},
+        {"name": "log_rate", "formula": "log(rate)"},
+        {"name": "rate_norm", "formula": "rate / (m + 1)"},
+        {"name": "gas", "formula": "rate * 1.7 + c1"},
+        {"name": "boe", "formula": "oil_bbl + gas / 6"},
+        {"name": "boe_day", "formula": "boe / 30.4"},
+        {"name": "water", "formula": "rate * 0.4 + c2 * m"},
+        {"name": "wor", "formula": "water / rate"},
+        {"name": "net", "formula": "boe * 0.875 - water * 0.01"},
+    ]
+    main._derived_columns["bench"] = derived
+    print(f"{len(df)} rows x {df.shape[1]} columns, {len(derived)} derived columns, "
+          f"numexpr {'on' if main.numexpr is not None else 'not installed'}")
+
+    def legacy(frame):
+        for d in derived:
+            frame[d["name"]] = frame.eval(d["formula"])
+        return frame
+
+    t0 = time.perf_counter()
+    old = legacy(df.copy(deep=False))
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new, errors = main._replay_derived_columns("bench", df.copy(deep=False))
+    t_new = time.perf_counter() - t0
+    assert not errors and all(np.allclose(old[d["name"]], new[d["name"]]) for d in derived)
+    print(f"  full replay : eval per column {t_old:7.3f} s   engine {t_new:7.3f} s")
+
+    row = len(df) // 2
+    new.loc[row, "m"] = 99.0
+    old.loc[row, "m"] = 99.0
+    t0 = time.perf_counter()
+    old = legacy(old)
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new, errors = main._replay_derived_columns("bench", new, changed=["m"], rows=[row])
+    t_new = time.perf_counter() - t0
+    assert not errors and all(np.allclose(old[d["name"]], new[d["name"]]) for d in derived)
+    print(f"  cell edit   : eval per column {t_old:7.3f} s   engine {t_new:7.3f} s")
+    del main._derived_columns["bench"]
+
+
+def bench_eur(args):
+    """Field EUR to an economic limit (modified hyperbolic): monthly forecast
+    grid summed per well vs the closed-form vectorized reserves engine."""
+    rng = np.random.default_rng(0)
+    n = args.wells
+    P = np.column_stack([rng.uniform(50, 500, n), rng.uniform(0.001, 0.01, n), rng.uniform(0.1, 1.5, n)])
+    t_last = rng.uniform(365, 3650, n)
+    econ_limit, d_min = 5.0, 0.0002
+    print(f"{n} wells, econ limit {econ_limit}, terminal decline {d_min}/day, cap {args.years} years")
+
+    t0 = time.perf_counter()
+    legacy = np.empty(n)
+    for i in range(n):
+        t = t_last[i] + 30.4375 * np.arange(0, args.years * 12 + 1)
+        q = main._decline_rates("hyperbolic", P[i:i + 1], t[None, :], d_min)[0]
+        below = np.flatnonzero(q < econ_limit)
+        q = q[: below[0]] if len(below) else q
+        legacy[i] = np.trapezoid(q, t[: len(q)]) / 30.4375
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    res = main._well_reserves("hyperbolic", P, t_last, np.zeros(n), econ_limit,
+                              args.years * 365.25, d_min, rate_period=30.4375)
+    t_new = time.perf_counter() - t0
+    err = np.nanmedian(np.abs(res["remaining"] - legacy) / np.maximum(res["remaining"], 1e-9))
+    print(f"  monthly grid per well {t_old:7.3f} s   closed form {t_new:7.4f} s   "
+          f"({t_old / t_new:.0f}x, median grid error {err:.2%})")
+    print(f"  field EUR {np.nansum(res['eur']):,.0f}")
+
+
+def bench_export(args):
+    """Dataset export: the old CSV-in-a-JSON-string response vs the streamed
+    encoder. Reports time to first byte and total time, then peak Python
+    memory from a second, traced pass (tracing slows the encoders down)."""
+    import io
+    import tracemalloc
+
+    df = _synthetic_field(args.wells, args.months)
+    df["month"] = df.groupby("well").cumcount().astype(float)
+    print(f"{len(df):,} rows x {df.shape[1]} columns")
+
+    def legacy():
+        buf = io.StringIO()
+        out = df.copy()
+        out["date"] = out["date"].dt.strftime('%d.%m.%Y').fillna("")
+        out.to_csv(buf, index=False)
+        yield json.dumps({"csv": buf.getvalue()}).encode()
+
+    def streamed(fmt, compression=None):
+        return main._export_stream(main._export_frames(df, None, list(df.columns)), fmt, compression, ["date"])
+
+    cases = [("json blob (csv)", legacy), ("stream csv", lambda: streamed("csv")),
+             ("stream csv.gz", lambda: streamed("csv", "gzip")), ("stream csv.zst", lambda: streamed("csv", "zstd")),
+             ("stream parquet", lambda: streamed("parquet")), ("stream arrow", lambda: streamed("arrow"))]
+    for name, make in cases:
+        t0 = time.perf_counter()
+        first, size = None, 0
+        for chunk in make():
+            first = first or time.perf_counter() - t0
+            size += len(chunk)
+        total = time.perf_counter() - t0
+        tracemalloc.start()
+        for chunk in make():
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {name:16s}: first byte {first:6.3f} s   total {total:6.2f} s   "
+              f"{size / 2**20:7.1f} MiB   peak {peak / 2**20:7.1f} MiB")
+
+
+def bench_jobs(args):
+    """Field-wide DCA: one /api/dca call with every well in the query string
+    vs a /api/dca/jobs job streamed as NDJSON (first result, then all)."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    df = _synthetic_field(args.wells, args.months)
+    df["month"] = df.groupby("well").cumcount().astype(float)
+    csv = df.to_csv(index=False).encode()
+    with TestClient(main.app) as client:
+        print(f"{args.wells} wells x {args.months} months")
+        ds_id = client.post("/api/upload", files={"file": ("j.csv", csv, "text/csv")}).json()["dataset_id"]
+        wells = ",".join(sorted(df["well"].unique()))
+        t0 = time.perf_counter()
+        r = client.get(f"/api/dca?x=month&y=rate&well_col=well&wells={wells}&model=hyperbolic&dataset_id={ds_id}")
+        t_sync = time.perf_counter() - t0
+        print(f"  /api/dca : {t_sync:6.2f} s for everything (HTTP {r.status_code}, query {len(wells):,} chars)")
+
+        ds_id = client.post("/api/upload", files={"file": ("j.csv", csv, "text/csv")}).json()["dataset_id"]
+        t0 = time.perf_counter()
+        job = client.post(f"/api/dca/jobs?dataset_id={ds_id}",
+                          json={"x": "month", "y": "rate", "well_col": "well", "model": "hyperbolic"}).json()
+        # (the test client buffers streamed bodies, so the first batch is timed by polling)
+        while client.get(f"/api/dca/jobs/{job['id']}").json()["wells_done"] == 0:
+            time.sleep(0.005)
+        first = time.perf_counter() - t0
+        with client.stream("GET", f"/api/dca/jobs/{job['id']}/stream") as stream:
+            n = sum(1 for line in stream.iter_lines() if line and json.loads(line)["type"] == "well")
+        t_job = time.perf_counter() - t0
+        size = len(client.get(f"/api/dca/jobs/{job['id']}/result").content)
+        print(f"  job     : first batch after {first:6.2f} s, {n} wells in {t_job:6.2f} s "
+              f"(result file {size / 1024:.0f} KiB)")
+
+
+def bench_edits(args):
+    """Correcting many cells: one /api/data/update call per cell vs one
+    /api/data/update/bulk call, then the flush of the edit log to disk."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    df = _synthetic_field(args.wells, args.months)
+    df["month"] = df.groupby("well").cumcount().astype(float)
+    client = TestClient(main.app)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(df), args.cells, replace=False).tolist()
+    values = rng.uniform(1, 100, args.cells).round(2).tolist()
+    print(f"{len(df):,} rows, {args.cells:,} edited cells")
+    timings = {}
+    for name in ("single", "bulk"):
+        csv = df.to_csv(index=False).encode()
+        ds_id = client.post("/api/upload", files={"file": ("e.csv", csv, "text/csv")}).json()["dataset_id"]
+        client.post(f"/api/data/add_column?dataset_id={ds_id}", json={"name": "bbl", "formula": "rate * 30.4"})
+        t0 = time.perf_counter()
+        if name == "single":
+            for row, value in zip(rows, values):
+                client.post(f"/api/data/update?dataset_id={ds_id}",
+                            json={"row": row, "column": "rate", "value": str(value)})
+        else:
+            client.post(f"/api/data/update/bulk?dataset_id={ds_id}",
+                        json={"rows": rows, "column": "rate", "values": values})
+        t1 = time.perf_counter()
+        main._flush_edit_logs()
+        t2 = time.perf_counter()
+        frame = main._get_frame(ds_id)
+        assert np.allclose(frame["rate"].to_numpy()[rows], values)
+        assert np.allclose(frame["bbl"], frame["rate"] * 30.4)
+        timings[name] = t1 - t0
+        print(f"  {name:6s}: edits {t1 - t0:7.2f} s   flush {t2 - t1:6.3f} s")
+    print(f"  bulk speedup: {timings['single'] / timings['bulk']:.0f}x")
+
+
+def bench_stress(args):
+    """Concurrent uploads, incremental syncs, edits, column changes and DCA
+    calls against the app; fails on any 5xx or on a response that mixes two
+    dataset states."""
+    from fastapi.testclient import TestClient   # needs httpx
+
+    if args.frame_budget_mb is not None:
+        main.FRAME_CACHE_BUDGET = int(args.frame_budget_mb * 1024 * 1024)   # force evictions
+    csv_bytes = _synthetic_field(args.wells, 60).to_csv(index=False).encode()
+    client = TestClient(main.app)
+    ds_id = client.post("/api/upload", files={"file": ("stress.csv", csv_bytes, "text/csv")}).json()["dataset_id"]
+    n_rows = args.wells * 60
+    wells = ",".join(f"W-{i:05d}" for i in range(0, args.wells, max(1, args.wells // 20)))
+    deadline = time.perf_counter() + args.seconds
+    errors, counts, written, appended = [], {}, {}, [0]
+    lock = threading.Lock()
+
+    def check(name, r, ok=(200,)):
+        with lock:
+            counts[name] = counts.get(name, 0) + 1
+            if r.status_code not in ok:
+                errors.append(f"{name}: HTTP {r.status_code} {r.text[:200]}")
+        return r
+
+    def editor(k):
+        rng = random.Random(k)
+        while time.perf_counter() < deadline:
+            row = rng.randrange(k, n_rows, args.threads)   # each editor owns its rows
+            val = rng.uniform(1, 1000)
+            check("edit", client.post(f"/api/data/update?dataset_id={ds_id}",
+                                      json={"row": row, "column": "rate", "value": str(val)}))
+            written[row] = val
+
+    def column_toggler():
+        while time.perf_counter() < deadline:
+            check("add_column", client.post(f"/api/data/add_column?dataset_id={ds_id}",
+                                            json={"name": "tmp", "formula": "rate * 2"}), ok=(200, 400))
+            check("delete_column", client.delete(f"/api/data/column?column=tmp&dataset_id={ds_id}"), ok=(200, 400))
+
+    def reader():
+        while time.perf_counter() < deadline:
+            page = check("preview", client.get(f"/api/preview/rows?offset=0&limit=50&dataset_id={ds_id}")).json()
+            if page.get("rows") and set(page["rows"][0]) != set(page["columns"]):
+                with lock:
+                    errors.append(f"preview: torn page, rows {sorted(page['rows'][0])} vs columns {page['columns']}")
+            check("dca", client.get(f"/api/dca?x=date&y=rate&well_col=well&wells={wells}"
+                                    f"&model=exponential&dataset_id={ds_id}"))
+            check("stats", client.get(f"/api/preview/stats?dataset_id={ds_id}"))
+
+    def syncer():
+        k = 0
+        while time.perf_counter() < deadline:
+            rows = pd.DataFrame({"well": [f"S-{k:05d}"] * 3, "rate": [3.0, 2.0, 1.0],
+                                 "date": pd.date_range("2010-01-01", periods=3, freq="MS")})
+            r = check("sync", client.post(f"/api/sync/upload?dataset_id={ds_id}&mode=append&key=well,date",
+                                          files={"file": ("sync.csv", rows.to_csv(index=False).encode(), "text/csv")}))
+            if r.status_code == 200:
+                with lock:
+                    appended[0] += r.json()["rows_added"]
+            k += 1
+
+    def uploader():
+        while time.perf_counter() < deadline:
+            check("upload", client.post("/api/upload", files={"file": ("other.csv", csv_bytes, "text/csv")}))
+
+    threads = [threading.Thread(target=editor, args=(k,)) for k in range(args.threads)]
+    threads += [threading.Thread(target=reader) for _ in range(args.threads)]
+    threads += [threading.Thread(target=column_toggler), threading.Thread(target=uploader),
+                threading.Thread(target=syncer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    final = main._get_frame(ds_id)["rate"]
+    lost = [row for row, val in written.items() if final.iat[row] != val]
+    if lost:
+        errors.append(f"{len(lost)} edits lost (e.g. row {lost[0]})")
+    if len(final) != n_rows + appended[0]:
+        errors.append(f"{len(final)} rows after syncing, expected {n_rows + appended[0]}")
+    print(", ".join(f"{k}={v}" for k, v in sorted(counts.items())), main._frame_stats)
+    print(f"  {len(written)} edited rows verified, {len(errors)} errors")
+    for e in errors[:10]:
+        print("  " + e)
+    if errors:
+        raise SystemExit(1)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_fit = sub.add_parser("fit", help="per-well curve_fit loop vs batched fitting engine")
+    p_fit.add_argument("--wells", type=int, default=2000)
+    p_fit.add_argument("--months", type=int, default=120)
+    p_fit.add_argument("--model", choices=list(main._MODELS), default="hyperbolic")
+    p_fit.add_argument("--workers", type=int, default=0, help="also time the process-pool mode")
+    p_fit.set_defaults(func=bench_fit)
+
+    p_sync = sub.add_parser("sync", help="full re-import vs incremental sync of one new month")
+    p_sync.add_argument("--wells", type=int, default=2000)
+    p_sync.add_argument("--months", type=int, default=120)
+    p_sync.set_defaults(func=bench_sync)
+
+    p_stats = sub.add_parser("stats", help="column statistics: cold, cached, after an edit, approximate")
+    p_stats.add_argument("--wells", type=int, default=20000)
+    p_stats.add_argument("--months", type=int, default=120)
+    p_stats.set_defaults(func=bench_stats)
+
+    p_views = sub.add_parser("views", help="virtual-scroll pages of a sorted, filtered view")
+    p_views.add_argument("--wells", type=int, default=20000)
+    p_views.add_argument("--months", type=int, default=120)
+    p_views.add_argument("--pages", type=int, default=20)
+    p_views.set_defaults(func=bench_views)
+
+    p_payload = sub.add_parser("payload", help="multi-well DCA response: JSON vs binary vs Arrow")
+    p_payload.add_argument("--wells", type=int, default=200)
+    p_payload.add_argument("--months", type=int, default=360)
+    p_payload.add_argument("--max-points", type=int, default=None, help="also time downsampled responses")
+    p_payload.set_defaults(func=bench_payload)
+
+    p_upload = sub.add_parser("upload", help="chunked upload throughput: sequential vs parallel chunks")
+    p_upload.add_argument("--mb", type=float, default=256)
+    p_upload.add_argument("--chunk-mb", type=float, default=5)
+    p_upload.add_argument("--parallel", type=int, default=4)
+    p_upload.add_argument("--latency-ms", type=float, default=50)
+    p_upload.set_defaults(func=bench_upload)
+
+    p_ingest = sub.add_parser("ingest", help="CSV upload to ready: parse after finalize vs while uploading")
+    p_ingest.add_argument("--wells", type=int, default=5000)
+    p_ingest.add_argument("--months", type=int, default=240)
+    p_ingest.add_argument("--chunk-mb", type=float, default=5)
+    p_ingest.add_argument("--latency-ms", type=float, default=50)
+    p_ingest.set_defaults(func=bench_ingest)
+
+    p_dates = sub.add_parser("dates", help="date parsing/encoding: per-row inference vs inferred format per distinct value")
+    p_dates.add_argument("--wells", type=int, default=20000)
+    p_dates.add_argument("--months", type=int, default=120)
+    p_dates.set_defaults(func=bench_dates)
+
+    p_native = sub.add_parser("native", help="dataset import: CSV vs Parquet, Feather and partitioned Parquet")
+    p_native.add_argument("--wells", type=int, default=20000)
+    p_native.add_argument("--months", type=int, default=120)
+    p_native.set_defaults(func=bench_native)
+
+    p_excel = sub.add_parser("excel", help="Excel import: read_excel vs read-only engine, sequential vs parallel sheets")
+    p_excel.add_argument("--wells", type=int, default=800)
+    p_excel.add_argument("--months", type=int, default=120)
+    p_excel.add_argument("--sheets", type=int, default=8)
+    p_excel.set_defaults(func=bench_excel)
+
+    p_derived = sub.add_parser("derived", help="derived-column replay: eval per column vs dependency-aware engine")
+    p_derived.add_argument("--wells", type=int, default=20000)
+    p_derived.add_argument("--months", type=int, default=120)
+    p_derived.add_argument("--extra-columns", type=int, default=20)
+    p_derived.set_defaults(func=bench_derived)
+
+    p_eur = sub.add_parser("eur", help="field EUR: per-well monthly grid vs closed-form vectorized engine")
+    p_eur.add_argument("--wells", type=int, default=20000)
+    p_eur.add_argument("--years", type=float, default=50)
+    p_eur.set_defaults(func=bench_eur)
+
+    p_export = sub.add_parser("export", help="dataset export: CSV in a JSON string vs streamed CSV/Parquet/Arrow")
+    p_export.add_argument("--wells", type=int, default=5000)
+    p_export.add_argument("--months", type=int, default=120)
+    p_export.set_defaults(func=bench_export)
+
+    p_jobs = sub.add_parser("jobs", help="field-wide DCA: synchronous call vs streamed background job")
+    p_jobs.add_argument("--wells", type=int, default=5000)
+    p_jobs.add_argument("--months", type=int, default=120)
+    p_jobs.set_defaults(func=bench_jobs)
+
+    p_edits = sub.add_parser("edits", help="cell edits: one request per cell vs one bulk request")
+    p_edits.add_argument("--wells", type=int, default=2000)
+    p_edits.add_argument("--months", type=int, default=120)
+    p_edits.add_argument("--cells", type=int, default=10000)
+    p_edits.set_defaults(func=bench_edits)
+
+    p_stress = sub.add_parser("stress", help="concurrency consistency check (uploads, edits, DCA)")
+    p_stress.add_argument("--seconds", type=float, default=10)
+    p_stress.add_argument("--wells", type=int, default=200)
+    p_stress.add_argument("--threads", type=int, default=4)
+    p_stress.add_argument("--frame-budget-mb", type=float, default=None, help="shrink the frame cache")
+    p_stress.set_defaults(func=bench_stress)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main_cli()
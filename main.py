@@ -1,1213 +1,4766 @@
-import io
-import json
-import os
-import shutil
-import time
-import uuid
-import threading
-import warnings
-from datetime import datetime, timezone
-from pathlib import Path
-from typing import Optional, List
-from concurrent.futures import ThreadPoolExecutor
-
-import numpy as np
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
-from scipy.optimize import curve_fit
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Body
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-
-app = FastAPI(title="DCA Pro – Decline Curve Analysis")
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-# ---------------------------------------------------------------------------
-# Storage & Dataset Registry
-# ---------------------------------------------------------------------------
-STORAGE_DIR = Path(__file__).parent / "data" / "storage"
-STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-
-_datasets: dict = {}   # dataset_id -> {status, filename, suffix, raw_path, parquet_path, error, progress, ...}
-_active_dataset_id: Optional[str] = None
-_worker_pool = ThreadPoolExecutor(max_workers=2)
-
-# Version control: dataset_id -> list of version dicts (newest last)
-# Each version: {version, parquet_path, timestamp, rows, columns, status}
-_versions: dict = {}
-MAX_VERSIONS = 5   # keep last N versions per dataset
-
-# Derived columns / transformations registry (for pipeline replay)
-# dataset_id -> [{"name": "col", "formula": "expr"}, ...]
-_derived_columns: dict = {}
-
-# ---------------------------------------------------------------------------
-# In-memory store (kept for backward compat with existing endpoints)
-# ---------------------------------------------------------------------------
-_current_df: Optional[pd.DataFrame] = None
-_current_filename: str = ""
-_date_columns: list = []   # columns auto-detected as dates
-_current_file_bytes: bytes = b""
-_current_file_suffix: str = ""
-_file_disk_path: Optional[str] = None   # path on disk for auto-reload
-_file_last_modified: float = 0
-_last_import_timestamp: Optional[str] = None  # ISO timestamp of last import
-
-
-def _parse_data(raw_bytes: bytes, suffix: str):
-    """Parse raw file bytes and auto-detect date columns (dayfirst=True)."""
-    if suffix == ".csv":
-        df = pd.read_csv(io.BytesIO(raw_bytes))
-    elif suffix in (".xlsx", ".xls"):
-        df = pd.read_excel(io.BytesIO(raw_bytes), engine="openpyxl")
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type.")
-
-    detected_dates = []
-    for col in df.columns:
-        if df[col].dtype == "object":
-            sample = df[col].dropna().head(20)
-            if len(sample) == 0:
-                continue
-            first_val = str(sample.iloc[0])
-            if any(sep in first_val for sep in ['.', '/', '-']) and len(first_val) >= 6:
-                try:
-                    parsed = pd.to_datetime(sample, dayfirst=True, errors='coerce')
-                    if parsed.notna().sum() >= len(sample) * 0.8:
-                        df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
-                        detected_dates.append(col)
-                except Exception:
-                    pass
-
-    return df, detected_dates
-
-
-def _build_upload_response():
-    """Build the standard JSON response with data summary."""
-    preview_df = _current_df.head(100).copy()
-    for col in _date_columns:
-        if col in preview_df.columns and pd.api.types.is_datetime64_any_dtype(preview_df[col]):
-            preview_df[col] = preview_df[col].dt.strftime('%d.%m.%Y').fillna("")
-    return JSONResponse({
-        "filename": _current_filename,
-        "rows": len(_current_df),
-        "columns": list(_current_df.columns),
-        "numeric_columns": list(_current_df.select_dtypes(include="number").columns),
-        "date_columns": _date_columns,
-        "preview": preview_df.fillna("").to_dict(orient="records"),
-        "has_disk_path": _file_disk_path is not None,
-        "last_import": _last_import_timestamp,
-        "dataset_id": _active_dataset_id,
-        "version": _get_current_version_number(),
-    })
-
-
-def _get_current_version_number():
-    """Return the current version number for the active dataset."""
-    if not _active_dataset_id or _active_dataset_id not in _versions:
-        return 0
-    return len(_versions[_active_dataset_id])
-
-
-def _save_version_snapshot(dataset_id: str, df: pd.DataFrame, date_columns: list):
-    """Save a versioned copy of the Parquet file and record metadata."""
-    ds = _datasets.get(dataset_id)
-    if not ds:
-        return
-
-    ds_dir = STORAGE_DIR / dataset_id
-    ver_num = len(_versions.get(dataset_id, [])) + 1
-    ts = datetime.now(timezone.utc).isoformat()
-
-    # Copy current parquet to versioned file
-    ver_parquet = ds_dir / f"data_v{ver_num}.parquet"
-    current_parquet = ds_dir / "data.parquet"
-    if current_parquet.exists():
-        shutil.copy2(str(current_parquet), str(ver_parquet))
-    else:
-        # Write fresh
-        export_df = df.copy()
-        for col in date_columns:
-            if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-                export_df[col] = export_df[col].dt.strftime('%Y-%m-%d %H:%M:%S').fillna("")
-        table = pa.Table.from_pandas(export_df, preserve_index=False)
-        pq.write_table(table, str(ver_parquet), compression='snappy')
-
-    ver_entry = {
-        "version": ver_num,
-        "parquet_path": str(ver_parquet),
-        "timestamp": ts,
-        "rows": len(df),
-        "columns": list(df.columns),
-        "status": "ok",
-    }
-
-    if dataset_id not in _versions:
-        _versions[dataset_id] = []
-    _versions[dataset_id].append(ver_entry)
-
-    # Prune old versions
-    while len(_versions[dataset_id]) > MAX_VERSIONS:
-        old = _versions[dataset_id].pop(0)
-        old_path = Path(old["parquet_path"])
-        if old_path.exists():
-            try:
-                old_path.unlink()
-            except Exception:
-                pass
-
-    return ver_entry
-
-
-def _replay_derived_columns(dataset_id: str, df: pd.DataFrame):
-    """Re-apply all registered derived columns to a new DataFrame.
-    Returns (df, errors) where errors is a list of failed column names."""
-    errors = []
-    derivations = _derived_columns.get(dataset_id, [])
-    for d in derivations:
-        try:
-            df[d["name"]] = df.eval(d["formula"])
-        except Exception as e:
-            errors.append({"name": d["name"], "error": str(e)})
-    return df, errors
-
-
-# ---------------------------------------------------------------------------
-# Decline-curve models
-# ---------------------------------------------------------------------------
-def _exponential(t, qi, di):
-    """q(t) = qi * exp(-di * t)"""
-    return qi * np.exp(-di * t)
-
-
-def _hyperbolic(t, qi, di, b):
-    """q(t) = qi / (1 + b*di*t)^(1/b)"""
-    denom = 1.0 + b * di * t
-    # guard against negative base before fractional power
-    denom = np.maximum(denom, 1e-12)
-    return qi / np.power(denom, 1.0 / b)
-
-
-def _harmonic(t, qi, di):
-    """q(t) = qi / (1 + di*t)  (hyperbolic with b=1)"""
-    return qi / (1.0 + di * t)
-
-
-_MODELS = {
-    "exponential": (_exponential, ["qi", "di"],      [100, 0.01],  (0, [1e8, 10]), "q(t) = {qi} * exp(-{di} * t)"),
-    "hyperbolic":  (_hyperbolic,  ["qi", "di", "b"], [100, 0.01, 0.5], (0, [1e8, 10, 2]), "q(t) = {qi} / (1 + {b}*{di}*t)^(1/{b})"),
-    "harmonic":    (_harmonic,    ["qi", "di"],      [100, 0.01],  (0, [1e8, 10]), "q(t) = {qi} / (1 + {di}*t)"),
-}
-
-
-def _fit_decline(t: np.ndarray, q: np.ndarray, model_name: str):
-    """Fit a decline curve. Returns params_dict (empty dict if failed)."""
-    func, param_names, p0, bounds, eq_fmt = _MODELS[model_name]
-
-    # Smart initial guess: qi ≈ max production
-    p0 = list(p0)
-    p0[0] = float(np.nanmax(q)) if np.nanmax(q) > 0 else 100.0
-
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        try:
-            popt, _ = curve_fit(func, t, q, p0=p0, bounds=bounds, maxfev=10000)
-        except Exception:
-            return {}
-
-    def safe_float(v):
-        if np.isfinite(v):
-            return round(float(v), 6)
-        return 0.0
-
-    return {name: safe_float(val) for name, val in zip(param_names, popt)}
-
-
-# ---------------------------------------------------------------------------
-# Chunked Upload System
-# ---------------------------------------------------------------------------
-CHUNK_SIZE = 5 * 1024 * 1024  # 5 MB default; frontend can send smaller
-
-
-class UploadInitRequest(BaseModel):
-    filename: str
-    file_size: int
-
-
-def _background_parse_and_convert(dataset_id: str):
-    """Background worker: parse uploaded file → Parquet + populate DataFrame."""
-    global _current_df, _current_filename, _date_columns
-    global _current_file_bytes, _current_file_suffix, _file_disk_path, _file_last_modified
-    global _active_dataset_id, _last_import_timestamp
-
-    ds = _datasets.get(dataset_id)
-    if not ds:
-        return
-    try:
-        ds["status"] = "processing"
-        ds["progress"] = 10
-
-        raw_path = Path(ds["raw_path"])
-        suffix = ds["suffix"]
-        raw_bytes = raw_path.read_bytes()
-
-        ds["progress"] = 30
-
-        # Parse into DataFrame
-        df, detected_dates = _parse_data(raw_bytes, suffix)
-        ds["progress"] = 60
-
-        # Convert to Parquet
-        parquet_path = raw_path.parent / "data.parquet"
-        # For parquet, convert date columns to string to avoid issues
-        export_df = df.copy()
-        for col in detected_dates:
-            if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-                export_df[col] = export_df[col].dt.strftime('%Y-%m-%d %H:%M:%S').fillna("")
-        table = pa.Table.from_pandas(export_df, preserve_index=False)
-        pq.write_table(table, str(parquet_path), compression='snappy')
-        ds["parquet_path"] = str(parquet_path)
-        ds["progress"] = 80
-
-        # Replay derived columns (pipeline replay)
-        replay_errors = []
-        if dataset_id in _derived_columns and _derived_columns[dataset_id]:
-            df, replay_errors = _replay_derived_columns(dataset_id, df)
-            ds["replay_errors"] = replay_errors
-
-        ds["progress"] = 90
-
-        # Set as active dataset
-        _current_df = df
-        _current_filename = ds["filename"]
-        _date_columns = detected_dates
-        _current_file_bytes = raw_bytes
-        _current_file_suffix = suffix
-        _active_dataset_id = dataset_id
-        _last_import_timestamp = datetime.now(timezone.utc).isoformat()
-
-        # Check disk path
-        disk_path = Path.cwd() / ds["filename"]
-        if disk_path.exists():
-            _file_disk_path = str(disk_path)
-            _file_last_modified = disk_path.stat().st_mtime
-        else:
-            _file_disk_path = None
-            _file_last_modified = 0
-
-        # Save version snapshot
-        _save_version_snapshot(dataset_id, df, detected_dates)
-
-        ds["status"] = "ready"
-        ds["progress"] = 100
-        ds["rows"] = len(df)
-        ds["columns"] = list(df.columns)
-        ds["numeric_columns"] = list(df.select_dtypes(include="number").columns)
-        ds["date_columns"] = detected_dates
-
-    except Exception as e:
-        ds["status"] = "error"
-        ds["error"] = str(e)
-        ds["progress"] = 0
-
-
-@app.post("/api/upload/init")
-async def upload_init(req: UploadInitRequest):
-    """Initialize a chunked upload. Returns a unique dataset_id."""
-    dataset_id = uuid.uuid4().hex[:12]
-    ds_dir = STORAGE_DIR / dataset_id
-    ds_dir.mkdir(parents=True, exist_ok=True)
-
-    suffix = Path(req.filename).suffix.lower()
-    raw_path = ds_dir / f"raw{suffix}"
-
-    _datasets[dataset_id] = {
-        "status": "uploading",
-        "filename": req.filename,
-        "suffix": suffix,
-        "file_size": req.file_size,
-        "raw_path": str(raw_path),
-        "parquet_path": None,
-        "error": None,
-        "progress": 0,
-        "bytes_received": 0,
-        "rows": 0,
-        "columns": [],
-        "numeric_columns": [],
-        "date_columns": [],
-    }
-
-    # Create/truncate raw file
-    raw_path.write_bytes(b"")
-
-    return {"dataset_id": dataset_id, "chunk_size": CHUNK_SIZE}
-
-
-@app.post("/api/upload/chunk")
-async def upload_chunk(
-    dataset_id: str = Query(...),
-    chunk_index: int = Query(...),
-    file: UploadFile = File(...),
-):
-    """Receive a single chunk and append it to the raw file."""
-    ds = _datasets.get(dataset_id)
-    if not ds:
-        raise HTTPException(404, "Dataset not found.")
-    if ds["status"] != "uploading":
-        raise HTTPException(400, "Upload already finalized or failed.")
-
-    chunk_bytes = await file.read()
-    raw_path = Path(ds["raw_path"])
-
-    with open(raw_path, "ab") as f:
-        f.write(chunk_bytes)
-
-    ds["bytes_received"] += len(chunk_bytes)
-    if ds["file_size"] > 0:
-        ds["progress"] = min(95, int(ds["bytes_received"] / ds["file_size"] * 100))
-
-    return {
-        "ok": True,
-        "chunk_index": chunk_index,
-        "bytes_received": ds["bytes_received"],
-        "progress": ds["progress"],
-    }
-
-
-@app.post("/api/upload/finalize")
-async def upload_finalize(dataset_id: str = Query(...)):
-    """Signal that all chunks are uploaded. Triggers background parsing."""
-    ds = _datasets.get(dataset_id)
-    if not ds:
-        raise HTTPException(404, "Dataset not found.")
-    if ds["status"] != "uploading":
-        raise HTTPException(400, "Upload not in uploading state.")
-
-    ds["status"] = "processing"
-    ds["progress"] = 5
-
-    # Submit to background worker
-    _worker_pool.submit(_background_parse_and_convert, dataset_id)
-
-    return {"dataset_id": dataset_id, "status": "processing"}
-
-
-@app.get("/api/dataset/{dataset_id}/status")
-async def dataset_status(dataset_id: str):
-    """Poll processing status for a dataset."""
-    ds = _datasets.get(dataset_id)
-    if not ds:
-        raise HTTPException(404, "Dataset not found.")
-
-    result = {
-        "dataset_id": dataset_id,
-        "status": ds["status"],
-        "progress": ds["progress"],
-        "filename": ds["filename"],
-        "error": ds["error"],
-    }
-
-    # When ready, include the full upload response
-    if ds["status"] == "ready":
-        result.update({
-            "rows": ds["rows"],
-            "columns": ds["columns"],
-            "numeric_columns": ds["numeric_columns"],
-            "date_columns": ds["date_columns"],
-            "has_disk_path": _file_disk_path is not None,
-            "preview": _build_preview_list(),
-            "last_import": _last_import_timestamp,
-            "version": _get_current_version_number(),
-            "replay_errors": ds.get("replay_errors", []),
-        })
-
-    return result
-
-
-def _build_preview_list():
-    """Return first 100 rows as dicts for the frontend preview."""
-    if _current_df is None:
-        return []
-    preview_df = _current_df.head(100).copy()
-    for col in _date_columns:
-        if col in preview_df.columns and pd.api.types.is_datetime64_any_dtype(preview_df[col]):
-            preview_df[col] = preview_df[col].dt.strftime('%d.%m.%Y').fillna("")
-    return preview_df.fillna("").to_dict(orient="records")
-
-
-# Legacy single-shot upload (still works for small files / backward compat)
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    global _current_df, _current_filename, _date_columns
-    global _current_file_bytes, _current_file_suffix, _file_disk_path, _file_last_modified
-    global _active_dataset_id, _last_import_timestamp
-
-    raw_bytes = file.file.read()
-    suffix = Path(file.filename).suffix.lower()
-    _current_file_bytes = raw_bytes
-    _current_file_suffix = suffix
-    _current_filename = file.filename
-
-    _current_df, _date_columns = _parse_data(raw_bytes, suffix)
-
-    # Also save to storage + convert to Parquet
-    dataset_id = uuid.uuid4().hex[:12]
-    ds_dir = STORAGE_DIR / dataset_id
-    ds_dir.mkdir(parents=True, exist_ok=True)
-    raw_path = ds_dir / f"raw{suffix}"
-    raw_path.write_bytes(raw_bytes)
-    parquet_path = ds_dir / "data.parquet"
-    export_df = _current_df.copy()
-    for col in _date_columns:
-        if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-            export_df[col] = export_df[col].dt.strftime('%Y-%m-%d %H:%M:%S').fillna("")
-    table = pa.Table.from_pandas(export_df, preserve_index=False)
-    pq.write_table(table, str(parquet_path), compression='snappy')
-    _active_dataset_id = dataset_id
-    _last_import_timestamp = datetime.now(timezone.utc).isoformat()
-
-    # Register dataset entry for version control
-    _datasets[dataset_id] = {
-        "status": "ready",
-        "filename": file.filename,
-        "suffix": suffix,
-        "file_size": len(raw_bytes),
-        "raw_path": str(raw_path),
-        "parquet_path": str(parquet_path),
-        "error": None,
-        "progress": 100,
-        "bytes_received": len(raw_bytes),
-        "rows": len(_current_df),
-        "columns": list(_current_df.columns),
-        "numeric_columns": list(_current_df.select_dtypes(include="number").columns),
-        "date_columns": _date_columns,
-    }
-
-    # Save version snapshot
-    _save_version_snapshot(dataset_id, _current_df, _date_columns)
-
-    # Check if file exists on disk for auto-reload
-    disk_path = Path.cwd() / file.filename
-    if disk_path.exists():
-        _file_disk_path = str(disk_path)
-        _file_last_modified = disk_path.stat().st_mtime
-    else:
-        _file_disk_path = None
-        _file_last_modified = 0
-
-    return _build_upload_response()
-
-
-@app.get("/api/columns")
-async def get_columns():
-    if _current_df is None:
-        raise HTTPException(status_code=404, detail="No dataset loaded yet.")
-    columns = list(_current_df.columns)
-    numeric_columns = list(_current_df.select_dtypes(include="number").columns)
-    return {"columns": columns, "numeric_columns": numeric_columns}
-
-
-@app.get("/api/current")
-async def get_current_dataset():
-    """Return the full current dataset info (same shape as upload response).
-    Used by the frontend to restore the Import Data tab on page reload."""
-    if _current_df is None:
-        raise HTTPException(status_code=404, detail="No dataset loaded yet.")
-    return _build_upload_response()
-
-
-@app.get("/api/wells")
-async def get_wells(well_col: str):
-    """Return unique well names from the specified column."""
-    if _current_df is None:
-        raise HTTPException(status_code=404, detail="No dataset loaded yet.")
-    if well_col not in _current_df.columns:
-        raise HTTPException(status_code=400, detail=f"Column '{well_col}' not found.")
-    wells = sorted(_current_df[well_col].dropna().unique().astype(str).tolist())
-    return {"wells": wells}
-
-
-@app.get("/api/dca")
-async def decline_curve_analysis(
-    x: str,
-    y: str,
-    well_col: str,
-    wells: str = Query(..., description="Comma-separated well names"),
-    model: str = Query("exponential", description="exponential|hyperbolic|harmonic"),
-    forecast_months: float = Query(0, description="Months to forecast"),
-    exclude_indices: str = Query("", description="Comma-separated indices to exclude from fitting"),
-    combine: bool = Query(False, description="If true, sum y-values of selected wells by time period"),
-):
-    """
-    Perform Decline Curve Analysis.
-    Returns actual production data + fitted decline curves per well + forecast.
-    If combine=true, sums y-values of all selected wells grouped by the x column
-    and returns a single combined "well" for DCA.
-    """
-    if _current_df is None:
-        raise HTTPException(status_code=404, detail="No dataset loaded yet.")
-    if model not in _MODELS:
-        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'.")
-
-    for col in [x, y, well_col]:
-        if col not in _current_df.columns:
-            raise HTTPException(status_code=400, detail=f"Column '{col}' not found.")
-
-    well_list = [w.strip() for w in wells.split(",") if w.strip()]
-
-    # Parse forecast months
-    try:
-        f_months = float(forecast_months)
-    except ValueError:
-        f_months = 0.0
-
-    # Check if x column is already a datetime (parsed at upload time)
-    is_date = pd.api.types.is_datetime64_any_dtype(_current_df[x])
-
-    # ---- Combine mode: sum y-values across selected wells by time ----
-    if combine and len(well_list) > 1:
-        masks = _current_df[well_col].astype(str).isin(well_list)
-        combined = _current_df.loc[masks, [x, y]].dropna().copy()
-        combined[y] = pd.to_numeric(combined[y], errors='coerce').fillna(0.0)
-        combined = combined.groupby(x, sort=True)[y].sum().reset_index()
-        combined = combined.sort_values(x).reset_index(drop=True)
-        # Treat as a single "well" named after all combined wells
-        combined_name = ' + '.join(well_list)
-        well_list = [combined_name]
-        # Temporarily inject combined data — we'll use a flag
-        _combined_override = combined
-    else:
-        _combined_override = None
-
-    result = []
-    for well_name in well_list:
-        if _combined_override is not None:
-            subset = _combined_override.copy()
-        else:
-            mask = _current_df[well_col].astype(str) == well_name
-            subset = _current_df.loc[mask, [x, y]].dropna().copy()
-
-        # Sort by x column
-        subset = subset.sort_values(x).reset_index(drop=True)
-
-        if len(subset) < 3:
-            continue
-
-        # Build numeric t for curve fitting
-        if is_date:
-            x_dates = subset[x]
-            x_min = x_dates.min()
-            t = (x_dates - x_min).dt.total_seconds().values / 86400.0
-            # Display strings in DD.MM.YYYY format
-            x_display = x_dates.dt.strftime('%d.%m.%Y').tolist()
-        else:
-            x_numeric = pd.to_numeric(subset[x], errors='coerce').fillna(0.0).values.astype(float)
-            t = x_numeric - x_numeric.min()
-            x_display = x_numeric.tolist()
-            x_min = None
-
-        y_vals = pd.to_numeric(subset[y], errors='coerce').fillna(0.0).values.astype(float)
-
-        # Parse exclude indices (indices in sorted order)
-        excl = set()
-        if exclude_indices:
-            excl = {int(i) for i in exclude_indices.split(",") if i.strip().isdigit()}
-        fit_mask = np.array([i not in excl for i in range(len(t))])
-        t_fit = t[fit_mask]
-        y_fit = y_vals[fit_mask]
-
-        # Fit the model on non-excluded data
-        if len(t_fit) >= 3:
-            params = _fit_decline(t_fit, y_fit, model)
-        else:
-            params = {}
-
-        # Generate fitted values only for the non-excluded range
-        fitted = None
-        equation = ""
-        if params:
-            func = _MODELS[model][0]
-            param_names = _MODELS[model][1]
-            eq_fmt = _MODELS[model][4]
-            p_values = [params[n] for n in param_names]
-            fitted_arr = func(t, *p_values)
-            fitted_arr = np.nan_to_num(fitted_arr, nan=0.0, posinf=0.0, neginf=0.0)
-            # Null-out fitted values for excluded points before the fitted region
-            # so the fitted line only appears from the first included point onward
-            if excl:
-                non_excl_indices = sorted(set(range(len(t))) - excl)
-                if non_excl_indices:
-                    first_included = non_excl_indices[0]
-                    for ei in range(len(fitted_arr)):
-                        if ei < first_included:
-                            fitted_arr[ei] = np.nan
-                        elif ei in excl:
-                            fitted_arr[ei] = np.nan
-            fitted = [None if np.isnan(v) else v for v in fitted_arr]
-            
-            # Format equation string
-            try:
-                equation = eq_fmt.format(**params)
-            except Exception:
-                equation = ""
-
-        # Forecast — monthly intervals (starting 1 month after last INCLUDED data)
-        # Initialize as empty dict so w.forecast.x checks works safely
-        forecast_data = {}
-        if params and f_months > 0:
-            func = _MODELS[model][0]
-            # Use the last *included* point as forecast origin (not the last overall point)
-            if excl:
-                non_excl_idx = sorted(set(range(len(t))) - excl)
-                last_t = t[non_excl_idx[-1]] if non_excl_idx else t[-1]
-            else:
-                last_t = t[-1]
-            n_months = int(f_months)
-            # Roughly 30.44 days per month for basic forecast stepping
-            t_forecast = np.array([last_t + 30.4375 * (i + 1) for i in range(n_months)])
-            
-            p_vals = [params[n] for n in _MODELS[model][1]]
-            q_forecast = func(t_forecast, *p_vals)
-            q_forecast = np.nan_to_num(q_forecast, nan=0.0, posinf=0.0, neginf=0.0)
-
-            if is_date:
-                # Convert back to timestamp strings
-                # t was (date - min_date).days
-                # So new_date = min_date + t_forecast
-                start_date = pd.to_datetime(subset[x].min())
-                forecast_dates = [start_date + pd.Timedelta(days=v) for v in t_forecast]
-                x_fore_display = [d.strftime('%d.%m.%Y') for d in forecast_dates]
-            else:
-                x_fore_display = (t_forecast + x_numeric.min()).tolist()
-
-            forecast_data = {
-                "x": x_fore_display,
-                "y": q_forecast.tolist(),
-                "t": t_forecast.tolist(),
-            }
-
-        entry = {
-            "well": well_name,
-            "x": x_display,
-            "t": t.tolist(),
-            "y_actual": y_vals.tolist(),
-            "y_fitted": fitted,
-            "forecast": forecast_data,
-            "params": params,
-            "equation": equation,
-            "is_date": is_date,
-            "excluded_indices": sorted(excl),
-        }
-        result.append(entry)
-
-    return {
-        "x_label": x,
-        "y_label": y,
-        "model": model,
-        "wells": result,
-    }
-
-
-# ---------------------------------------------------------------------------
-# Data editing & reload endpoints
-# ---------------------------------------------------------------------------
-class CellUpdate(BaseModel):
-    row: int
-    column: str
-    value: str
-
-
-class NewColumn(BaseModel):
-    name: str
-    formula: str
-
-
-@app.get("/api/reload")
-async def reload_from_disk():
-    """Re-read the file from disk if available, otherwise re-parse stored bytes.
-    Saves a new version and replays derived columns."""
-    global _current_df, _date_columns, _file_last_modified, _last_import_timestamp
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    if _file_disk_path and Path(_file_disk_path).exists():
-        raw = Path(_file_disk_path).read_bytes()
-        _current_df, _date_columns = _parse_data(raw, _current_file_suffix)
-        _file_last_modified = Path(_file_disk_path).stat().st_mtime
-    else:
-        _current_df, _date_columns = _parse_data(_current_file_bytes, _current_file_suffix)
-
-    _last_import_timestamp = datetime.now(timezone.utc).isoformat()
-
-    # Update Parquet + version snapshot
-    if _active_dataset_id:
-        ds_dir = STORAGE_DIR / _active_dataset_id
-        parquet_path = ds_dir / "data.parquet"
-        export_df = _current_df.copy()
-        for col in _date_columns:
-            if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-                export_df[col] = export_df[col].dt.strftime('%Y-%m-%d %H:%M:%S').fillna("")
-        table = pa.Table.from_pandas(export_df, preserve_index=False)
-        pq.write_table(table, str(parquet_path), compression='snappy')
-        _save_version_snapshot(_active_dataset_id, _current_df, _date_columns)
-
-        # Replay derived columns
-        if _active_dataset_id in _derived_columns and _derived_columns[_active_dataset_id]:
-            _current_df, replay_errors = _replay_derived_columns(_active_dataset_id, _current_df)
-        else:
-            replay_errors = []
-
-        # Update dataset registry
-        ds = _datasets.get(_active_dataset_id)
-        if ds:
-            ds["rows"] = len(_current_df)
-            ds["columns"] = list(_current_df.columns)
-            ds["numeric_columns"] = list(_current_df.select_dtypes(include="number").columns)
-            ds["date_columns"] = _date_columns
-
-    return _build_upload_response()
-
-
-@app.post("/api/sync/upload")
-async def sync_upload(file: UploadFile = File(...)):
-    """Receive a re-synced file from the browser (File System Access API).
-    Creates a new version, replays pipeline, returns updated data."""
-    global _current_df, _current_filename, _date_columns
-    global _current_file_bytes, _current_file_suffix, _last_import_timestamp
-
-    if not _active_dataset_id:
-        raise HTTPException(400, "No active dataset to sync.")
-
-    raw_bytes = file.file.read()
-    suffix = Path(file.filename).suffix.lower()
-
-    try:
-        df, detected_dates = _parse_data(raw_bytes, suffix)
-    except Exception as e:
-        raise HTTPException(400, f"Failed to parse file: {e}")
-
-    # Update stored raw file
-    ds = _datasets.get(_active_dataset_id)
-    if ds:
-        raw_path = Path(ds["raw_path"])
-        raw_path.write_bytes(raw_bytes)
-
-    # Write new Parquet
-    ds_dir = STORAGE_DIR / _active_dataset_id
-    parquet_path = ds_dir / "data.parquet"
-    export_df = df.copy()
-    for col in detected_dates:
-        if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-            export_df[col] = export_df[col].dt.strftime('%Y-%m-%d %H:%M:%S').fillna("")
-    table = pa.Table.from_pandas(export_df, preserve_index=False)
-    pq.write_table(table, str(parquet_path), compression='snappy')
-
-    # Replay derived columns
-    replay_errors = []
-    if _active_dataset_id in _derived_columns and _derived_columns[_active_dataset_id]:
-        df, replay_errors = _replay_derived_columns(_active_dataset_id, df)
-
-    # Save version snapshot
-    _save_version_snapshot(_active_dataset_id, df, detected_dates)
-
-    # Update globals
-    _current_df = df
-    _current_filename = file.filename
-    _date_columns = detected_dates
-    _current_file_bytes = raw_bytes
-    _current_file_suffix = suffix
-    _last_import_timestamp = datetime.now(timezone.utc).isoformat()
-
-    # Update dataset registry
-    if ds:
-        ds["rows"] = len(df)
-        ds["columns"] = list(df.columns)
-        ds["numeric_columns"] = list(df.select_dtypes(include="number").columns)
-        ds["date_columns"] = detected_dates
-        ds["replay_errors"] = replay_errors
-
-    resp = {
-        "filename": _current_filename,
-        "rows": len(_current_df),
-        "columns": list(_current_df.columns),
-        "numeric_columns": list(_current_df.select_dtypes(include="number").columns),
-        "date_columns": _date_columns,
-        "has_disk_path": _file_disk_path is not None,
-        "last_import": _last_import_timestamp,
-        "dataset_id": _active_dataset_id,
-        "version": _get_current_version_number(),
-        "replay_errors": replay_errors,
-    }
-    return resp
-
-
-@app.get("/api/versions")
-async def list_versions():
-    """List all stored versions for the active dataset."""
-    if not _active_dataset_id:
-        raise HTTPException(404, "No active dataset.")
-    versions = _versions.get(_active_dataset_id, [])
-    return {
-        "dataset_id": _active_dataset_id,
-        "versions": [
-            {"version": v["version"], "timestamp": v["timestamp"],
-             "rows": v["rows"], "columns": len(v["columns"]), "status": v["status"]}
-            for v in versions
-        ],
-        "current_version": _get_current_version_number(),
-    }
-
-
-@app.post("/api/versions/rollback")
-async def rollback_version(version: int = Query(...)):
-    """Rollback to a specific version by re-loading its Parquet snapshot."""
-    global _current_df, _date_columns, _last_import_timestamp
-    if not _active_dataset_id:
-        raise HTTPException(404, "No active dataset.")
-    versions = _versions.get(_active_dataset_id, [])
-    target = None
-    for v in versions:
-        if v["version"] == version:
-            target = v
-            break
-    if not target:
-        raise HTTPException(404, f"Version {version} not found.")
-
-    parquet_path = Path(target["parquet_path"])
-    if not parquet_path.exists():
-        raise HTTPException(404, "Version Parquet file missing.")
-
-    # Read back the versioned Parquet
-    table = pq.read_table(str(parquet_path))
-    df = table.to_pandas()
-    _current_df = df
-    _date_columns = []  # Re-detect dates from dtypes
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            _date_columns.append(col)
-    _last_import_timestamp = datetime.now(timezone.utc).isoformat()
-
-    # Copy this version's parquet to become the current data.parquet
-    ds_dir = STORAGE_DIR / _active_dataset_id
-    shutil.copy2(str(parquet_path), str(ds_dir / "data.parquet"))
-
-    # Update dataset registry
-    ds = _datasets.get(_active_dataset_id)
-    if ds:
-        ds["rows"] = len(df)
-        ds["columns"] = list(df.columns)
-        ds["numeric_columns"] = list(df.select_dtypes(include="number").columns)
-        ds["date_columns"] = _date_columns
-
-    return {
-        "ok": True,
-        "rolled_back_to": version,
-        "rows": len(df),
-        "columns": list(df.columns),
-        "numeric_columns": list(df.select_dtypes(include="number").columns),
-        "date_columns": _date_columns,
-        "last_import": _last_import_timestamp,
-        "filename": _current_filename,
-        "dataset_id": _active_dataset_id,
-        "has_disk_path": _file_disk_path is not None,
-        "version": _get_current_version_number(),
-    }
-
-
-@app.get("/api/derived_columns")
-async def get_derived_columns():
-    """Return the pipeline of derived columns for the active dataset."""
-    if not _active_dataset_id:
-        return {"columns": []}
-    return {"columns": _derived_columns.get(_active_dataset_id, [])}
-
-
-@app.get("/api/file_status")
-async def file_status():
-    """Check if the file on disk has been modified since last load."""
-    if not _file_disk_path or not Path(_file_disk_path).exists():
-        return {"has_disk_path": False, "modified": False}
-    current_mtime = Path(_file_disk_path).stat().st_mtime
-    return {
-        "has_disk_path": True,
-        "modified": current_mtime > _file_last_modified,
-        "disk_mtime": current_mtime,
-    }
-
-
-@app.get("/api/data")
-async def get_data(
-    page: int = Query(1),
-    page_size: int = Query(50),
-    sort_col: Optional[str] = None,
-    sort_asc: bool = True,
-    filter_col: Optional[str] = None,
-    filter_val: Optional[str] = None
-):
-    """Get paginated data for the editor with sorting and filtering."""
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    
-    df_view = _current_df.copy()
-
-    # Filtering
-    if filter_col and filter_val and filter_col in df_view.columns:
-        # Simple string contains filter, case-insensitive
-        mask = df_view[filter_col].astype(str).str.contains(filter_val, case=False, na=False)
-        df_view = df_view[mask]
-
-    # Sorting
-    if sort_col and sort_col in df_view.columns:
-        df_view = df_view.sort_values(by=sort_col, ascending=sort_asc)
-
-    total = len(df_view)
-    start = (page - 1) * page_size
-    end = min(start + page_size, total)
-    chunk = df_view.iloc[start:end].copy()
-
-    for col in _date_columns:
-        if col in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk[col]):
-            chunk[col] = chunk[col].dt.strftime('%d.%m.%Y').fillna("")
-            
-    return {
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": max(1, (total + page_size - 1) // page_size),
-        "columns": list(_current_df.columns),
-        "rows": chunk.fillna("").to_dict(orient="records"),
-    }
-
-
-@app.post("/api/data/update")
-async def update_cell(update: CellUpdate):
-    """Update a single cell value."""
-    global _current_df
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    if update.column not in _current_df.columns:
-        raise HTTPException(400, f"Column '{update.column}' not found.")
-    if update.row < 0 or update.row >= len(_current_df):
-        raise HTTPException(400, f"Row {update.row} out of range.")
-    col = update.column
-    val = update.value
-    if pd.api.types.is_numeric_dtype(_current_df[col]):
-        try:
-            val = float(val)
-        except ValueError:
-            pass
-    elif pd.api.types.is_datetime64_any_dtype(_current_df[col]):
-        try:
-            val = pd.to_datetime(val, dayfirst=True)
-        except Exception:
-            pass
-    _current_df.at[update.row, col] = val
-    return {"ok": True}
-
-
-@app.post("/api/data/add_column")
-async def add_computed_column(col: NewColumn):
-    """Add a computed column using a pandas-eval expression.
-    Also registers it in the derived-column pipeline for replay."""
-    global _current_df
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    if col.name in _current_df.columns:
-        raise HTTPException(400, f"Column '{col.name}' already exists.")
-    try:
-        _current_df[col.name] = _current_df.eval(col.formula)
-    except Exception as e:
-        raise HTTPException(400, f"Formula error: {e}")
-
-    # Register in pipeline for replay
-    if _active_dataset_id:
-        if _active_dataset_id not in _derived_columns:
-            _derived_columns[_active_dataset_id] = []
-        # Avoid duplicates
-        existing_names = {d["name"] for d in _derived_columns[_active_dataset_id]}
-        if col.name not in existing_names:
-            _derived_columns[_active_dataset_id].append({"name": col.name, "formula": col.formula})
-
-    return {
-        "ok": True,
-        "columns": list(_current_df.columns),
-        "numeric_columns": list(_current_df.select_dtypes(include="number").columns),
-    }
-
-
-@app.delete("/api/data/column")
-async def delete_column(column: str = Query(...)):
-    """Delete a column. Also removes it from the derived-column pipeline."""
-    global _current_df, _date_columns
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    if column not in _current_df.columns:
-        raise HTTPException(400, f"Column '{column}' not found.")
-    _current_df.drop(columns=[column], inplace=True)
-    if column in _date_columns:
-        _date_columns.remove(column)
-    # Remove from derived pipeline
-    if _active_dataset_id and _active_dataset_id in _derived_columns:
-        _derived_columns[_active_dataset_id] = [
-            d for d in _derived_columns[_active_dataset_id] if d["name"] != column
-        ]
-    return {
-        "ok": True,
-        "columns": list(_current_df.columns),
-        "numeric_columns": list(_current_df.select_dtypes(include="number").columns),
-    }
-
-
-@app.get("/api/data/export")
-async def export_data():
-    """Export the current DataFrame as CSV text."""
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-    buf = io.StringIO()
-    export_df = _current_df.copy()
-    for col in _date_columns:
-        if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
-            export_df[col] = export_df[col].dt.strftime('%d.%m.%Y').fillna("")
-    export_df.to_csv(buf, index=False)
-    return JSONResponse({"csv": buf.getvalue()})
-
-
-# ---------------------------------------------------------------------------
-# Virtual Scroll: on-demand row fetching for Data Preview
-# ---------------------------------------------------------------------------
-@app.get("/api/preview/rows")
-async def preview_rows(
-    offset: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=500),
-    sort_col: Optional[str] = None,
-    sort_asc: bool = True,
-    filter_col: Optional[str] = None,
-    filter_val: Optional[str] = None,
-):
-    """Return a slice of rows for virtual-scroll preview.
-
-    The frontend requests rows by *offset* (absolute row index) so it can
-    map a scrollbar position directly to a data window.
-    """
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-
-    df_view = _current_df
-
-    # Filtering (create a view, avoid full copy for perf)
-    if filter_col and filter_val and filter_col in df_view.columns:
-        mask = df_view[filter_col].astype(str).str.contains(filter_val, case=False, na=False)
-        df_view = df_view[mask]
-
-    # Sorting
-    if sort_col and sort_col in df_view.columns:
-        df_view = df_view.sort_values(by=sort_col, ascending=sort_asc)
-
-    total = len(df_view)
-    start = min(offset, total)
-    end = min(start + limit, total)
-    chunk = df_view.iloc[start:end].copy()
-
-    for col in _date_columns:
-        if col in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk[col]):
-            chunk[col] = chunk[col].dt.strftime('%d.%m.%Y').fillna("")
-
-    return {
-        "total": total,
-        "offset": start,
-        "limit": limit,
-        "columns": list(_current_df.columns),
-        "rows": chunk.fillna("").to_dict(orient="records"),
-    }
-
-
-# ---------------------------------------------------------------------------
-# Columnar Summary / Stats  (computed from Parquet when available)
-# ---------------------------------------------------------------------------
-@app.get("/api/preview/stats")
-async def preview_stats():
-    """Return per-column statistics: type, count, nulls, min, max, mean,
-    std, and a 20-bin histogram for numeric columns."""
-    if _current_df is None:
-        raise HTTPException(404, "No dataset loaded.")
-
-    stats = []
-    for col in _current_df.columns:
-        s = _current_df[col]
-        total = len(s)
-        null_count = int(s.isna().sum())
-        unique_count = int(s.nunique())
-
-        entry = {
-            "column": col,
-            "dtype": str(s.dtype),
-            "total": total,
-            "non_null": total - null_count,
-            "null_count": null_count,
-            "unique": unique_count,
-        }
-
-        if pd.api.types.is_numeric_dtype(s):
-            clean = s.dropna()
-            entry["type"] = "numeric"
-            entry["min"] = _safe_json(clean.min()) if len(clean) else None
-            entry["max"] = _safe_json(clean.max()) if len(clean) else None
-            entry["mean"] = _safe_json(clean.mean()) if len(clean) else None
-            entry["std"] = _safe_json(clean.std()) if len(clean) else None
-            entry["median"] = _safe_json(clean.median()) if len(clean) else None
-            entry["p25"] = _safe_json(clean.quantile(0.25)) if len(clean) else None
-            entry["p75"] = _safe_json(clean.quantile(0.75)) if len(clean) else None
-
-            # Histogram (20 bins)
-            if len(clean) >= 2:
-                try:
-                    counts, edges = np.histogram(clean.values, bins=20)
-                    entry["histogram"] = {
-                        "counts": counts.tolist(),
-                        "edges": [round(float(e), 6) for e in edges],
-                    }
-                except Exception:
-                    entry["histogram"] = None
-            else:
-                entry["histogram"] = None
-        elif pd.api.types.is_datetime64_any_dtype(s):
-            clean = s.dropna()
-            entry["type"] = "datetime"
-            entry["min"] = str(clean.min()) if len(clean) else None
-            entry["max"] = str(clean.max()) if len(clean) else None
-            entry["histogram"] = None
-        else:
-            entry["type"] = "string"
-            # Top 10 most frequent values
-            if len(s.dropna()) > 0:
-                top = s.value_counts().head(10)
-                entry["top_values"] = [{"value": str(k), "count": int(v)} for k, v in top.items()]
-            else:
-                entry["top_values"] = []
-            entry["histogram"] = None
-
-        stats.append(entry)
-
-    return {"columns": stats, "total_rows": len(_current_df)}
-
-
-def _safe_json(v):
-    """Convert numpy numeric to JSON-safe float."""
-    if v is None:
-        return None
-    f = float(v)
-    if not np.isfinite(f):
-        return None
-    return round(f, 6)
-
-
-# ---------------------------------------------------------------------------
-# Serve the single-page frontend
-# ---------------------------------------------------------------------------
-FRONTEND_PATH = Path(__file__).parent / "templates" / "index.html"
-
-
-@app.get("/", response_class=HTMLResponse)
-async def index():
-    return FRONTEND_PATH.read_text(encoding="utf-8")
+import ast
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import uuid
+import threading
+import warnings
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, List
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as pads
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from scipy.optimize import curve_fit
+from pandas.tseries.api import guess_datetime_format
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+
+try:
+    import orjson   # optional: much faster JSON encoding of large responses
+except ImportError:
+    orjson = None
+
+try:
+    import numexpr   # optional: multi-threaded evaluation of derived-column formulas
+except ImportError:
+    numexpr = None
+
+try:
+    import python_calamine   # optional: much faster Excel reader (pandas engine="calamine")
+except ImportError:
+    python_calamine = None
+
+@asynccontextmanager
+async def _lifespan(app):
+    _recover_edit_logs()   # edits logged before a crash
+    flusher = asyncio.create_task(_edit_flush_loop())
+    yield
+    flusher.cancel()
+    _flush_edit_logs()
+    _flush_dirty_frames()   # unsaved edits survive a restart
+
+
+app = FastAPI(title="DCA Pro – Decline Curve Analysis", lifespan=_lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+# ---------------------------------------------------------------------------
+# Storage & Dataset Registry
+# ---------------------------------------------------------------------------
+STORAGE_DIR = Path(__file__).parent / "data" / "storage"
+STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+
+_datasets: dict = {}   # dataset_id -> {status, filename, suffix, raw_path, parquet_path, error, progress,
+                       #                date_columns, disk_path, disk_mtime, last_import,
+                       #                base_path, deltas, source_path (server-side imports), ...}
+_active_dataset_id: Optional[str] = None   # default for requests that pass no dataset_id
+_worker_pool = ThreadPoolExecutor(max_workers=2)
+
+# Version control: dataset_id -> list of version dicts (newest last)
+# Each version: {version, parquet_path, deltas, timestamp, rows, columns, status, bytes_added}
+# (files live in the dataset's content-addressed objects/ folder)
+_versions: dict = {}
+MAX_VERSIONS = int(os.environ.get("DCA_MAX_VERSIONS", "100"))   # keep last N versions per dataset
+
+# Derived columns / transformations registry (for pipeline replay)
+# dataset_id -> [{"name": "col", "formula": "expr"}, ...]
+_derived_columns: dict = {}
+
+# Durable registry: an append-only JSON-lines manifest of dataset metadata,
+# versions, derived-column pipelines and the active dataset. Each line
+# replaces the previous record of its kind for that dataset, so a write is
+# one fsync'd append and a torn last line (crash mid-write) is ignored.
+REGISTRY_PATH = STORAGE_DIR / "registry.jsonl"
+REGISTRY_COMPACT_LINES = 5000   # rewrite the manifest once it grows past this
+_REGISTRY_TRANSIENT = {"progress", "bytes_received", "rows_parsed"}
+_registry_lock = threading.Lock()
+_registry_lines = 0
+
+
+def _registry_append(record: dict):
+    """Append one record to the registry and flush it to disk."""
+    global _registry_lines
+    line = json.dumps(record, default=str) + "\n"
+    with _registry_lock:
+        with open(REGISTRY_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        _registry_lines += 1
+        if _registry_lines > REGISTRY_COMPACT_LINES:
+            _compact_registry()
+
+
+def _compact_registry():
+    """Rewrite the registry with only the live records (atomic replace).
+    Call under _registry_lock."""
+    global _registry_lines
+    records = []
+    for dataset_id, ds in list(_datasets.items()):
+        if ds.get("status") == "ready":
+            records.append({"dataset": dataset_id, "meta": _dataset_record(ds)})
+            records.append({"dataset": dataset_id, "versions": _versions.get(dataset_id, [])})
+            records.append({"dataset": dataset_id, "derived": _derived_columns.get(dataset_id, [])})
+    if _active_dataset_id:
+        records.append({"active": _active_dataset_id})
+    tmp_path = Path(str(REGISTRY_PATH) + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r, default=str) + "\n" for r in records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, REGISTRY_PATH)
+    _registry_lines = len(records)
+
+
+def _dataset_record(ds: dict) -> dict:
+    return {k: (str(v) if isinstance(v, Path) else v)
+            for k, v in ds.items() if k not in _REGISTRY_TRANSIENT}
+
+
+def _save_dataset_record(dataset_id: str):
+    """Record a ready dataset's metadata (columns, files, source) in the registry."""
+    ds = _datasets.get(dataset_id)
+    if ds and ds.get("status") == "ready":
+        _registry_append({"dataset": dataset_id, "meta": _dataset_record(ds)})
+
+
+def _save_derived(dataset_id: str):
+    _registry_append({"dataset": dataset_id, "derived": _derived_columns.get(dataset_id, [])})
+
+
+def _load_registry():
+    """Rebuild the dataset registry from the manifest. Only metadata is read;
+    Parquet files are opened lazily on first access (see _LazyHandles)."""
+    global _active_dataset_id, _registry_lines
+    if not REGISTRY_PATH.exists():
+        return
+    metas, versions, derived, active, torn = {}, {}, {}, None, False
+    with open(REGISTRY_PATH, encoding="utf-8") as f:
+        for line in f:
+            _registry_lines += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                torn = True   # partial write from a crash
+                continue
+            dataset_id = record.get("dataset")
+            if "meta" in record:
+                metas[dataset_id] = record["meta"]
+            elif "versions" in record:
+                versions[dataset_id] = record["versions"]
+            elif "derived" in record:
+                derived[dataset_id] = record["derived"]
+            elif "active" in record:
+                active = record["active"]
+    for dataset_id, meta in metas.items():
+        if not (STORAGE_DIR / dataset_id).is_dir():
+            continue   # deleted by hand
+        meta.update(progress=100, bytes_received=meta.get("file_size", 0))
+        _datasets[dataset_id] = meta
+        _versions[dataset_id] = versions.get(dataset_id, [])
+        if derived.get(dataset_id):
+            _derived_columns[dataset_id] = derived[dataset_id]
+    if active in _datasets:
+        _active_dataset_id = active
+    if torn:
+        with _registry_lock:
+            _compact_registry()   # so the next append starts on a clean line
+
+
+_load_registry()
+
+# ---------------------------------------------------------------------------
+# Loaded datasets: lazy Parquet handles + LRU of materialized frames
+# ---------------------------------------------------------------------------
+# Every ready dataset has a _DatasetHandle; a full DataFrame is only built when
+# an editor needs every row, and those frames share one memory budget. The
+# least recently used frame is evicted first (dirty frames are written back
+# to their data.parquet before being dropped).
+FRAME_CACHE_BUDGET = int(os.environ.get("DCA_FRAME_BUDGET_MB", "2048")) * 1024 * 1024
+
+class _LazyHandles(dict):
+    """dataset_id -> _DatasetHandle. Datasets restored from the registry are
+    opened on first access, so startup does not read any Parquet footer."""
+
+    def __missing__(self, dataset_id):
+        ds = _datasets.get(dataset_id)
+        if not ds or ds.get("status") != "ready" or not ds.get("base_path"):
+            raise KeyError(dataset_id)
+        try:
+            handle = _DatasetHandle(ds["base_path"], ds["date_columns"], ds.get("deltas", []))
+        except OSError as e:
+            ds["status"] = "error"
+            ds["error"] = f"Stored data unreadable: {e}"
+            raise KeyError(dataset_id)
+        with _frames_lock:
+            return self.setdefault(dataset_id, handle)
+
+    def get(self, dataset_id, default=None):
+        try:
+            return self[dataset_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, dataset_id):
+        return self.get(dataset_id) is not None
+
+
+_handles = _LazyHandles()   # dataset_id -> _DatasetHandle over data.parquet (+ deltas)
+_frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()   # dataset_id -> frame, oldest first
+_frame_bytes: dict = {}   # dataset_id -> approximate frame size
+_dirty_frames: set = set()   # frames edited since data.parquet was last written
+_dirty_rows: dict = {}   # dataset_id -> edited row positions, when only cells changed
+_frames_lock = threading.RLock()   # guards _frames/_frame_bytes/_dirty_frames/_well_indexes
+_dataset_locks: dict = {}   # dataset_id -> _RWLock over that dataset's state
+_load_locks: dict = {}   # dataset_id -> Lock so a frame is only read from Parquet once
+
+
+def _parse_data(raw_bytes: bytes, suffix: str):
+    """Parse raw file bytes and auto-detect date columns (dayfirst=True)."""
+    if suffix == ".csv":
+        df = pd.read_csv(io.BytesIO(raw_bytes))
+    elif suffix in EXCEL_SUFFIXES:
+        df = _read_excel(raw_bytes)
+    elif suffix == ".parquet":
+        df = _plain_table(pq.read_table(pa.BufferReader(raw_bytes))).to_pandas()
+    elif suffix in FEATHER_SUFFIXES:
+        df = _plain_table(feather.read_table(pa.BufferReader(raw_bytes))).to_pandas()
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file type.")
+    return _detect_frame_dates(df)
+
+
+def _read_source(path: Path, suffix: str):
+    """_parse_data for a file on disk, or a partitioned Parquet directory."""
+    if path.is_dir():
+        return _detect_frame_dates(_plain_table(_arrow_dataset(path).to_table()).to_pandas())
+    if suffix in EXCEL_SUFFIXES:
+        return _detect_frame_dates(_read_excel(path))   # workers open the file themselves
+    return _parse_data(path.read_bytes(), suffix)
+
+
+def _detect_frame_dates(df: pd.DataFrame):
+    """Parse date-like text columns in place; typed datetime columns count as dates too."""
+    detected_dates = []
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            detected_dates.append(col)
+        # text columns are "str" (not object) dtype under pandas' string inference
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            if _looks_like_dates(df[col].dropna().head(20)):
+                df[col] = _parse_dates(df[col])
+                detected_dates.append(col)
+
+    return df, detected_dates
+
+
+def _looks_like_dates(sample: pd.Series) -> bool:
+    """Date heuristic on a small sample of non-null values (dayfirst=True)."""
+    if len(sample) == 0:
+        return False
+    first_val = str(sample.iloc[0])
+    if any(sep in first_val for sep in ['.', '/', '-']) and len(first_val) >= 6:
+        try:
+            parsed = _parse_unique_dates(sample.astype(object))
+            return parsed.notna().sum() >= len(sample) * 0.8
+        except Exception:
+            return False
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Date inference
+# ---------------------------------------------------------------------------
+# Production tables repeat the same few hundred dates for every well, so date
+# columns are parsed (and formatted) once per distinct value and broadcast
+# back. The format is inferred from the first value and applied to all of
+# them in one vectorized pass; only values it does not fit go through pandas'
+# per-element inference.
+def _date_format(value: str) -> Optional[str]:
+    """strptime format of one date string: day first, unless the string
+    starts with a four-digit year (ISO order)."""
+    year_first = value[:4].isdigit() and not value[4:5].isdigit()
+    return guess_datetime_format(value, dayfirst=not year_first)
+
+
+def _parse_unique_dates(values: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+    """Parse non-null date strings with `fmt` (inferred when omitted);
+    values that do not fit it are parsed without a format, dayfirst."""
+    if fmt is None and len(values):
+        fmt = _date_format(str(values.iloc[0]))
+    if fmt:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        misfit = parsed.isna().to_numpy()
+        if not misfit.any():
+            return parsed
+    else:
+        parsed, misfit = None, slice(None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)   # "could not infer format"
+        rest = pd.to_datetime(values[misfit], dayfirst=True, errors='coerce')
+    if parsed is None:
+        return rest
+    parsed[misfit] = rest
+    return parsed
+
+
+def _parse_dates(values: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+    """pd.to_datetime(values, dayfirst=True, errors='coerce'), parsing each
+    distinct string once."""
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return pd.to_datetime(values, errors='coerce')
+    parsed = _parse_unique_dates(pd.Series(np.asarray(uniques, dtype=object)), fmt).to_numpy()
+    return pd.Series(np.append(parsed, np.datetime64("NaT"))[codes], index=values.index, name=values.name)
+
+
+def _format_dates(values: pd.Series, fmt: str) -> np.ndarray:
+    """values.dt.strftime(fmt).fillna("") as an object array, formatting each
+    distinct date once."""
+    codes, uniques = pd.factorize(values)
+    text = pd.DatetimeIndex(uniques).strftime(fmt).to_numpy(dtype=object)
+    return np.append(text, "")[codes]
+
+
+# ---------------------------------------------------------------------------
+# Streaming CSV → Parquet ingestion
+# ---------------------------------------------------------------------------
+STREAM_BLOCK_SIZE = 16 * 1024 * 1024   # bytes of CSV parsed per record batch
+PARQUET_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'   # date columns are stored as strings
+
+
+def _detect_batch_dates(batch) -> list:
+    """Detect date columns on the first record batch (or table) of a stream."""
+    detected = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if pa.types.is_timestamp(column.type) or pa.types.is_date(column.type):
+            detected.append(name)
+        elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            if _looks_like_dates(column.slice(0, 1000).to_pandas().dropna().head(20)):
+                detected.append(name)
+    return detected
+
+
+def _dates_to_storage_strings(table: pa.Table, date_columns: list) -> pa.Table:
+    """Parse date columns (dayfirst) and re-encode them in PARQUET_DATE_FORMAT."""
+    for col in date_columns:
+        i = table.schema.get_field_index(col)
+        values = table.column(i).to_pandas()
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            values = _parse_dates(values)
+        encoded = _format_dates(values, PARQUET_DATE_FORMAT)
+        table = table.set_column(i, col, pa.array(encoded, type=pa.string()))
+    return table
+
+
+def _stream_csv_to_parquet(raw_path: Path, parquet_path: Path, on_progress=None, source=None):
+    """Parse a CSV in record batches and append each one to a Parquet file.
+
+    Peak memory is bounded by STREAM_BLOCK_SIZE, not the file size. `source`
+    replaces reading raw_path directly, e.g. an _UploadStream. Returns (rows,
+    detected_dates); see _write_batches_parquet.
+    """
+    total = max(raw_path.stat().st_size, 1)
+    with (source or open(raw_path, "rb")) as f:
+        reader = pacsv.open_csv(f, read_options=pacsv.ReadOptions(block_size=STREAM_BLOCK_SIZE))
+        batches = ((batch, min(f.tell() / total, 1.0)) for batch in reader)
+        return _write_batches_parquet(batches, parquet_path, reader.schema, on_progress)
+
+
+def _write_batches_parquet(batches, parquet_path: Path, schema: pa.Schema, on_progress=None):
+    """Write (record batch or table, fraction done) pairs to parquet_path in
+    the storage layout, one row group per batch.
+
+    Dates are detected on the first batch. `on_progress` receives the
+    fraction done, the batch just written (in storage layout) and the date
+    columns. `schema` is used when there are no batches. Returns (rows,
+    detected_dates). Raises pa.ArrowInvalid when a later batch does not fit
+    the schema of the first one.
+    """
+    tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+    rows = 0
+    writer = None
+    detected_dates = []
+    done = False
+    try:
+        for batch, frac in batches:
+            table = _plain_table(batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch]))
+            if writer is None:
+                detected_dates = _detect_batch_dates(table)
+            table = _dates_to_storage_strings(table, detected_dates)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(str(tmp_path), schema, compression='snappy')
+            writer.write_table(table.cast(schema))
+            rows += table.num_rows
+            if on_progress:
+                on_progress(frac, table, detected_dates)
+        if writer is None:
+            # header only: keep the columns
+            writer = pq.ParquetWriter(str(tmp_path), _plain_table(schema.empty_table()).schema,
+                                      compression='snappy')
+        done = True
+    finally:
+        if writer is not None:
+            writer.close()
+        if not done and tmp_path.exists():
+            tmp_path.unlink()
+    os.replace(tmp_path, parquet_path)
+    return rows, detected_dates
+
+
+# ---------------------------------------------------------------------------
+# Native Parquet / Arrow import
+# ---------------------------------------------------------------------------
+# Parquet and Arrow files carry a typed schema, so there is no text to parse.
+# A Parquet file already in a layout the handle can serve (timestamp dates,
+# plain columns, bounded row groups) becomes data.parquet byte for byte.
+# Anything else — Feather/IPC, hive-partitioned directories, text or date32
+# dates — is scanned in Arrow record batches into a new file.
+FEATHER_SUFFIXES = (".feather", ".arrow", ".ipc")
+ARROW_SUFFIXES = (".parquet",) + FEATHER_SUFFIXES
+NATIVE_MAX_ROW_GROUP = 1_000_000   # rows; larger groups make row lookups read too much, so re-encode
+IMPORT_BATCH_ROWS = 256 * 1024   # small fragments are combined into row groups of about this size
+# Server-side imports (/api/import/path) read files in place, so they are
+# off unless DCA_IMPORT_ROOT names the folder they may come from; paths are
+# resolved below it, and the app's own storage is never importable.
+IMPORT_ROOT = Path(os.environ["DCA_IMPORT_ROOT"]).resolve() if os.environ.get("DCA_IMPORT_ROOT") else None
+
+
+def _arrow_dataset(path: Path) -> pads.Dataset:
+    """Dataset over a Parquet/Feather file or a hive-partitioned directory of them."""
+    if path.is_dir():
+        fmt = "parquet" if next(path.rglob("*.parquet"), None) is not None else "ipc"
+        return pads.dataset(str(path), format=fmt, partitioning="hive")
+    return pads.dataset(str(path), format="parquet" if path.suffix.lower() == ".parquet" else "ipc")
+
+
+def _plain_table(table: pa.Table) -> pa.Table:
+    """Decode dictionary columns and drop a stored pandas index, so the table
+    matches the storage layout."""
+    index_columns = [n for n in table.column_names if n.startswith("__index_level_")]
+    if index_columns:
+        table = table.drop_columns(index_columns)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table.replace_schema_metadata(None) if table.schema.metadata else table
+
+
+def _native_parquet_dates(path: Path) -> Optional[list]:
+    """Date columns of a Parquet file that can serve as data.parquet as is,
+    or None when it needs re-encoding."""
+    pf = pq.ParquetFile(str(path))
+    meta = pf.metadata
+    if any(meta.row_group(i).num_rows > NATIVE_MAX_ROW_GROUP for i in range(meta.num_row_groups)):
+        return None
+    schema = pf.schema_arrow
+    index_columns = (schema.pandas_metadata or {}).get("index_columns", [])
+    if any(pa.types.is_dictionary(f.type) for f in schema) or any(isinstance(c, str) for c in index_columns):
+        return None
+    first = next(pf.iter_batches(batch_size=1000), None)
+    dates = _detect_batch_dates(first if first is not None else schema.empty_table())
+    for name in dates:
+        field_type = schema.field(name).type
+        if not (pa.types.is_timestamp(field_type) and field_type.tz is None):
+            return None
+    return dates
+
+
+def _import_arrow_source(path: Path, parquet_path: Path, on_progress=None):
+    """Bring a Parquet/Feather file or partitioned directory into storage as
+    parquet_path. A usable Parquet file is copied byte for byte (never
+    linked: data.parquet ends up in the version store, and the source may be
+    overwritten later). Returns (rows, detected_dates)."""
+    if path.is_file() and path.suffix.lower() == ".parquet":
+        dates = _native_parquet_dates(path)
+        if dates is not None:
+            tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, parquet_path)
+            return pq.read_metadata(str(parquet_path)).num_rows, dates
+    dataset = _arrow_dataset(path)
+    total = max(dataset.count_rows(), 1)
+
+    def batches():
+        done, pending, pending_rows = 0, [], 0
+        for batch in dataset.to_batches():
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            done += batch.num_rows
+            if pending_rows >= IMPORT_BATCH_ROWS:
+                yield pa.Table.from_batches(pending), done / total
+                pending, pending_rows = [], 0
+        if pending:
+            yield pa.Table.from_batches(pending), 1.0
+
+    return _write_batches_parquet(batches(), parquet_path, dataset.schema, on_progress)
+
+
+# ---------------------------------------------------------------------------
+# Excel ingestion
+# ---------------------------------------------------------------------------
+# Workbooks are read with calamine when installed, otherwise with openpyxl in
+# read-only mode, which streams rows instead of building the whole workbook
+# object model. Multi-sheet workbooks (one sheet per well or per field) are
+# split into groups of sheets read in parallel processes, then stacked into
+# one table.
+EXCEL_SUFFIXES = (".xlsx", ".xls")
+EXCEL_WORKERS = int(os.environ.get("DCA_EXCEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXCEL_SHEET_COLUMN = "sheet"   # added when more than one sheet holds data
+_excel_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_excel_pool() -> ProcessPoolExecutor:
+    """Lazily start the sheet-reading process pool."""
+    global _excel_pool
+    if _excel_pool is None:
+        _excel_pool = ProcessPoolExecutor(max_workers=EXCEL_WORKERS)
+    return _excel_pool
+
+
+def _excel_source(source):
+    """A readable source for a workbook given as a path or as bytes."""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _excel_sheet_names(source) -> list:
+    """Sheet names in workbook order, without loading any sheet."""
+    if python_calamine is not None:
+        with pd.ExcelFile(_excel_source(source), engine="calamine") as book:
+            return list(book.sheet_names)
+    # openpyxl scans every sheet when it opens a workbook, so read the sheet
+    # list from the package directly
+    with zipfile.ZipFile(_excel_source(source)) as archive:
+        root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    return [sheet.get("name") for sheet in root.iter() if sheet.tag.endswith("}sheet")]
+
+
+def _read_excel_sheets(source, sheets: Optional[list] = None):
+    """Read worksheets (all when `sheets` is None) with one open of the
+    workbook; the first row of each is its header. Returns (names, frames).
+    Runs in the Excel worker processes."""
+    if python_calamine is not None:
+        frames = pd.read_excel(_excel_source(source), sheet_name=sheets, engine="calamine")
+        return list(frames), list(frames.values())
+    import openpyxl
+    book = openpyxl.load_workbook(_excel_source(source), read_only=True, data_only=True)
+    try:
+        names = book.sheetnames if sheets is None else sheets
+        frames = [_sheet_frame(book[name]) for name in names]
+    finally:
+        book.close()
+    return names, frames
+
+
+def _sheet_frame(sheet) -> pd.DataFrame:
+    """Stream the rows of an openpyxl read-only worksheet into a DataFrame."""
+    if not hasattr(sheet, "iter_rows"):
+        return pd.DataFrame()   # chart sheet
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+    df = pd.DataFrame.from_records(list(rows), columns=columns, coerce_float=True)
+    # formatted but empty rows and columns come back as all-None
+    df = df.dropna(how="all").reset_index(drop=True)
+    unnamed = [c for c in df.columns if c.startswith("Unnamed: ") and df[c].isna().all()]
+    return df.drop(columns=unnamed).infer_objects()
+
+
+def _read_excel(source) -> pd.DataFrame:
+    """Read a workbook (path or bytes). Sheets with the same columns as the
+    first sheet holding data are stacked, with their name in
+    EXCEL_SHEET_COLUMN when there is more than one; other sheets (notes,
+    lookup tables) are left out. With EXCEL_WORKERS > 1, groups of sheets
+    are read in parallel processes."""
+    shards = []
+    if EXCEL_WORKERS > 1:
+        names = _excel_sheet_names(source)
+        shards = _shard_series(names, min(EXCEL_WORKERS, len(names)))
+    if len(shards) > 1:
+        parts = list(_get_excel_pool().map(_read_excel_sheets, repeat(source), shards))
+        names = [name for part_names, _ in parts for name in part_names]
+        frames = [frame for _, part_frames in parts for frame in part_frames]
+    else:
+        names, frames = _read_excel_sheets(source)
+    sheets = [(name, df) for name, df in zip(names, frames) if len(df)]
+    if not sheets:
+        return frames[0] if frames else pd.DataFrame()
+    columns = set(sheets[0][1].columns)
+    sheets = [(name, df) for name, df in sheets if set(df.columns) == columns]
+    if len(sheets) == 1:
+        return sheets[0][1]
+    df = pd.concat([sheet_df for _, sheet_df in sheets], ignore_index=True)
+    if EXCEL_SHEET_COLUMN not in df.columns:
+        sheet_names = np.repeat([name for name, _ in sheets], [len(sheet_df) for _, sheet_df in sheets])
+        df.insert(0, EXCEL_SHEET_COLUMN, sheet_names)
+    return df
+
+
+def _load_parquet_frame(parquet_path: Path, date_columns: list) -> pd.DataFrame:
+    """Read a stored Parquet file back into a DataFrame with real date dtypes."""
+    return _DatasetHandle(parquet_path, date_columns).read()
+
+
+def _write_frame_parquet(df: pd.DataFrame, date_columns: list, parquet_path: Path, metadata=None):
+    """Write a frame in the storage layout (dates as strings). The file is
+    replaced atomically so open handles keep reading the previous copy."""
+    export_df = df.copy()
+    for col in date_columns:
+        if col in export_df.columns and pd.api.types.is_datetime64_any_dtype(export_df[col]):
+            export_df[col] = _format_dates(export_df[col], PARQUET_DATE_FORMAT)
+    table = pa.Table.from_pandas(export_df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    tmp_path = Path(str(parquet_path) + ".tmp")
+    pq.write_table(table, str(tmp_path), compression='snappy')
+    os.replace(tmp_path, parquet_path)
+
+
+def _write_file_atomic(path: Path, data: bytes):
+    """Replace a stored file with new bytes. Stored files are never rewritten
+    in place, so a hard link to one (a version object) keeps its content."""
+    tmp_path = Path(str(path) + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+# Incremental syncs store only the changed rows. A delta file holds whole rows
+# plus their target position: positions inside the base file replace that row,
+# positions past its end append. Deltas apply in order on top of data.parquet
+# until enough of them pile up to be folded into a new base file.
+DELTA_ROW_COLUMN = "__row__"
+DELTA_ROWS_KEY = b"dca_num_rows"   # footer metadata: dataset row count after this delta
+DELTA_COMPACT_FILES = 16   # fold deltas into data.parquet once this many exist
+
+
+def _write_delta_parquet(rows: pd.DataFrame, positions, date_columns: list, parquet_path: Path, num_rows: int):
+    """Write one delta file (`rows` destined for `positions`)."""
+    export_df = rows.reset_index(drop=True)
+    export_df.insert(0, DELTA_ROW_COLUMN, np.asarray(positions, dtype=np.int64))
+    _write_frame_parquet(export_df, date_columns, parquet_path, metadata={DELTA_ROWS_KEY: str(num_rows)})
+
+
+# ---------------------------------------------------------------------------
+# Lazy, memory-mapped dataset handle
+# ---------------------------------------------------------------------------
+class _DatasetHandle:
+    """Read-only view of a dataset's data.parquet.
+
+    Only footer metadata is kept in memory; reads load just the columns (and
+    row groups) the caller asks for. Date columns are converted back from
+    their stored strings on the way out. The file is mapped once when the
+    handle opens, so a handle is a stable snapshot: replacing data.parquet
+    (always via rename) does not change what an existing handle reads.
+
+    Incremental syncs add delta files on top of the base file (see
+    _write_delta_parquet); they are applied in order on every read.
+    """
+
+    def __init__(self, parquet_path, date_columns: list, deltas=()):
+        self.path = str(parquet_path)
+        self.date_columns = list(date_columns)
+        self._source = pa.memory_map(self.path)
+        pf = pq.ParquetFile(self._source)
+        meta = pf.metadata
+        self.base_rows = meta.num_rows
+        self.schema = pf.schema_arrow
+        self.columns = list(self.schema.names)
+        self._rg_offsets = np.cumsum([0] + [meta.row_group(i).num_rows for i in range(meta.num_row_groups)])
+        self.deltas = [str(p) for p in deltas]
+        self._delta_sources = [pa.memory_map(p) for p in self.deltas]
+        self._delta_frame = None   # all delta rows, indexed by position (loaded on first use)
+        self.num_rows = self.base_rows
+        if self._delta_sources:
+            meta = pq.read_metadata(self._delta_sources[-1]).metadata or {}
+            self.num_rows = int(meta.get(DELTA_ROWS_KEY, self.base_rows))
+
+    def __len__(self):
+        return self.num_rows
+
+    def numeric_columns(self) -> list:
+        return [f.name for f in self.schema
+                if (pa.types.is_integer(f.type) or pa.types.is_floating(f.type))
+                and f.name not in self.date_columns]
+
+    def _to_pandas(self, table: pa.Table) -> pd.DataFrame:
+        df = table.to_pandas()
+        for col in self.date_columns:
+            if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = _parse_dates(df[col], PARQUET_DATE_FORMAT)
+        return df
+
+    def read(self, columns=None, well_col: Optional[str] = None, wells=None) -> pd.DataFrame:
+        """Load selected columns. With `well_col`/`wells`, rows are filtered in
+        the Parquet reader (row groups whose statistics exclude the wells are skipped)."""
+        if columns is not None:
+            columns = list(dict.fromkeys(columns))
+        if self.deltas:
+            # patched rows may move between wells: filter after applying deltas
+            df = self._apply_deltas(self._to_pandas(pq.read_table(self._source, columns=columns)))
+            if well_col is not None and wells is not None:
+                df = df[df[well_col].astype(str).isin(list(wells))].reset_index(drop=True)
+            return df
+        filters = None
+        if well_col is not None and wells is not None:
+            field = self.schema.field(well_col)
+            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                filters = [(well_col, "in", list(wells))]
+        table = pq.read_table(self._source, columns=columns, filters=filters)
+        df = self._to_pandas(table)
+        if well_col is not None and wells is not None and filters is None:
+            df = df[df[well_col].astype(str).isin(list(wells))].reset_index(drop=True)
+        return df
+
+    def take(self, positions, columns=None) -> pd.DataFrame:
+        """Rows at absolute positions (order preserved), reading only the row groups that hold them."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if not self.deltas:
+            return self._take_base(positions, columns)
+        names = self.columns if columns is None else list(columns)
+        delta = self._load_deltas()
+        in_delta = np.isin(positions, delta.index.to_numpy())
+        if not in_delta.any():
+            return self._take_base(positions, names)
+        patched = delta.loc[positions[in_delta], names].reset_index(drop=True)
+        if in_delta.all():
+            return patched
+        base = self._take_base(positions[~in_delta], names)
+        parts = [base.set_axis(np.flatnonzero(~in_delta)), patched.set_axis(np.flatnonzero(in_delta))]
+        return pd.concat(parts).sort_index().reset_index(drop=True)
+
+    def _take_base(self, positions: np.ndarray, columns=None) -> pd.DataFrame:
+        if len(positions) == 0:
+            names = self.columns if columns is None else list(columns)
+            return self._to_pandas(self.schema.empty_table().select(names))
+        groups = np.unique(np.searchsorted(self._rg_offsets, positions, side="right") - 1)
+        pf = pq.ParquetFile(self._source)
+        table = pf.read_row_groups([int(g) for g in groups], columns=columns)
+        # position of each selected row group's first row inside `table`
+        sizes = self._rg_offsets[groups + 1] - self._rg_offsets[groups]
+        local_start = dict(zip(groups, np.concatenate([[0], np.cumsum(sizes)[:-1]])))
+        g_of = np.searchsorted(self._rg_offsets, positions, side="right") - 1
+        local = positions - self._rg_offsets[g_of] + np.array([local_start[g] for g in g_of], dtype=np.int64)
+        return self._to_pandas(table.take(pa.array(local)))
+
+    def head(self, n: int) -> pd.DataFrame:
+        return self.take(np.arange(min(n, self.num_rows)))
+
+    def iter_batches(self, columns=None, batch_rows: int = 65536):
+        """Every row in order, `batch_rows` at a time, with deltas applied."""
+        names = self.columns if columns is None else list(columns)
+        delta = self._load_deltas()[names] if self.deltas else None
+        start = 0
+        for batch in pq.ParquetFile(self._source).iter_batches(batch_size=batch_rows, columns=names):
+            df = self._to_pandas(pa.Table.from_batches([batch]))
+            if delta is not None:
+                hit = delta[(delta.index >= start) & (delta.index < start + len(df))]
+                if len(hit):
+                    df = _patch_rows(df, hit.index.to_numpy() - start, hit)
+            start += len(df)
+            yield df
+        if delta is not None:
+            appended = delta[delta.index >= self.base_rows]
+            for a in range(0, len(appended), batch_rows):
+                yield appended.iloc[a:a + batch_rows].reset_index(drop=True)
+
+    def _load_deltas(self) -> pd.DataFrame:
+        """Every delta row, latest write per position, indexed by position."""
+        if self._delta_frame is None:
+            parts = [self._to_pandas(pq.read_table(src)) for src in self._delta_sources]
+            delta = pd.concat(parts, ignore_index=True)
+            delta = delta.drop_duplicates(DELTA_ROW_COLUMN, keep="last").set_index(DELTA_ROW_COLUMN).sort_index()
+            self._delta_frame = delta.rename_axis(None)
+        return self._delta_frame
+
+    def _apply_deltas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Patch rows of a full read of the base file and append new rows."""
+        delta = self._load_deltas()[list(df.columns)]
+        patched = delta[delta.index < self.base_rows]
+        if len(patched):
+            df = _patch_rows(df, patched.index.to_numpy(), patched)
+        appended = delta[delta.index >= self.base_rows]
+        if len(appended):
+            df = pd.concat([df, appended], ignore_index=True)
+        return df
+
+
+def _patch_rows(df: pd.DataFrame, positions: np.ndarray, rows: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `df` with the rows at `positions` replaced by `rows` (shared
+    columns only). Columns widen where a new value does not fit their dtype."""
+    out = df.copy(deep=False)
+    hit = np.zeros(len(df), dtype=bool)
+    hit[positions] = True
+    for col in rows.columns.intersection(df.columns):
+        values = pd.Series(rows[col].to_numpy(), index=positions).reindex(df.index)
+        out[col] = df[col].mask(hit, values)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Per-dataset access (handles, frame LRU, locks)
+# ---------------------------------------------------------------------------
+# Concurrency model: a dataset's state (handle, frame, date columns, versions)
+# is only replaced under the write side of its _RWLock, and readers hold the
+# read side while they use it, so they never see half of an update. Frames
+# are copy-on-write: edits build a shallow copy, change it and swap it in, so
+# a reader holding the old frame keeps a consistent snapshot. Slow work
+# (parsing, Parquet writes of new imports, frame loads) runs before the write
+# lock is taken. Locks are only ever taken in executor threads (see
+# `_locked`): a handler waiting for one on the event-loop thread would stall
+# every other request. The write side is re-entrant per thread.
+class _RWLock:
+    """Many readers or one writer. Waiting writers hold back new readers so
+    a stream of reads cannot starve an edit."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None   # thread ident of the writer
+        self._depth = 0   # re-entrant write depth
+        self._waiting = 0   # writers queued
+
+    def acquire_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth += 1   # the writer may read its own state
+                return
+            while self._writer is not None or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking: bool = True) -> bool:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return True
+            if not blocking and (self._writer is not None or self._readers):
+                return False
+            self._waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = me
+            self._depth = 1
+            return True
+
+    def try_write(self) -> bool:
+        return self.acquire_write(blocking=False)
+
+    def release_write(self):
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+_frame_stats = {"loads": 0, "evictions": 0, "write_backs": 0}
+
+
+def _resolve_dataset(dataset_id: Optional[str], detail: str = "No dataset loaded.") -> str:
+    """The dataset a request addresses (explicit id, else the active one).
+    404 unless it has finished loading."""
+    ds_id = dataset_id or _active_dataset_id
+    if ds_id is None or (ds_id not in _handles and ds_id not in _frames):
+        raise HTTPException(404, detail if dataset_id is None else "Dataset not found.")
+    return ds_id
+
+
+def _dataset_lock(dataset_id: str) -> "_RWLock":
+    with _frames_lock:
+        return _dataset_locks.setdefault(dataset_id, _RWLock())
+
+
+async def _locked(dataset_id: str, fn, *args, write: bool = False):
+    """Run fn(*args) under the dataset's read (or write) lock in the default
+    executor, so waiting for the lock never blocks the event loop."""
+    def run():
+        lock = _dataset_lock(dataset_id)
+        with (lock.write() if write else lock.read()):
+            return fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, run)
+
+
+def _peek_frame(dataset_id: str) -> Optional[pd.DataFrame]:
+    """The dataset's materialized frame if it is loaded (marks it recently used)."""
+    with _frames_lock:
+        df = _frames.get(dataset_id)
+        if df is not None:
+            _frames.move_to_end(dataset_id)
+        return df
+
+
+def _get_frame(dataset_id: str) -> Optional[pd.DataFrame]:
+    """Materialize a dataset for endpoints that edit or need every row
+    (blocking). From then on the in-memory frame is authoritative.
+    The Parquet read happens outside the dataset lock; only the install
+    takes the write side."""
+    df = _peek_frame(dataset_id)
+    if df is not None:
+        return df
+    with _frames_lock:
+        load_lock = _load_locks.setdefault(dataset_id, threading.Lock())
+    with load_lock:
+        df = _peek_frame(dataset_id)   # loaded by another request meanwhile
+        if df is not None or dataset_id not in _handles:
+            return df
+        handle = _handles[dataset_id]
+        loaded = handle.read()
+        with _dataset_lock(dataset_id).write():
+            df = _peek_frame(dataset_id)
+            if df is None and _handles.get(dataset_id) is handle:
+                df = loaded
+                _frame_stats["loads"] += 1
+                _set_frame(dataset_id, df)
+    if df is None:
+        return _get_frame(dataset_id)   # re-imported while we were reading
+    return df
+
+
+async def _load_frame(dataset_id: str) -> Optional[pd.DataFrame]:
+    """`_get_frame` without blocking the event loop on the Parquet read."""
+    df = _peek_frame(dataset_id)
+    if df is None:
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, _get_frame, dataset_id)
+    return df
+
+
+def _editable_frame(dataset_id: str) -> pd.DataFrame:
+    """The current frame for a writer holding the dataset's write lock
+    (re-read inline in the rare case it was evicted since `_load_frame`)."""
+    df = _peek_frame(dataset_id)
+    if df is None:
+        df = _handles[dataset_id].read()
+        _frame_stats["loads"] += 1
+        _set_frame(dataset_id, df)
+    return df
+
+
+def _frame_size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _set_frame(dataset_id: str, df: Optional[pd.DataFrame], dirty: bool = False):
+    """Install a dataset's frame, or unload it with df=None (edits discarded)."""
+    with _frames_lock:
+        _frames.pop(dataset_id, None)
+        _frame_bytes.pop(dataset_id, None)
+        _dirty_frames.discard(dataset_id)
+        _dirty_rows.pop(dataset_id, None)
+        if df is not None:
+            _frames[dataset_id] = df
+            _frame_bytes[dataset_id] = _frame_size(df)
+            if dirty:
+                _dirty_frames.add(dataset_id)
+        evicted = _evict_frames(keep=dataset_id)
+    _persist_evicted(evicted)
+
+
+def _swap_frame(dataset_id: str, df: pd.DataFrame, resized: bool = False, dirty: bool = True,
+                rows=None):
+    """Publish an edited copy of a loaded frame (copy-on-write: readers that
+    already hold the previous frame keep a consistent view). Well indexes
+    are re-pointed at the new frame; `resized` after adding or dropping
+    columns so the memory budget sees the new size. `rows` lists the edited
+    positions when only cells changed (written back as a delta); `dirty=False`
+    when the change is already on disk (the dirty flag is left as it was)."""
+    evicted = []
+    with _frames_lock:
+        old = _frames.get(dataset_id)
+        _frames[dataset_id] = df
+        if dirty:
+            if rows is not None and (dataset_id not in _dirty_frames or dataset_id in _dirty_rows):
+                _dirty_rows.setdefault(dataset_id, set()).update(rows)
+            else:
+                _dirty_rows.pop(dataset_id, None)
+            _dirty_frames.add(dataset_id)
+        for (idx_ds, _), idx in _well_indexes.items():
+            if idx_ds == dataset_id and idx.df is old:
+                idx.df = df
+        if resized:
+            _frame_bytes[dataset_id] = _frame_size(df)
+            evicted = _evict_frames(keep=dataset_id)
+    _persist_evicted(evicted)
+
+
+def _evict_frames(keep: Optional[str] = None) -> list:
+    """Drop least-recently-used frames until the budget is met. Frames whose
+    dataset is in use (lock held elsewhere) are skipped. Needs _frames_lock.
+    Edited frames are only marked clean here and stay loaded: they are
+    returned as (dataset_id, frame, rows) with their write lock still held,
+    for `_persist_evicted` to write back once _frames_lock is released."""
+    evicted = []
+    total = sum(_frame_bytes.values())
+    for victim in list(_frames):
+        if total <= FRAME_CACHE_BUDGET:
+            break
+        lock = _dataset_lock(victim)
+        if victim == keep or not lock.try_write():
+            continue
+        total -= _frame_bytes.get(victim, 0)
+        if victim in _dirty_frames:
+            _dirty_frames.discard(victim)
+            evicted.append((victim, _frames[victim], _dirty_rows.pop(victim, None)))
+            continue
+        try:
+            _drop_frame(victim)
+        finally:
+            lock.release_write()
+    return evicted
+
+
+def _drop_frame(dataset_id: str):
+    """Unload a clean frame. Needs _frames_lock."""
+    _frames.pop(dataset_id)
+    _frame_bytes.pop(dataset_id, None)
+    _refresh_well_indexes(dataset_id, None)
+    _frame_stats["evictions"] += 1
+
+
+def _persist_evicted(evicted: list):
+    """Write back the edited frames `_evict_frames` picked, then drop each
+    one unless it was edited or replaced meanwhile."""
+    for victim, df, rows in evicted:
+        lock = _dataset_lock(victim)
+        try:
+            try:
+                _persist_frame(victim, df, rows)
+            except Exception:
+                _mark_dirty(victim, df, rows)
+                raise
+            with _frames_lock:
+                if _frames.get(victim) is df and victim not in _dirty_frames:
+                    _drop_frame(victim)
+        finally:
+            lock.release_write()
+
+
+def _mark_dirty(dataset_id: str, df: pd.DataFrame, rows):
+    """Flag a frame as edited again after its write-back failed."""
+    with _frames_lock:
+        if _frames.get(dataset_id) is not df:
+            return
+        if rows is None:
+            _dirty_rows.pop(dataset_id, None)
+        elif dataset_id not in _dirty_frames or dataset_id in _dirty_rows:
+            _dirty_rows.setdefault(dataset_id, set()).update(rows)
+        _dirty_frames.add(dataset_id)
+
+
+def _persist_frame(dataset_id: str, df: pd.DataFrame, rows=None):
+    """Write an edited frame back to disk and re-open the handle. Cell edits
+    (`rows`: the edited positions) are stored as one delta of those rows;
+    other changes rewrite data.parquet (folding in any delta files).
+    Call under the dataset's write lock, without _frames_lock."""
+    ds = _datasets[dataset_id]
+    handle = _handles[dataset_id]
+    if rows is not None and list(df.columns) == handle.columns and len(df) == handle.num_rows:
+        positions = np.array(sorted(rows), dtype=np.int64)
+        delta = _write_delta_object(dataset_id, df.iloc[positions], positions, handle.date_columns, len(df))
+        _set_handle(dataset_id, _DatasetHandle(handle.path, handle.date_columns, handle.deltas + [delta]))
+        if len(handle.deltas) + 1 >= DELTA_COMPACT_FILES:
+            _worker_pool.submit(_compact_deltas, dataset_id)
+    else:
+        parquet_path = STORAGE_DIR / dataset_id / "data.parquet"
+        _write_frame_parquet(df, ds["date_columns"], parquet_path)
+        _set_handle(dataset_id, _DatasetHandle(parquet_path, ds["date_columns"]))
+    _gc_dataset_files(dataset_id)
+    _save_dataset_record(dataset_id)
+    _clear_edit_log(dataset_id, versioned=False)   # its edits are on disk now
+    _frame_stats["write_backs"] += 1
+
+
+def _write_back(dataset_id: str) -> bool:
+    """Persist a dataset's edited frame now, if it has one. Call under its
+    write lock (the frame cannot change meanwhile); the Parquet write runs
+    after _frames_lock is released."""
+    with _frames_lock:
+        df = _frames.get(dataset_id)
+        if df is None or dataset_id not in _dirty_frames:
+            return False
+        _dirty_frames.discard(dataset_id)
+        rows = _dirty_rows.pop(dataset_id, None)
+    try:
+        _persist_frame(dataset_id, df, rows)
+    except Exception:
+        _mark_dirty(dataset_id, df, rows)
+        raise
+    return True
+
+
+def _flush_dirty_frames():
+    """Write every edited frame back to disk (on shutdown)."""
+    for dataset_id in list(_dirty_frames):
+        with _dataset_lock(dataset_id).write():
+            _write_back(dataset_id)
+
+
+# ---------------------------------------------------------------------------
+# Cell edits: write-ahead log + periodic flush
+# ---------------------------------------------------------------------------
+# Cell edits change only the in-memory frame. Each batch is first appended
+# (and fsynced) to STORAGE_DIR/<id>/edits.wal, so a crash loses nothing; every
+# EDIT_FLUSH_INTERVAL seconds the edited rows are written as one delta file
+# and recorded as a version, and the log starts over. At startup, logs left
+# behind are replayed onto the stored data and flushed the same way.
+EDIT_LOG_NAME = "edits.wal"
+EDIT_FLUSH_INTERVAL = float(os.environ.get("DCA_EDIT_FLUSH_SECONDS", "30"))
+EDIT_PATCH_ROWS = 64   # edits up to this many rows patch well indexes in place; more drop them
+_edit_logs: dict = {}   # dataset_id -> edit log holding batches not yet on disk
+_unversioned_edits: set = set()   # datasets whose flushed edits still need a version
+
+
+def _log_cell_edits(dataset_id: str, rows: list, columns: list, values: list):
+    """Append one batch of edits to the dataset's log. Call under its write lock."""
+    path = STORAGE_DIR / dataset_id / EDIT_LOG_NAME
+    line = json.dumps({"rows": rows, "columns": columns, "values": values}, default=str)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    _edit_logs[dataset_id] = path
+
+
+def _clear_edit_log(dataset_id: str, versioned: bool = True):
+    """Drop a dataset's log once its edits are on disk (`versioned=False`:
+    a version still has to be recorded) or superseded by new data."""
+    path = STORAGE_DIR / dataset_id / EDIT_LOG_NAME
+    if path.exists():
+        path.unlink()
+        if not versioned:
+            _unversioned_edits.add(dataset_id)
+    _edit_logs.pop(dataset_id, None)
+    if versioned:
+        _unversioned_edits.discard(dataset_id)
+
+
+def _read_edit_log(path: Path) -> list:
+    """Batches of an edit log; a line torn by a crash ends it."""
+    batches = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                batches.append(json.loads(line))
+            except ValueError:
+                break
+    return batches
+
+
+def _convert_cells(column: pd.Series, values: list):
+    """Parse edited values for a column's dtype (dates day first). Blank
+    values clear the cell. Returns (converted, unparseable positions)."""
+    raw = pd.Series(values, dtype=object)
+    blank = (raw.isna() | raw.map(lambda v: isinstance(v, str) and not v.strip())).to_numpy(dtype=bool)
+    raw = raw.where(~blank)
+    if pd.api.types.is_bool_dtype(column):
+        text = raw.astype(str).str.strip().str.lower()
+        converted = text.map({"true": True, "1": True, "false": False, "0": False})
+    elif pd.api.types.is_numeric_dtype(column):
+        try:
+            converted = raw.astype(np.float64)   # exact, unlike to_numeric's fast parser
+        except (TypeError, ValueError):
+            converted = pd.to_numeric(raw, errors="coerce")   # to locate the bad values
+    elif pd.api.types.is_datetime64_any_dtype(column):
+        converted = _parse_dates(raw.map(lambda v: v if pd.isna(v) else str(v).strip()))
+    else:
+        converted = raw.map(lambda v: v if pd.isna(v) else str(v))
+    bad = np.flatnonzero(converted.isna().to_numpy() & ~blank)
+    return converted, bad
+
+
+def _apply_cell_edits(dataset_id: str, df: pd.DataFrame, rows: list, columns: list, values: list,
+                      log: bool = True):
+    """Apply a batch of (row, column, value) edits as one copy-on-write frame
+    swap; derived columns that read an edited column follow on the edited
+    rows. Later edits of the same cell win. The batch is validated, then
+    logged (`log`), then applied. Call under the dataset's write lock.
+    Returns (frame, edited row positions, changed columns)."""
+    if not (len(rows) == len(columns) == len(values)):
+        raise HTTPException(400, "rows, columns and values must have the same length.")
+    edits = pd.DataFrame({"row": np.asarray(rows, dtype=np.int64), "column": pd.Series(columns, dtype=object),
+                          "value": pd.Series(values, dtype=object)})
+    edits = edits.drop_duplicates(["row", "column"], keep="last")
+    unknown = sorted(set(edits["column"]) - set(df.columns))
+    if unknown:
+        raise HTTPException(400, f"Column(s) not found: {unknown}.")
+    out_of_range = edits["row"][(edits["row"] < 0) | (edits["row"] >= len(df))]
+    if len(out_of_range):
+        raise HTTPException(400, f"Row {int(out_of_range.iloc[0])} out of range.")
+
+    new_df = df.copy(deep=False)
+    edited = list(dict.fromkeys(edits["column"]))
+    for col, group in edits.groupby("column", sort=False):
+        converted, bad = _convert_cells(df[col], group["value"].tolist())
+        if len(bad):
+            cell = group.iloc[bad[0]]
+            raise HTTPException(400, f"Value {cell['value']!r} (row {cell['row']}) does not fit column "
+                                     f"'{col}'; {len(bad)} value(s) rejected.")
+        # copy-on-write: only the edited columns are copied
+        target = df[col].copy()
+        if pd.api.types.is_integer_dtype(target) and not (
+                converted.notna().all() and (converted == converted.round()).all()):
+            target = target.astype(np.float64)
+        try:
+            target.iloc[group["row"].to_numpy()] = converted.astype(target.dtype).to_numpy()
+        except (TypeError, ValueError) as e:
+            raise HTTPException(400, f"Values do not fit column '{col}': {e}")
+        new_df[col] = target
+    if log:
+        _log_cell_edits(dataset_id, list(map(int, rows)), list(columns), list(values))
+
+    positions = np.unique(edits["row"].to_numpy())
+    new_df, _ = _replay_derived_columns(dataset_id, new_df, changed=edited, rows=positions)
+    levels = _derived_levels(_derived_columns.get(dataset_id, []), edited)
+    changed = edited + [d["name"] for level in levels for d in level
+                        if d["name"] in new_df.columns and d["name"] not in edited]
+
+    _swap_frame(dataset_id, new_df, rows=positions.tolist())
+    _invalidate_column_caches(dataset_id, changed)
+    with _frames_lock:
+        for key, idx in list(_well_indexes.items()):
+            if key[0] != dataset_id or idx.df is not new_df:
+                continue
+            if len(positions) <= EDIT_PATCH_ROWS:
+                for row in positions:
+                    for col in changed:
+                        idx.update_cell(int(row), col)
+            elif key[1] in changed:
+                del _well_indexes[key]   # rebuilt on next use
+            else:
+                for col in changed:
+                    idx.drop_column(col)
+    return new_df, positions, changed
+
+
+def _flush_edit_logs():
+    """Write logged edits to disk as a delta and record a version for them."""
+    for dataset_id in list(_edit_logs):
+        with _dataset_lock(dataset_id).write():
+            if not _write_back(dataset_id):
+                _clear_edit_log(dataset_id, versioned=False)   # already written (evicted)
+    for dataset_id in list(_unversioned_edits):
+        _unversioned_edits.discard(dataset_id)
+        if dataset_id in _handles:
+            frame = _peek_frame(dataset_id)
+            _save_version_snapshot(dataset_id, frame if frame is not None else _handles[dataset_id],
+                                   _datasets[dataset_id]["date_columns"])
+
+
+async def _edit_flush_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(EDIT_FLUSH_INTERVAL)
+        try:
+            await loop.run_in_executor(None, _flush_edit_logs)
+        except Exception:
+            pass   # retried on the next tick; the logs are still there
+
+
+def _recover_edit_logs():
+    """Replay edit logs left by a crash onto the stored data and flush them."""
+    for path in STORAGE_DIR.glob(f"*/{EDIT_LOG_NAME}"):
+        dataset_id = path.parent.name
+        if dataset_id not in _handles:
+            path.unlink()
+            continue
+        df = _get_frame(dataset_id)
+        with _dataset_lock(dataset_id).write():
+            for batch in _read_edit_log(path):
+                df = _editable_frame(dataset_id)
+                present = [i for i, c in enumerate(batch["columns"]) if c in df.columns]
+                try:
+                    _apply_cell_edits(dataset_id, df, [batch["rows"][i] for i in present],
+                                      [batch["columns"][i] for i in present],
+                                      [batch["values"][i] for i in present], log=False)
+                except HTTPException:
+                    pass   # no longer applies (e.g. rows removed since)
+            _edit_logs[dataset_id] = path
+    _flush_edit_logs()
+
+
+def _set_handle(dataset_id: str, handle: "_DatasetHandle"):
+    """Publish a dataset's handle and note its files for the registry.
+    Call under the dataset's write lock."""
+    ds = _datasets[dataset_id]
+    _handles[dataset_id] = handle
+    ds["base_path"] = handle.path
+    ds["deltas"] = list(handle.deltas)
+
+
+def _dataset_columns(dataset_id: str) -> list:
+    df = _frames.get(dataset_id)
+    if df is not None:
+        return list(df.columns)
+    handle = _handles.get(dataset_id)
+    return list(handle.columns) if handle is not None else []
+
+
+def _dataset_numeric_columns(dataset_id: str) -> list:
+    df = _frames.get(dataset_id)
+    if df is not None:
+        return list(df.select_dtypes(include="number").columns)
+    handle = _handles.get(dataset_id)
+    return handle.numeric_columns() if handle is not None else []
+
+
+def _dataset_num_rows(dataset_id: str) -> int:
+    df = _frames.get(dataset_id)
+    if df is not None:
+        return len(df)
+    handle = _handles.get(dataset_id)
+    return handle.num_rows if handle is not None else 0
+
+
+def _install_dataset(dataset_id: str, handle: "_DatasetHandle", df: Optional[pd.DataFrame],
+                     date_columns: list, dirty: bool = False):
+    """Make freshly imported data current for a dataset: swap in its handle
+    and frame (None = stay lazy) and refresh the registry summary."""
+    ds = _datasets[dataset_id]
+    with _dataset_lock(dataset_id).write():
+        ds["date_columns"] = date_columns
+        _set_handle(dataset_id, handle)
+        _invalidate_column_caches(dataset_id)
+        _set_frame(dataset_id, df, dirty)
+        _clear_edit_log(dataset_id)   # edits of the previous data are superseded
+        _refresh_well_indexes(dataset_id, df)
+        ds["rows"] = _dataset_num_rows(dataset_id)
+        ds["columns"] = _dataset_columns(dataset_id)
+        ds["numeric_columns"] = _dataset_numeric_columns(dataset_id)
+        ds["last_import"] = datetime.now(timezone.utc).isoformat()
+        _save_dataset_record(dataset_id)
+
+
+def _commit_import(dataset_id: str, staged_path: Path, df: Optional[pd.DataFrame],
+                   date_columns: list, dirty: bool = False):
+    """Publish a freshly written Parquet file as the dataset's data.parquet
+    and install it, as one step under the write lock. Returns the new handle."""
+    parquet_path = STORAGE_DIR / dataset_id / "data.parquet"
+    with _dataset_lock(dataset_id).write():
+        os.replace(staged_path, parquet_path)
+        handle = _DatasetHandle(parquet_path, date_columns)
+        _install_dataset(dataset_id, handle, df, date_columns, dirty)
+    return handle
+
+
+def _track_disk_file(ds: dict):
+    """Remember whether the upload also exists on disk (cwd, or where it was
+    imported from) for auto-reload."""
+    disk_path = Path(ds.get("source_path") or Path.cwd() / ds["filename"])
+    if disk_path.exists():
+        ds["disk_path"] = str(disk_path)
+        ds["disk_mtime"] = disk_path.stat().st_mtime
+    else:
+        ds["disk_path"] = None
+        ds["disk_mtime"] = 0
+
+
+def _build_upload_response(dataset_id: str, **extra):
+    """Build the standard JSON response with data summary."""
+    ds = _datasets[dataset_id]
+    return JSONResponse({
+        **extra,
+        "filename": ds["filename"],
+        "rows": _dataset_num_rows(dataset_id),
+        "columns": _dataset_columns(dataset_id),
+        "numeric_columns": _dataset_numeric_columns(dataset_id),
+        "date_columns": ds["date_columns"],
+        "preview": _build_preview_list(dataset_id),
+        "has_disk_path": ds.get("disk_path") is not None,
+        "last_import": ds.get("last_import"),
+        "dataset_id": dataset_id,
+        "version": _get_current_version_number(dataset_id),
+    })
+
+
+def _get_current_version_number(dataset_id: Optional[str]):
+    """Return the current version number for a dataset."""
+    if not _versions.get(dataset_id):
+        return 0
+    return _versions[dataset_id][-1]["version"]
+
+
+# Version storage: every file a version needs is kept once in the dataset's
+# objects/ folder, named by a hash of its content. data.parquet is only ever
+# replaced by rename, so it is hard-linked in rather than copied, and delta
+# files are moved in. A version is a base object plus delta objects, so it
+# costs only the bytes that are not stored already.
+_object_ids: dict = {}   # (path, inode, mtime_ns, size) -> object holding that file
+
+
+def _file_digest(path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _store_object(dataset_id: str, path, move: bool = False) -> str:
+    """Add a file to the dataset's object store and return the object path.
+    Identical content is stored once; `move` consumes `path`."""
+    path = Path(path)
+    obj_dir = STORAGE_DIR / dataset_id / "objects"
+    if path.parent == obj_dir:
+        return str(path)
+    st = path.stat()
+    ident = (str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+    known = _object_ids.get(ident)
+    if known is not None and Path(known).exists():
+        return known
+    obj_dir.mkdir(exist_ok=True)
+    obj = obj_dir / f"{_file_digest(path)}.parquet"
+    if obj.exists():
+        if move:
+            path.unlink()
+    elif move:
+        os.replace(path, obj)
+    else:
+        try:
+            os.link(path, obj)
+        except OSError:
+            tmp_path = Path(str(obj) + ".tmp")
+            shutil.copy2(str(path), str(tmp_path))
+            os.replace(tmp_path, obj)
+        _object_ids[ident] = str(obj)
+    return str(obj)
+
+
+def _write_delta_object(dataset_id: str, rows: pd.DataFrame, positions, date_columns: list, num_rows: int) -> str:
+    """Write a delta file straight into the object store. Needs no lock:
+    each call stages under its own name."""
+    staged_path = STORAGE_DIR / dataset_id / f"delta.{uuid.uuid4().hex[:12]}.parquet"
+    _write_delta_parquet(rows, positions, date_columns, staged_path, num_rows)
+    return _store_object(dataset_id, staged_path, move=True)
+
+
+def _save_version_snapshot(dataset_id: str, df: pd.DataFrame, date_columns: list):
+    """Record the dataset's current files as a new version."""
+    ds = _datasets.get(dataset_id)
+    if not ds:
+        return
+
+    # Hashing and storing the files reads all of data.parquet, so it runs
+    # without the lock. Only the version entry is added under the write lock
+    # (readers never see a half-pruned version list); if an import swapped the
+    # files meanwhile, or another snapshot's GC removed a fresh object before
+    # this version referenced it, the files are stored again.
+    while True:
+        handle = _handles[dataset_id]
+        files = [_store_object(dataset_id, handle.path)]
+        files += [_store_object(dataset_id, p) for p in handle.deltas]
+        lock = _dataset_lock(dataset_id)
+        lock.acquire_write()
+        if _handles.get(dataset_id) is handle and all(Path(f).exists() for f in files):
+            break
+        lock.release_write()
+
+    try:
+        versions = _versions.setdefault(dataset_id, [])
+        previous = set()
+        if versions:
+            previous = {versions[-1]["parquet_path"], *versions[-1].get("deltas", [])}
+
+        ver_entry = {
+            "version": versions[-1]["version"] + 1 if versions else 1,
+            "parquet_path": files[0],
+            "deltas": files[1:],
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "rows": len(df),
+            "columns": list(df.columns),
+            "date_columns": list(date_columns),
+            "status": "ok",
+            "bytes_added": sum(Path(f).stat().st_size for f in set(files) - previous),
+        }
+        versions.append(ver_entry)
+        _unversioned_edits.discard(dataset_id)   # flushed edits are part of this version
+
+        # Prune old versions (objects may be shared with newer versions)
+        del versions[:-MAX_VERSIONS]
+        _gc_dataset_files(dataset_id)
+        _registry_append({"dataset": dataset_id, "versions": versions})
+    finally:
+        lock.release_write()
+
+    return ver_entry
+
+
+def _gc_dataset_files(dataset_id: str):
+    """Delete stored objects that neither the live dataset nor a kept
+    version refers to. Call under the dataset's write lock."""
+    keep = set()
+    handle = _handles.get(dataset_id)
+    if handle is not None:
+        keep.update([handle.path, *handle.deltas])
+    for v in _versions.get(dataset_id, []):
+        keep.add(v["parquet_path"])
+        keep.update(v.get("deltas", []))
+    for path in (STORAGE_DIR / dataset_id / "objects").glob("*.parquet"):
+        if str(path) not in keep:
+            try:
+                path.unlink()
+            except Exception:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Derived-column pipeline
+# ---------------------------------------------------------------------------
+# Formulas are parsed once into the columns they read. Registration order is
+# a valid evaluation order (a formula can only use columns that existed when
+# it was added), so each derived column sits one level above the deepest
+# derived column it reads; columns on the same level are independent. An edit
+# recomputes only the derived columns downstream of the edited column, and
+# only on the edited rows. Plain numeric formulas run through numexpr when it
+# is installed; anything else goes to DataFrame.eval over just its inputs.
+DERIVED_WORKERS = min(4, os.cpu_count() or 1)
+DERIVED_PARALLEL_ROWS = 100_000   # below this, a level is evaluated in the calling thread
+_derived_pool = ThreadPoolExecutor(max_workers=DERIVED_WORKERS)
+
+
+class _Formula:
+    """A parsed derived-column formula. `inputs` is None when the columns it
+    reads cannot be determined (it then depends on every column); `expr` is
+    the numexpr form of the formula, or None when numexpr cannot run it."""
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        # `quoted names` become identifiers: __q0, __q1, ...
+        self.quoted = {}
+        parts = formula.split("`")
+        if len(parts) % 2 == 0:
+            self.inputs, self.expr = None, None
+            return
+        for i in range(1, len(parts), 2):
+            ident = self.quoted.setdefault(parts[i], f"__q{len(self.quoted)}")
+            parts[i] = ident
+        text = "".join(parts)
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError:
+            self.inputs, self.expr = None, None
+            return
+        called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        by_ident = {ident: name for name, ident in self.quoted.items()}
+        self.inputs = frozenset(by_ident.get(node.id, node.id) for node in ast.walk(tree)
+                                if isinstance(node, ast.Name) and id(node) not in called)
+        simple = all(isinstance(node, _NUMEXPR_NODES) for node in ast.walk(tree))
+        self.expr = text if simple else None
+
+
+# syntax numexpr evaluates the way DataFrame.eval does
+_NUMEXPR_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant,
+                  ast.Load, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+                  ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+@lru_cache(maxsize=1024)
+def _compile_formula(formula: str) -> _Formula:
+    return _Formula(formula)
+
+
+def _eval_formula(df: pd.DataFrame, formula: str, rows=None):
+    """Evaluate a formula over the frame, or only at row positions `rows`.
+    Returns an array (or Series) aligned with those rows."""
+    f = _compile_formula(formula)
+    n = len(df) if rows is None else len(rows)
+    if numexpr is not None and f.expr is not None and f.inputs <= set(df.columns):
+        local = {}
+        for name in f.inputs:
+            values = df[name].to_numpy()
+            if not isinstance(values.dtype, np.dtype) or values.dtype.kind not in "biuf":
+                break
+            local[f.quoted.get(name, name)] = values if rows is None else values[rows]
+        else:
+            try:
+                out = numexpr.evaluate(f.expr, local_dict=local)
+                return np.full(n, out[()]) if out.ndim == 0 else out
+            except Exception:
+                pass   # e.g. an unsupported function: let pandas decide
+    if f.inputs is not None and f.inputs <= set(df.columns):
+        df = df[list(f.inputs)]   # name resolution in eval scales with the frame width
+    frame = df if rows is None else df.iloc[rows]
+    out = frame.eval(formula)
+    if np.ndim(out) == 0:
+        return np.full(n, out)
+    return out if rows is None else np.asarray(out)
+
+
+def _derived_levels(derivations: list, changed=None) -> list:
+    """Group derivations into levels that can each be evaluated at once.
+    With `changed` (column names), keep only those downstream of them."""
+    level_of = {}
+    levels = []
+    for d in derivations:
+        inputs = _compile_formula(d["formula"]).inputs
+        if changed is not None and inputs is not None and not inputs & (set(changed) | set(level_of)):
+            continue
+        deps = level_of.keys() if inputs is None else inputs & level_of.keys()
+        level = 1 + max((level_of[name] for name in deps), default=-1)
+        level_of[d["name"]] = level
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(d)
+    return levels
+
+
+def _replay_derived_columns(dataset_id: str, df: pd.DataFrame, changed=None, rows=None):
+    """Re-apply registered derived columns to a DataFrame.
+
+    With `changed`, only derived columns that depend on those columns are
+    recomputed; with `rows`, only at those positions (the columns must
+    already exist). Returns (df, errors) where errors is a list of failed
+    column names."""
+    errors = []
+
+    def evaluate(d):
+        try:
+            return _eval_formula(df, d["formula"], rows), None
+        except Exception as e:
+            return None, {"name": d["name"], "error": str(e)}
+
+    for level in _derived_levels(_derived_columns.get(dataset_id, []), changed):
+        if len(level) > 1 and (len(df) if rows is None else len(rows)) >= DERIVED_PARALLEL_ROWS:
+            results = list(_derived_pool.map(evaluate, level))
+        else:
+            results = [evaluate(d) for d in level]
+        for d, (values, error) in zip(level, results):
+            if error is not None:
+                errors.append(error)
+            elif rows is None or d["name"] not in df.columns:
+                df[d["name"]] = values if rows is None else _eval_formula(df, d["formula"])
+            else:
+                column = df[d["name"]].copy()
+                try:
+                    column.iloc[rows] = values
+                except (TypeError, ValueError):
+                    column = _eval_formula(df, d["formula"])   # values no longer fit its dtype
+                df[d["name"]] = column
+    # new columns were appended level by level: put them in registration order
+    names = [d["name"] for d in _derived_columns.get(dataset_id, []) if d["name"] in df.columns]
+    order = [c for c in df.columns if c not in set(names)] + names
+    if order != list(df.columns):
+        df = df[order]
+    return df, errors
+
+
+# ---------------------------------------------------------------------------
+# Per-well row index
+# ---------------------------------------------------------------------------
+# (dataset_id, well_col) -> _WellIndex for that dataset's loaded frame
+_well_indexes: dict = {}
+
+
+def _column_values(s: pd.Series):
+    """Column as a NumPy array for fast slicing: datetimes -> int64 ns,
+    everything else -> float64 (non-numeric -> NaN). Returns (values, valid)
+    where `valid` is the original not-null mask."""
+    valid = s.notna().to_numpy(copy=True)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        if getattr(s.dt, "tz", None) is not None:
+            s = s.dt.tz_localize(None)
+        values = s.to_numpy(dtype="datetime64[ns]", copy=True).view("int64")
+    else:
+        values = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    return values, valid
+
+
+class _WellIndex:
+    """Row positions of every well in one frame, grouped once.
+
+    Rows are stably sorted by well into `order`; the rows of well k are the
+    zero-copy slice order[offsets[k + 1]:offsets[k + 2]] (bucket 0 holds
+    rows with a null well name). Numeric column arrays are cached on first use.
+    """
+
+    def __init__(self, df: pd.DataFrame, well_col: str):
+        self.df = df
+        self.well_col = well_col
+        self._columns = {}   # col -> (dtype, values, valid)
+        self._build()
+
+    def _build(self):
+        codes, uniques = pd.factorize(self.df[self.well_col], use_na_sentinel=True)
+        # different raw values can share a string form (1 vs "1") — merge them
+        name_codes, names = pd.factorize(pd.Index(uniques).astype(str))
+        if len(name_codes):
+            codes = np.where(codes >= 0, name_codes[np.maximum(codes, 0)], -1)
+        self.codes = codes.astype(np.int64)
+        self.names = [str(n) for n in names]
+        self.pos = {n: k for k, n in enumerate(self.names)}
+        self.order = np.argsort(self.codes, kind="stable")
+        counts = np.bincount(self.codes + 1, minlength=len(self.names) + 1)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __contains__(self, name):
+        return name in self.pos
+
+    def rows(self, name: str):
+        """Row positions of a well (original row order), or None if unknown."""
+        k = self.pos.get(name)
+        if k is None:
+            return None
+        return self.order[self.offsets[k + 1]:self.offsets[k + 2]]
+
+    def well_names(self):
+        """Sorted names of wells that currently have at least one row."""
+        counts = np.diff(self.offsets)[1:]
+        return sorted(n for n, c in zip(self.names, counts) if c > 0)
+
+    def column(self, col: str):
+        """Cached (values, valid) arrays for a column (see _column_values)."""
+        s = self.df[col]
+        cached = self._columns.get(col)
+        if cached is None or cached[0] != s.dtype:
+            cached = (s.dtype, *_column_values(s))
+            self._columns[col] = cached
+        return cached[1], cached[2]
+
+    def update_cell(self, row: int, col: str):
+        """Patch the index after df.at[row, col] changed."""
+        if col == self.well_col:
+            self._move_row(row)
+        cached = self._columns.get(col)
+        if cached is not None:
+            s = self.df[col]
+            if cached[0] != s.dtype:
+                del self._columns[col]   # dtype changed: rebuild on next use
+            else:
+                v, ok = _column_values(s.iloc[row:row + 1])
+                cached[1][row] = v[0]
+                cached[2][row] = ok[0]
+
+    def drop_column(self, col: str):
+        self._columns.pop(col, None)
+
+    def _move_row(self, row: int):
+        """Move one row to the bucket of its new well name."""
+        val = self.df[self.well_col].iat[row]
+        if pd.isna(val):
+            new = -1
+        else:
+            name = str(val)
+            if name not in self.pos:
+                self.pos[name] = len(self.names)
+                self.names.append(name)
+                self.offsets = np.append(self.offsets, self.offsets[-1])
+            new = self.pos[name]
+        old = int(self.codes[row])
+        if old == new:
+            return
+        ob, nb = old + 1, new + 1
+        seg = self.order[self.offsets[ob]:self.offsets[ob + 1]]
+        self.order = np.delete(self.order, self.offsets[ob] + np.searchsorted(seg, row))
+        self.offsets[ob + 1:] -= 1
+        seg = self.order[self.offsets[nb]:self.offsets[nb + 1]]
+        self.order = np.insert(self.order, self.offsets[nb] + np.searchsorted(seg, row), row)
+        self.offsets[nb + 1:] += 1
+        self.codes[row] = new
+
+
+def _get_well_index(dataset_id: str, df: pd.DataFrame, well_col: str) -> _WellIndex:
+    """Index for a dataset's loaded frame, built on first use of a well column.
+    Indexes pin their frame, so they are dropped when the frame is evicted."""
+    key = (dataset_id, well_col)
+    idx = _well_indexes.get(key)
+    if idx is None or idx.df is not df:
+        idx = _WellIndex(df, well_col)
+        with _frames_lock:
+            _well_indexes[key] = idx
+    return idx
+
+
+def _refresh_well_indexes(dataset_id: Optional[str], df: Optional[pd.DataFrame]):
+    """Eagerly rebuild a dataset's indexes after its frame was replaced
+    (or drop them when the frame was unloaded)."""
+    with _frames_lock:
+        for key in [k for k in _well_indexes if k[0] == dataset_id]:
+            if df is not None and key[1] in df.columns:
+                _well_indexes[key] = _WellIndex(df, key[1])
+            else:
+                del _well_indexes[key]
+
+
+# ---------------------------------------------------------------------------
+# Decline-curve models
+# ---------------------------------------------------------------------------
+def _exponential(t, qi, di):
+    """q(t) = qi * exp(-di * t)"""
+    return qi * np.exp(-di * t)
+
+
+def _hyperbolic(t, qi, di, b):
+    """q(t) = qi / (1 + b*di*t)^(1/b)"""
+    b = np.maximum(b, 1e-10)   # a fitted b rounded to 0 is (nearly) exponential
+    denom = 1.0 + b * di * t
+    # guard against negative base before fractional power
+    denom = np.maximum(denom, 1e-12)
+    return qi / np.power(denom, 1.0 / b)
+
+
+def _harmonic(t, qi, di):
+    """q(t) = qi / (1 + di*t)  (hyperbolic with b=1)"""
+    return qi / (1.0 + di * t)
+
+
+_MODELS = {
+    "exponential": (_exponential, ["qi", "di"],      [100, 0.01],  (0, [1e8, 10]), "q(t) = {qi} * exp(-{di} * t)"),
+    "hyperbolic":  (_hyperbolic,  ["qi", "di", "b"], [100, 0.01, 0.5], (0, [1e8, 10, 2]), "q(t) = {qi} / (1 + {b}*{di}*t)^(1/{b})"),
+    "harmonic":    (_harmonic,    ["qi", "di"],      [100, 0.01],  (0, [1e8, 10]), "q(t) = {qi} / (1 + {di}*t)"),
+}
+
+
+def _fit_decline(t: np.ndarray, q: np.ndarray, model_name: str):
+    """Fit a decline curve. Returns params_dict (empty dict if failed)."""
+    func, param_names, p0, bounds, eq_fmt = _MODELS[model_name]
+
+    # Smart initial guess: qi ≈ max production
+    p0 = list(p0)
+    p0[0] = float(np.nanmax(q)) if np.nanmax(q) > 0 else 100.0
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            popt, _ = curve_fit(func, t, q, p0=p0, bounds=bounds, maxfev=10000)
+        except Exception:
+            return {}
+
+    return _params_to_dict(popt, param_names)
+
+
+def _params_to_dict(popt, param_names):
+    """Round fitted parameters into the JSON-safe dict returned by the API."""
+    def safe_float(v):
+        if np.isfinite(v):
+            return round(float(v), 6)
+        return 0.0
+
+    return {name: safe_float(val) for name, val in zip(param_names, popt)}
+
+
+# ---------------------------------------------------------------------------
+# Forecast & reserves (cumulative production, EUR)
+# ---------------------------------------------------------------------------
+# Closed forms of each _MODELS curve, evaluated for all wells at once on a
+# (n_wells, n_params) parameter matrix. With a terminal decline d_min the
+# hyperbolic/harmonic curves switch to exponential once their instantaneous
+# decline di/(1 + b*di*t) falls to d_min (modified hyperbolic). Cumulative is
+# the integral of q over t (days on a date axis), divided by `rate_period`.
+DAYS_PER_MONTH = 30.4375
+
+
+def _exponential_cum(t, qi, di):
+    """Np(t) = qi/di * (1 - exp(-di*t))"""
+    return qi / di * -np.expm1(-di * t)
+
+
+def _hyperbolic_cum(t, qi, di, b):
+    """Np(t) = qi/((1-b)*di) * (1 - (1 + b*di*t)^(1-1/b)); harmonic at b = 1"""
+    b = np.maximum(b, 1e-10)
+    x = np.log1p(b * di * t)
+    one_b = np.where(np.abs(1.0 - b) < 1e-6, 1.0, 1.0 - b)
+    return np.where(np.abs(1.0 - b) < 1e-6, qi / di * x, qi / (one_b * di) * -np.expm1(-one_b / b * x))
+
+
+def _harmonic_cum(t, qi, di):
+    """Np(t) = qi/di * ln(1 + di*t)"""
+    return qi / di * np.log1p(di * t)
+
+
+def _exponential_time(q, qi, di):
+    """t at which the rate falls to q"""
+    return np.log(qi / q) / di
+
+
+def _hyperbolic_time(q, qi, di, b):
+    b = np.maximum(b, 1e-10)
+    return np.expm1(b * np.log(qi / q)) / (b * di)
+
+
+def _harmonic_time(q, qi, di):
+    return (qi / q - 1.0) / di
+
+
+_CUMULATIVE = {"exponential": _exponential_cum, "hyperbolic": _hyperbolic_cum, "harmonic": _harmonic_cum}
+_TIME_TO_RATE = {"exponential": _exponential_time, "hyperbolic": _hyperbolic_time, "harmonic": _harmonic_time}
+
+
+def _param_matrix(params_list: list, model_name: str) -> np.ndarray:
+    """(n_wells, n_params) matrix of fitted parameters; NaN rows for wells
+    that have none."""
+    names = _MODELS[model_name][1]
+    return np.array([[p.get(n, np.nan) for n in names] if p else [np.nan] * len(names)
+                     for p in params_list], dtype=float).reshape(len(params_list), len(names))
+
+
+def _param_columns(P: np.ndarray, ndim: int) -> list:
+    """Parameter columns shaped to broadcast against t of `ndim` dimensions."""
+    return [P[:, j].reshape((-1,) + (1,) * (ndim - 1)) for j in range(P.shape[1])]
+
+
+def _terminal_switch(model_name: str, P: np.ndarray, d_min: Optional[float]):
+    """(t_switch, q_switch) per well for the modified hyperbolic; t_switch is
+    inf where the curve never switches (no d_min, or an exponential model)."""
+    n = len(P)
+    if not d_min or model_name == "exponential":
+        return np.full(n, np.inf), np.full(n, np.nan)
+    di = P[:, 1]
+    b = np.maximum(P[:, 2], 1e-10) if model_name == "hyperbolic" else 1.0
+    with np.errstate(all="ignore"):
+        t_sw = np.maximum((di / d_min - 1.0) / (b * di), 0.0)
+        q_sw = _MODELS[model_name][0](t_sw, *_param_columns(P, 1))
+    return np.where(np.isfinite(t_sw), t_sw, np.inf), q_sw
+
+
+def _decline_rates(model_name: str, P: np.ndarray, T: np.ndarray, d_min: Optional[float] = None):
+    """q(T) for every well; T is (n_wells, n_times)."""
+    with np.errstate(all="ignore"):
+        Q = _MODELS[model_name][0](T, *_param_columns(P, T.ndim))
+        t_sw, q_sw = _terminal_switch(model_name, P, d_min)
+        if np.isfinite(t_sw).any():
+            t_sw, q_sw = t_sw[:, None], q_sw[:, None]
+            Q = np.where(T > t_sw, q_sw * np.exp(-d_min * (T - t_sw)), Q)
+    return Q
+
+
+def _decline_cumulative(model_name: str, P: np.ndarray, t: np.ndarray, d_min: Optional[float] = None):
+    """Closed-form cumulative from 0 to t (one t per well)."""
+    t_sw, q_sw = _terminal_switch(model_name, P, d_min)
+    with np.errstate(all="ignore"):
+        cum = _CUMULATIVE[model_name](np.minimum(t, t_sw), *_param_columns(P, 1))
+        if np.isfinite(t_sw).any():
+            tail = q_sw / d_min * -np.expm1(-d_min * np.maximum(t - t_sw, 0.0))
+            cum = cum + np.where(t > t_sw, tail, 0.0)
+    return cum
+
+
+def _decline_time_to_rate(model_name: str, P: np.ndarray, q: float, d_min: Optional[float] = None):
+    """t at which each well's rate falls to q (inf if it never does)."""
+    t_sw, q_sw = _terminal_switch(model_name, P, d_min)
+    with np.errstate(all="ignore"):
+        t = _TIME_TO_RATE[model_name](q, *_param_columns(P, 1))
+        if np.isfinite(t_sw).any():
+            t = np.where(q < q_sw, t_sw + np.log(q_sw / q) / d_min, t)
+    return np.where(np.isnan(t) & ~np.isnan(P).any(axis=1), np.inf, t)
+
+
+def _well_reserves(model_name: str, P: np.ndarray, t_last: np.ndarray, cum_actual: np.ndarray,
+                   econ_limit: Optional[float] = None, t_cap: Optional[float] = None,
+                   d_min: Optional[float] = None, rate_period: float = 1.0) -> dict:
+    """Remaining reserves and EUR of every well in one pass. Production runs
+    from the last fitted point (`t_last`) until the rate reaches `econ_limit`
+    or `t_cap` more time has passed, whichever comes first; EUR adds the
+    production to date (`cum_actual`). Returns columns of per-well arrays."""
+    t_end = np.full(len(P), np.inf)
+    if econ_limit:
+        t_end = np.minimum(t_end, _decline_time_to_rate(model_name, P, econ_limit, d_min))
+    if t_cap:
+        t_end = np.minimum(t_end, t_last + t_cap)
+    t_end = np.maximum(t_end, t_last)
+    with np.errstate(all="ignore"):
+        remaining = (_decline_cumulative(model_name, P, t_end, d_min)
+                     - _decline_cumulative(model_name, P, t_last, d_min)) / rate_period
+    remaining = np.where(t_end > t_last, np.maximum(remaining, 0.0), 0.0)
+    remaining[np.isnan(P).any(axis=1) | ~np.isfinite(remaining)] = np.nan   # no fit, or unbounded
+    t_switch, _ = _terminal_switch(model_name, P, d_min)
+    return {
+        "cum_actual": cum_actual,
+        "remaining": remaining,
+        "eur": cum_actual + remaining,
+        "t_end": np.where(np.isfinite(t_end), t_end, np.nan),
+        "t_switch": np.where(np.isfinite(t_switch), t_switch, np.nan),
+    }
+
+
+def _fit_origins(prepared: list) -> np.ndarray:
+    """t of each well's last included point, where its forecast starts."""
+    return np.array([t[m][-1] if m.any() else t[-1] for _, _, t, _, _, m in prepared], dtype=float)
+
+
+def _series_reserves(prepared: list, P: np.ndarray, model_name: str, econ_limit: Optional[float],
+                     eur_months: Optional[float], d_min: Optional[float], rate_period: float) -> dict:
+    """`_well_reserves` for prepared DCA series; production to date is the
+    trapezoid integral of the actual rates up to the forecast origin."""
+    t_last = _fit_origins(prepared)
+    cum_actual = np.array([np.trapezoid(yv[t <= tl], t[t <= tl]) for (_, _, t, _, yv, _), tl
+                           in zip(prepared, t_last)], dtype=float) / rate_period
+    return _well_reserves(model_name, P, t_last, cum_actual, econ_limit,
+                          eur_months * DAYS_PER_MONTH if eur_months else None, d_min, rate_period)
+
+
+# ---------------------------------------------------------------------------
+# Batched decline fitting (vectorized Levenberg–Marquardt over many wells)
+# ---------------------------------------------------------------------------
+LM_MAX_ITER = 200
+LM_TOL = 1e-10
+
+
+def _stack_series(series):
+    """Pad a list of (t, q) arrays into (n_wells, max_len) matrices.
+    Returns (T, Q, W) where W is 1.0 for real samples and 0.0 for padding."""
+    n = len(series)
+    max_len = max(len(t) for t, _ in series)
+    T = np.zeros((n, max_len))
+    Q = np.zeros((n, max_len))
+    W = np.zeros((n, max_len))
+    for i, (t, q) in enumerate(series):
+        k = len(t)
+        T[i, :k] = t
+        Q[i, :k] = q
+        W[i, :k] = 1.0
+    return T, Q, W
+
+
+def _batch_residuals(func, T, Q, W, P):
+    """Weighted residuals for every well at once. P has shape (n_wells, n_params)."""
+    with np.errstate(all="ignore"):
+        pred = func(T, *[P[:, j:j + 1] for j in range(P.shape[1])])
+    return (pred - Q) * W
+
+
+def _batch_jacobian(func, T, Q, W, P, R, lower, upper):
+    """Forward-difference Jacobian of the residuals, shape (n_wells, max_len, n_params)."""
+    n, k = P.shape
+    J = np.empty((n, T.shape[1], k))
+    for j in range(k):
+        h = 1.4901161193847656e-08 * np.maximum(np.abs(P[:, j]), 1.0)
+        # step inwards when sitting on the upper bound
+        h = np.where(P[:, j] + h > upper[j], -h, h)
+        Pj = P.copy()
+        Pj[:, j] += h
+        J[:, :, j] = (_batch_residuals(func, T, Q, W, Pj) - R) / h[:, None]
+    return J
+
+
+def _fit_decline_batch(series, model_name: str):
+    """Fit one decline model to many wells in a single vectorized solve.
+
+    `series` is a list of (t, q) array pairs. Returns a list of params dicts
+    in the same order (same shape as `_fit_decline`). Wells the batched solver
+    cannot converge fall back to the per-well scipy fit.
+    """
+    if not series:
+        return []
+    func, param_names, p0, bounds, _ = _MODELS[model_name]
+    k = len(param_names)
+    lower = np.broadcast_to(np.asarray(bounds[0], dtype=float), (k,)).copy()
+    upper = np.broadcast_to(np.asarray(bounds[1], dtype=float), (k,)).copy()
+    # keep strictly inside the box (hyperbolic b must stay > 0)
+    lower = np.maximum(lower, 1e-10)
+
+    T, Q, W = _stack_series(series)
+    n = T.shape[0]
+
+    # Smart initial guess: qi ≈ max production (mirrors _fit_decline)
+    P = np.tile(np.asarray(p0, dtype=float), (n, 1))
+    qmax = np.nanmax(np.where(W > 0, Q, -np.inf), axis=1)
+    P[:, 0] = np.where(qmax > 0, qmax, 100.0)
+    feasible = np.all((P >= lower) & (P <= upper), axis=1)
+    P = np.clip(P, lower, upper)
+
+    R = _batch_residuals(func, T, Q, W, P)
+    cost = np.einsum("ij,ij->i", R, R)
+    lam = np.full(n, 1e-3)
+    active = np.isfinite(cost) & feasible
+    converged = np.zeros(n, dtype=bool)
+    eye = np.eye(k)
+
+    for _ in range(LM_MAX_ITER):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        Pa, Ra = P[idx], R[idx]
+        J = _batch_jacobian(func, T[idx], Q[idx], W[idx], Pa, Ra, lower, upper)
+        JtJ = np.einsum("nik,nil->nkl", J, J)
+        g = np.einsum("nik,ni->nk", J, Ra)
+        diag = np.einsum("nkk->nk", JtJ)
+        A = JtJ + lam[idx, None, None] * (diag[:, :, None] * eye + 1e-12 * eye)
+        # freeze parameters pinned to a bound whose descent direction points outside
+        pinned = ((Pa <= lower) & (g > 0)) | ((Pa >= upper) & (g < 0))
+        free = ~pinned
+        A = A * (free[:, :, None] & free[:, None, :]) + pinned[:, :, None] * eye
+        g = np.where(pinned, 0.0, g)
+        try:
+            step = np.linalg.solve(A, -g[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            step = np.zeros_like(Pa)
+        step = np.nan_to_num(step, nan=0.0, posinf=0.0, neginf=0.0)
+
+        P_new = np.clip(Pa + step, lower, upper)
+        R_new = _batch_residuals(func, T[idx], Q[idx], W[idx], P_new)
+        cost_new = np.einsum("ij,ij->i", R_new, R_new)
+        improved = np.isfinite(cost_new) & (cost_new <= cost[idx])
+
+        rel_change = np.abs(cost[idx] - cost_new) / np.maximum(cost[idx], 1e-300)
+        small_step = np.all(np.abs(P_new - Pa) <= LM_TOL * (np.abs(Pa) + LM_TOL), axis=1)
+
+        acc = idx[improved]
+        P[acc] = P_new[improved]
+        R[acc] = R_new[improved]
+        cost[acc] = cost_new[improved]
+        lam[acc] = np.maximum(lam[acc] / 3.0, 1e-12)
+        lam[idx[~improved]] *= 4.0
+
+        done = (improved & (rel_change < LM_TOL)) | small_step | (lam[idx] > 1e12)
+        converged[idx[done]] = True
+        active[idx[done]] = False
+
+    # Solutions pinned to a bound sit on flat, ill-conditioned ridges where the
+    # optimizer path matters; hand those to scipy so they match the per-well fit.
+    interior = np.all((P > lower) & (P < upper), axis=1)
+    results = []
+    for i, (t, q) in enumerate(series):
+        if converged[i] and interior[i] and np.all(np.isfinite(P[i])):
+            results.append(_params_to_dict(P[i], param_names))
+        else:
+            results.append(_fit_decline(t, q, model_name))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Parallel fitting (process pool)
+# ---------------------------------------------------------------------------
+# DCA_FIT_WORKERS=0 fits in a background thread (keeps the event loop free);
+# N > 1 shards wells across N processes. Only (t, q) arrays cross the process
+# boundary — the DataFrame never does.
+FIT_WORKERS = int(os.environ.get("DCA_FIT_WORKERS", "0"))
+FIT_MIN_WELLS_PER_SHARD = 32
+_fit_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_fit_pool() -> ProcessPoolExecutor:
+    """Lazily start the fitting process pool."""
+    global _fit_pool
+    if _fit_pool is None:
+        _fit_pool = ProcessPoolExecutor(max_workers=FIT_WORKERS)
+    return _fit_pool
+
+
+def _shard_series(series, n_shards: int):
+    """Split a list into n contiguous, near-equal shards (order preserved)."""
+    bounds = np.linspace(0, len(series), n_shards + 1).astype(int)
+    return [series[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+async def _fit_wells(series, model_name: str):
+    """Run the per-well fitting stage off the event loop.
+    Returns params dicts in the same order as `series`."""
+    loop = asyncio.get_running_loop()
+    if FIT_WORKERS > 1 and len(series) >= 2 * FIT_MIN_WELLS_PER_SHARD:
+        # a few shards per worker so uneven wells still balance across cores
+        n_shards = min(FIT_WORKERS * 4, len(series) // FIT_MIN_WELLS_PER_SHARD)
+        pool = _get_fit_pool()
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(pool, _fit_decline_batch, shard, model_name)
+            for shard in _shard_series(series, n_shards)
+        ])
+        return [params for part in parts for params in part]
+    return await loop.run_in_executor(None, _fit_decline_batch, series, model_name)
+
+
+# ---------------------------------------------------------------------------
+# Fit-result cache (in-memory LRU + optional on-disk tier per dataset)
+# ---------------------------------------------------------------------------
+# Key = hash of the well's fitted (t, q) arrays + model + exclusion set, so an
+# unchanged well is never refitted. The disk tier lives in
+# STORAGE_DIR/<dataset_id>/fit_cache.jsonl and survives restarts. Lookups and
+# stores run in the executor; a fit request appends its new entries in one
+# write. Once the file holds FIT_CACHE_COMPACT_LINES lines it is rewritten with
+# only the FIT_CACHE_SIZE most recently used entries of that dataset. Reading
+# the file and writing the compacted copy happen outside _fit_cache_lock.
+FIT_CACHE_SIZE = 20000      # max entries kept in memory (all datasets) and on disk (per dataset)
+FIT_CACHE_DISK = True       # also persist entries under the dataset folder
+FIT_CACHE_COMPACT_LINES = 2 * FIT_CACHE_SIZE
+
+_fit_cache: "OrderedDict[tuple, dict]" = OrderedDict()   # (dataset_id, digest) -> params
+_fit_cache_disk: dict = {}   # dataset_id -> OrderedDict {digest: params} of fit_cache.jsonl, oldest first
+_fit_cache_lines: dict = {}   # dataset_id -> lines in its fit_cache.jsonl
+_fit_cache_lock = threading.Lock()   # both tiers, appends and file swaps; never held for a whole-file read or write
+_fit_cache_compacting: set = set()   # datasets whose cache file is being rewritten
+_fit_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def _fit_cache_key(t: np.ndarray, q: np.ndarray, model_name: str, excl) -> str:
+    """Fingerprint of everything that determines a fit result."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model_name.encode())
+    h.update(np.ascontiguousarray(t, dtype=np.float64).tobytes())
+    h.update(b"|")
+    h.update(np.ascontiguousarray(q, dtype=np.float64).tobytes())
+    h.update(b"|" + ",".join(str(i) for i in sorted(excl)).encode())
+    return h.hexdigest()
+
+
+def _fit_cache_path(dataset_id: str) -> Path:
+    return STORAGE_DIR / dataset_id / "fit_cache.jsonl"
+
+
+def _load_disk_fit_cache(dataset_id: str) -> "OrderedDict[str, dict]":
+    """The on-disk cache tier of a dataset, read on first use. The file is
+    read without _fit_cache_lock: call without it (blocking)."""
+    with _fit_cache_lock:
+        if dataset_id in _fit_cache_disk:
+            return _fit_cache_disk[dataset_id]
+        invalidations = _fit_cache_stats["invalidations"]
+    entries, lines = OrderedDict(), 0
+    path = _fit_cache_path(dataset_id)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    rec = json.loads(line)
+                    entries[rec["key"]] = rec["params"]
+                    entries.move_to_end(rec["key"])
+                except (ValueError, KeyError):
+                    continue   # torn last line after a crash
+    with _fit_cache_lock:
+        if dataset_id in _fit_cache_disk:   # loaded by another thread meanwhile
+            return _fit_cache_disk[dataset_id]
+        if _fit_cache_stats["invalidations"] != invalidations:
+            entries, lines = OrderedDict(), 0   # the file may be gone: start empty
+        _fit_cache_disk[dataset_id] = entries
+        _fit_cache_lines[dataset_id] = lines
+        return entries
+
+
+def _fit_cache_lookup(dataset_id: Optional[str], keys: list) -> list:
+    """Cached params (or None) for each key. Misses in memory fall back to
+    the disk tier, loading it on first use (blocking)."""
+    results = [None] * len(keys)
+    with _fit_cache_lock:
+        for i, key in enumerate(keys):
+            params = _fit_cache.get((dataset_id, key))
+            if params is not None:
+                _fit_cache.move_to_end((dataset_id, key))
+                _fit_cache_stats["hits"] += 1
+                results[i] = params
+    todo = [i for i, r in enumerate(results) if r is None]
+    disk = _load_disk_fit_cache(dataset_id) if todo and FIT_CACHE_DISK and dataset_id else {}
+    with _fit_cache_lock:
+        for i in todo:
+            params = disk.get(keys[i])
+            if params is None:
+                _fit_cache_stats["misses"] += 1
+                continue
+            disk.move_to_end(keys[i])
+            _fit_cache_stats["disk_hits"] += 1
+            _fit_cache_put(dataset_id, keys[i], params)
+            results[i] = params
+    return results
+
+
+def _fit_cache_put(dataset_id: Optional[str], key: str, params: dict):
+    """Add an entry to the in-memory tier. Needs _fit_cache_lock."""
+    _fit_cache[(dataset_id, key)] = params
+    _fit_cache.move_to_end((dataset_id, key))
+    while len(_fit_cache) > FIT_CACHE_SIZE:
+        _fit_cache.popitem(last=False)
+        _fit_cache_stats["evictions"] += 1
+
+
+def _fit_cache_store(dataset_id: Optional[str], entries: dict):
+    """Add one request's new fits to the cache, and to the dataset's cache
+    file when the disk tier is on (blocking)."""
+    with _fit_cache_lock:
+        for key, params in entries.items():
+            _fit_cache_put(dataset_id, key, params)
+    if FIT_CACHE_DISK and dataset_id:
+        _fit_cache_persist(dataset_id, entries)
+
+
+def _fit_cache_persist(dataset_id: str, entries: dict):
+    """Append entries to the dataset's cache file in one write, then compact
+    the file if it has grown too long (blocking). The compacted copy is
+    written from a snapshot without the lock; lines appended meanwhile are
+    carried over when it replaces the file."""
+    if not (STORAGE_DIR / dataset_id).exists():
+        return   # dataset deleted meanwhile
+    _load_disk_fit_cache(dataset_id)
+    path = _fit_cache_path(dataset_id)
+    with _fit_cache_lock:
+        disk = _fit_cache_disk.setdefault(dataset_id, OrderedDict())   # else invalidated meanwhile
+        disk.update(entries)
+        for key in entries:
+            disk.move_to_end(key)
+        while len(disk) > FIT_CACHE_SIZE:
+            disk.popitem(last=False)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps({"key": k, "params": p}) + "\n" for k, p in entries.items()))
+        _fit_cache_lines[dataset_id] = _fit_cache_lines.get(dataset_id, 0) + len(entries)
+        if _fit_cache_lines[dataset_id] <= FIT_CACHE_COMPACT_LINES or dataset_id in _fit_cache_compacting:
+            return
+        _fit_cache_compacting.add(dataset_id)
+        snapshot, size = list(disk.items()), path.stat().st_size
+
+    tmp_path = Path(str(path) + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"key": k, "params": p}) + "\n" for k, p in snapshot)
+        with _fit_cache_lock:
+            if _fit_cache_disk.get(dataset_id) is not disk or not path.exists():
+                tmp_path.unlink()   # invalidated meanwhile
+                return
+            with open(path, "rb") as f:
+                f.seek(size)
+                tail = f.read()   # entries appended while the copy was written
+            with open(tmp_path, "ab") as f:
+                f.write(tail)
+            os.replace(tmp_path, path)
+            _fit_cache_lines[dataset_id] = len(snapshot) + tail.count(b"\n")
+    finally:
+        with _fit_cache_lock:
+            _fit_cache_compacting.discard(dataset_id)
+
+
+def _invalidate_fit_cache(dataset_id: Optional[str]):
+    """Drop every cached fit for a dataset (call whenever its rows change)."""
+    if not dataset_id:
+        return
+    with _fit_cache_lock:
+        for mem_key in [k for k in _fit_cache if k[0] == dataset_id]:
+            del _fit_cache[mem_key]
+        _fit_cache_disk.pop(dataset_id, None)
+        _fit_cache_lines.pop(dataset_id, None)
+        path = _fit_cache_path(dataset_id)
+        if path.exists():
+            try:
+                path.unlink()
+            except Exception:
+                pass
+        _fit_cache_stats["invalidations"] += 1
+
+
+async def _fit_wells_cached(dataset_id: Optional[str], series, model_name: str, excl):
+    """`_fit_wells` with memoization: only wells missing from the cache are fitted."""
+    keys = [_fit_cache_key(t, q, model_name, excl) for t, q in series]
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(None, _fit_cache_lookup, dataset_id, keys)
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        fitted = await _fit_wells([series[i] for i in todo], model_name)
+        new = {}
+        for i, params in zip(todo, fitted):
+            results[i] = params
+            new[keys[i]] = params
+        await loop.run_in_executor(None, _fit_cache_store, dataset_id, new)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Chunked Upload System
+# ---------------------------------------------------------------------------
+# Chunks are written at chunk_index * chunk_size, so a client may send them in
+# any order and several at a time. Each upload keeps a received-chunk map and
+# the SHA-256 of every chunk; re-sent chunks are ignored, and finalize re-reads
+# the file to check every chunk before parsing.
+#
+# CSV uploads are parsed while they arrive: a worker thread reads the raw file
+# through an _UploadStream, which only hands out bytes from chunks that have
+# landed contiguously from the start, and writes Parquet row groups as it goes.
+# It then waits for finalize; if verification fails the pipeline is dropped and
+# finalize parses the file from scratch once the damaged chunks are re-sent.
+CHUNK_SIZE = 5 * 1024 * 1024  # 5 MB default; frontend can send smaller
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+PIPELINE_CSV = True   # parse CSV uploads while they arrive
+PIPELINE_IDLE_TIMEOUT = 3600   # seconds without a new chunk before a pipelined parse gives up
+PREVIEW_ROWS = 100
+
+_uploads: dict = {}   # dataset_id -> upload state, see upload_init
+_early_previews: dict = {}   # dataset_id -> first rows of a CSV still being parsed
+
+
+class _UploadAborted(Exception):
+    """The upload a pipelined parse was reading failed verification or went idle."""
+
+
+class _UploadStream(io.RawIOBase):
+    """Read-only view of an upload's raw file that blocks until the requested
+    bytes have landed: only the contiguous prefix of received chunks is
+    readable. Reads are never short before the end, so the CSV reader sees
+    the same blocks (and infers the same types) as for a finished file."""
+
+    def __init__(self, ds: dict, upload: dict):
+        self._f = open(ds["raw_path"], "rb")
+        self._upload = upload
+        self._size = ds["file_size"]
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._pos >= self._size:
+            return 0
+        upload = self._upload
+        want = min(len(b), self._size - self._pos)
+        with upload["cond"]:
+            while upload["contiguous"] < self._pos + want and not upload["aborted"]:
+                if not upload["cond"].wait(PIPELINE_IDLE_TIMEOUT):
+                    upload["aborted"] = True
+            if upload["aborted"]:
+                raise _UploadAborted()
+        n = self._f.readinto(memoryview(b)[:want])
+        self._pos += n
+        return n
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _await_finalize(upload: dict) -> bool:
+    """Block a pipelined parse until finalize verified the upload (True) or the
+    pipeline was dropped (False)."""
+    with upload["cond"]:
+        while not upload["finalized"] and not upload["aborted"]:
+            if not upload["cond"].wait(PIPELINE_IDLE_TIMEOUT):
+                upload["aborted"] = True
+        return not upload["aborted"]
+
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    file_size: int
+    chunk_size: Optional[int] = None
+
+
+def _chunk_span(ds: dict, chunk_index: int):
+    """(offset, length) of a chunk in the raw file."""
+    offset = chunk_index * ds["chunk_size"]
+    return offset, min(ds["chunk_size"], ds["file_size"] - offset)
+
+
+def _missing_chunks(dataset_id: str) -> list:
+    upload = _uploads.get(dataset_id)
+    if upload is None:
+        return []
+    return [i for i, got in enumerate(upload["received"]) if not got]
+
+
+def _write_chunk(path: Path, offset: int, data: bytes) -> str:
+    """Write one chunk in place; returns its SHA-256."""
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def _verify_chunks(dataset_id: str) -> list:
+    """Indices of chunks whose bytes on disk no longer match their checksum."""
+    ds, upload = _datasets[dataset_id], _uploads[dataset_id]
+    bad = []
+    with open(ds["raw_path"], "rb") as f:
+        for i, digest in enumerate(upload["digests"]):
+            offset, length = _chunk_span(ds, i)
+            f.seek(offset)
+            if hashlib.sha256(f.read(length)).hexdigest() != digest:
+                bad.append(i)
+    return bad
+
+
+def _background_parse_and_convert(dataset_id: str, upload: Optional[dict] = None,
+                                  wait_for: Optional[threading.Thread] = None):
+    """Background worker: parse uploaded file → Parquet + populate DataFrame.
+    With `upload`, the CSV is parsed while its chunks arrive and the rest of
+    the import waits for finalize. `wait_for` is a dropped pipelined parse
+    that may still be writing data.parquet."""
+    global _active_dataset_id
+
+    if wait_for is not None:
+        wait_for.join()
+    ds = _datasets.get(dataset_id)
+    if not ds:
+        return
+    try:
+        if upload is None:
+            ds["status"] = "processing"
+            ds["progress"] = 10
+
+        raw_path = Path(ds["raw_path"])
+        suffix = ds["suffix"]
+        parquet_path = raw_path.parent / "data.parquet"
+        df = None
+        streamed = False
+        ds["rows_parsed"] = 0
+
+        def report(frac, table, date_columns):
+            if ds["rows_parsed"] == 0:
+                _early_previews[dataset_id] = _early_preview(table, date_columns)
+            ds["rows_parsed"] += table.num_rows
+            if ds["status"] == "processing":
+                ds["progress"] = 10 + int(frac * 60)
+
+        if suffix in ARROW_SUFFIXES:
+            # Typed data: no parsing, and a usable Parquet file is taken as is
+            _, detected_dates = _import_arrow_source(raw_path, parquet_path, report)
+            streamed = True
+        elif suffix == ".csv":
+            # Stream CSV → Parquet in batches; progress follows bytes consumed
+            # (only once finalized — before that it tracks the upload)
+            source = _UploadStream(ds, upload) if upload is not None else None
+            try:
+                _, detected_dates = _stream_csv_to_parquet(raw_path, parquet_path, report, source)
+                streamed = True
+            except pa.ArrowInvalid:
+                pass   # types drift between batches — use the in-memory parser
+            if upload is not None and not _await_finalize(upload):
+                return   # dropped; finalize parses the file again
+
+        if not streamed:
+            # Parse into DataFrame
+            df, detected_dates = _read_source(raw_path, suffix)
+            ds["progress"] = 60
+
+            # Convert to Parquet (date columns stored as strings)
+            _write_frame_parquet(df, detected_dates, parquet_path)
+        ds["parquet_path"] = str(parquet_path)
+        handle = _DatasetHandle(parquet_path, detected_dates)
+        ds["progress"] = 80
+
+        # Replay derived columns (pipeline replay)
+        replay_errors = []
+        replayed = bool(_derived_columns.get(dataset_id))
+        if replayed:
+            if df is None:
+                df = handle.read()
+            df, replay_errors = _replay_derived_columns(dataset_id, df)
+            ds["replay_errors"] = replay_errors
+
+        ds["progress"] = 90
+
+        # Streamed data stays on disk until an editor needs it
+        _install_dataset(dataset_id, handle, df, detected_dates, dirty=replayed)
+        _track_disk_file(ds)
+
+        # Save version snapshot
+        _save_version_snapshot(dataset_id, df if df is not None else handle, detected_dates)
+
+        # Newest upload becomes the default for requests without a dataset_id
+        _active_dataset_id = dataset_id
+        ds["status"] = "ready"
+        ds["progress"] = 100
+        _save_dataset_record(dataset_id)
+        _registry_append({"active": dataset_id})
+
+    except _UploadAborted:
+        pass   # the upload stays open; finalize parses it from scratch
+    except Exception as e:
+        ds["status"] = "error"
+        ds["error"] = str(e)
+        ds["progress"] = 0
+    finally:
+        _early_previews.pop(dataset_id, None)
+
+
+@app.post("/api/upload/init")
+async def upload_init(req: UploadInitRequest):
+    """Initialize a chunked upload. Returns a unique dataset_id and the chunk
+    layout: chunk i covers bytes [i * chunk_size, (i + 1) * chunk_size)."""
+    chunk_size = CHUNK_SIZE if req.chunk_size is None else req.chunk_size
+    if req.file_size < 0 or not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise HTTPException(400, "Invalid file_size or chunk_size.")
+    total_chunks = -(-req.file_size // chunk_size)
+    dataset_id = uuid.uuid4().hex[:12]
+    ds_dir = STORAGE_DIR / dataset_id
+    ds_dir.mkdir(parents=True, exist_ok=True)
+
+    suffix = Path(req.filename).suffix.lower()
+    raw_path = ds_dir / f"raw{suffix}"
+
+    _datasets[dataset_id] = {
+        "status": "uploading",
+        "filename": req.filename,
+        "suffix": suffix,
+        "file_size": req.file_size,
+        "chunk_size": chunk_size,
+        "total_chunks": total_chunks,
+        "raw_path": str(raw_path),
+        "parquet_path": None,
+        "error": None,
+        "progress": 0,
+        "bytes_received": 0,
+        "rows": 0,
+        "columns": [],
+        "numeric_columns": [],
+        "date_columns": [],
+        "disk_path": None,
+        "disk_mtime": 0,
+        "last_import": None,
+    }
+
+    # Create the raw file at its final size; chunks are written in place
+    with open(raw_path, "wb") as f:
+        f.truncate(req.file_size)
+    _uploads[dataset_id] = {
+        "received": bytearray(total_chunks),
+        "digests": [None] * total_chunks,
+        "cond": threading.Condition(),
+        "next": 0,             # first chunk not yet received
+        "contiguous": 0,       # bytes readable from the start of the file
+        "worker": None,        # thread of the pipelined parse, if any
+        "finalized": False,
+        "aborted": False,
+    }
+    if PIPELINE_CSV and suffix == ".csv" and req.file_size > 0:
+        # Long-lived (it follows the upload), so not on _worker_pool
+        worker = threading.Thread(target=_background_parse_and_convert, args=(dataset_id, _uploads[dataset_id]),
+                                  daemon=True)
+        _uploads[dataset_id]["worker"] = worker
+        worker.start()
+
+    return {"dataset_id": dataset_id, "chunk_size": chunk_size, "total_chunks": total_chunks}
+
+
+@app.post("/api/upload/chunk")
+async def upload_chunk(
+    dataset_id: str = Query(...),
+    chunk_index: int = Query(...),
+    checksum: Optional[str] = Query(None, description="SHA-256 of the chunk (hex)"),
+    file: UploadFile = File(...),
+):
+    """Receive one chunk and write it at its offset in the raw file. Chunks may
+    arrive in any order or concurrently; a chunk that was already received is
+    ignored."""
+    ds = _datasets.get(dataset_id)
+    if not ds:
+        raise HTTPException(404, "Dataset not found.")
+    if ds["status"] != "uploading" or dataset_id not in _uploads:
+        raise HTTPException(400, ds["error"] or "Upload already finalized or failed.")
+    upload = _uploads[dataset_id]
+    if not 0 <= chunk_index < ds["total_chunks"]:
+        raise HTTPException(400, f"chunk_index must be in [0, {ds['total_chunks']}).")
+
+    chunk_bytes = await file.read()
+    duplicate = bool(upload["received"][chunk_index])
+    if not duplicate:
+        offset, length = _chunk_span(ds, chunk_index)
+        if len(chunk_bytes) != length:
+            raise HTTPException(400, f"Chunk {chunk_index} must be {length} bytes, got {len(chunk_bytes)}.")
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, _write_chunk, Path(ds["raw_path"]), offset, chunk_bytes)
+        if checksum and checksum.lower() != digest:
+            raise HTTPException(400, f"Checksum mismatch for chunk {chunk_index}; send it again.")
+        if not upload["received"][chunk_index]:   # a concurrent copy may have landed first
+            upload["received"][chunk_index] = 1
+            upload["digests"][chunk_index] = digest
+            ds["bytes_received"] += length
+            with upload["cond"]:
+                k = upload["next"]
+                while k < len(upload["received"]) and upload["received"][k]:
+                    k += 1
+                upload["next"] = k
+                upload["contiguous"] = min(k * ds["chunk_size"], ds["file_size"])
+                upload["cond"].notify_all()
+    if ds["file_size"] > 0:
+        ds["progress"] = min(95, int(ds["bytes_received"] / ds["file_size"] * 100))
+
+    return {
+        "ok": True,
+        "chunk_index": chunk_index,
+        "duplicate": duplicate,
+        "bytes_received": ds["bytes_received"],
+        "progress": ds["progress"],
+        "rows_parsed": ds.get("rows_parsed"),
+    }
+
+
+@app.post("/api/upload/finalize")
+async def upload_finalize(dataset_id: str = Query(...)):
+    """Signal that all chunks are uploaded. Checks that every chunk arrived and
+    still matches its checksum, then triggers background parsing. Missing or
+    damaged chunks are reported with a 409; the upload stays open so the client
+    can send them again."""
+    ds = _datasets.get(dataset_id)
+    if not ds:
+        raise HTTPException(404, "Dataset not found.")
+    if ds["status"] != "uploading":
+        raise HTTPException(400, ds["error"] or "Upload not in uploading state.")
+
+    missing = _missing_chunks(dataset_id)
+    if missing:
+        raise HTTPException(409, {"message": f"{len(missing)} chunk(s) not received.", "missing_chunks": missing})
+    if dataset_id in _uploads:
+        ds["status"] = "verifying"   # refuse chunks while the file is re-read
+        loop = asyncio.get_running_loop()
+        try:
+            bad = await loop.run_in_executor(None, _verify_chunks, dataset_id)
+        except OSError as e:
+            ds["status"] = "uploading"
+            raise HTTPException(500, f"Could not read the uploaded file: {e}")
+        upload = _uploads[dataset_id]
+        if bad:
+            with upload["cond"]:
+                for i in bad:
+                    upload["received"][i] = 0
+                    ds["bytes_received"] -= _chunk_span(ds, i)[1]
+                upload["next"] = min(upload["next"], bad[0])
+                upload["contiguous"] = min(upload["next"] * ds["chunk_size"], ds["file_size"])
+                upload["aborted"] = True   # the pipelined parse may have read the damaged bytes
+                upload["cond"].notify_all()
+            ds["status"] = "uploading"
+            raise HTTPException(409, {"message": f"{len(bad)} chunk(s) failed verification.", "missing_chunks": bad})
+        del _uploads[dataset_id]
+        with upload["cond"]:
+            worker = upload["worker"]
+            pipelined = worker is not None and not upload["aborted"]
+            upload["finalized"] = True
+            upload["cond"].notify_all()
+    else:
+        worker, pipelined = None, False
+
+    ds["status"] = "processing"
+    ds["progress"] = 5
+
+    # Submit to background worker, unless the pipelined parse is already on it
+    if not pipelined:
+        _worker_pool.submit(_background_parse_and_convert, dataset_id, None, worker)
+
+    return {"dataset_id": dataset_id, "status": "processing"}
+
+
+class PathImportRequest(BaseModel):
+    path: str   # relative to DCA_IMPORT_ROOT
+
+
+@app.post("/api/import/path")
+async def import_path(req: PathImportRequest):
+    """Import a file, or a hive-partitioned directory of Parquet/Feather
+    files, that already sits on the server under DCA_IMPORT_ROOT — nothing
+    is uploaded or copied to a raw file. Poll /api/dataset/{id}/status as
+    after an upload. Disabled (404) unless DCA_IMPORT_ROOT is set."""
+    if IMPORT_ROOT is None:
+        raise HTTPException(404, "Server-side import is disabled; set DCA_IMPORT_ROOT to enable it.")
+    source = (IMPORT_ROOT / req.path).resolve()
+    if not source.is_relative_to(IMPORT_ROOT) or source.is_relative_to(STORAGE_DIR.resolve()):
+        raise HTTPException(403, "Path is outside the import root.")
+    if not source.exists():
+        raise HTTPException(404, f"'{req.path}' not found.")
+    suffix = ".parquet" if source.is_dir() else source.suffix.lower()
+    if suffix not in (".csv",) + EXCEL_SUFFIXES + ARROW_SUFFIXES:
+        raise HTTPException(400, "Unsupported file type.")
+    files = source.rglob("*") if source.is_dir() else [source]
+    file_size = sum(f.stat().st_size for f in files if f.is_file())
+
+    dataset_id = uuid.uuid4().hex[:12]
+    (STORAGE_DIR / dataset_id).mkdir(parents=True, exist_ok=True)
+    _datasets[dataset_id] = {
+        "status": "processing",
+        "filename": source.name,
+        "suffix": suffix,
+        "file_size": file_size,
+        "raw_path": str(source),
+        "source_path": str(source),
+        "parquet_path": None,
+        "error": None,
+        "progress": 5,
+        "bytes_received": file_size,
+        "rows": 0,
+        "columns": [],
+        "numeric_columns": [],
+        "date_columns": [],
+        "disk_path": None,
+        "disk_mtime": 0,
+        "last_import": None,
+    }
+    _worker_pool.submit(_background_parse_and_convert, dataset_id)
+    return {"dataset_id": dataset_id, "status": "processing"}
+
+
+@app.get("/api/dataset/{dataset_id}/status")
+async def dataset_status(dataset_id: str):
+    """Poll processing status for a dataset."""
+    ds = _datasets.get(dataset_id)
+    if not ds:
+        raise HTTPException(404, "Dataset not found.")
+
+    result = {
+        "dataset_id": dataset_id,
+        "status": ds["status"],
+        "progress": ds["progress"],
+        "filename": ds["filename"],
+        "error": ds["error"],
+    }
+
+    # While uploading, tell a resuming client which chunks to (re)send
+    if ds["status"] == "uploading" and dataset_id in _uploads:
+        result.update({
+            "chunk_size": ds["chunk_size"],
+            "total_chunks": ds["total_chunks"],
+            "bytes_received": ds["bytes_received"],
+            "missing_chunks": _missing_chunks(dataset_id),
+        })
+    # CSVs are parsed during the upload: rows so far and an early preview
+    if ds["status"] in ("uploading", "verifying", "processing") and "rows_parsed" in ds:
+        result["rows_parsed"] = ds["rows_parsed"]
+        if dataset_id in _early_previews:
+            result["preview"] = _early_previews[dataset_id]
+
+    # When ready, include the full upload response
+    if ds["status"] == "ready":
+        result.update(await _locked(dataset_id, lambda: {
+            "rows": ds["rows"],
+            "columns": ds["columns"],
+            "numeric_columns": ds["numeric_columns"],
+            "date_columns": ds["date_columns"],
+            "has_disk_path": ds.get("disk_path") is not None,
+            "preview": _build_preview_list(dataset_id),
+            "last_import": ds.get("last_import"),
+            "version": _get_current_version_number(dataset_id),
+            "replay_errors": ds.get("replay_errors", []),
+        }))
+
+    return result
+
+
+def _build_preview_list(dataset_id: str):
+    """Return first 100 rows as dicts for the frontend preview."""
+    df = _frames.get(dataset_id)
+    if df is not None:
+        preview_df = df.head(PREVIEW_ROWS).copy()
+    elif dataset_id in _handles:
+        preview_df = _handles[dataset_id].head(PREVIEW_ROWS)
+    else:
+        return []
+    for col in _datasets[dataset_id]["date_columns"]:
+        if col in preview_df.columns and pd.api.types.is_datetime64_any_dtype(preview_df[col]):
+            preview_df[col] = preview_df[col].dt.strftime('%d.%m.%Y').fillna("")
+    return preview_df.fillna("").to_dict(orient="records")
+
+
+def _early_preview(table: pa.Table, date_columns: list) -> list:
+    """_build_preview_list for the first batch of a CSV still being parsed."""
+    preview_df = table.slice(0, PREVIEW_ROWS).to_pandas()
+    for col in date_columns:
+        dates = pd.to_datetime(preview_df[col], format=PARQUET_DATE_FORMAT, errors='coerce')
+        preview_df[col] = dates.dt.strftime('%d.%m.%Y').fillna("")
+    return preview_df.fillna("").to_dict(orient="records")
+
+
+# Legacy single-shot upload (still works for small files / backward compat)
+@app.post("/api/upload")
+async def upload_file(file: UploadFile = File(...)):
+    raw_bytes = await file.read()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _store_upload, raw_bytes, file.filename)
+
+
+def _store_upload(raw_bytes: bytes, filename: str) -> dict:
+    """Parse, store and install a single-shot upload (blocking)."""
+    global _active_dataset_id
+
+    suffix = Path(filename).suffix.lower()
+
+    df, date_columns = _parse_data(raw_bytes, suffix)
+
+    # Also save to storage + convert to Parquet
+    dataset_id = uuid.uuid4().hex[:12]
+    ds_dir = STORAGE_DIR / dataset_id
+    ds_dir.mkdir(parents=True, exist_ok=True)
+    raw_path = ds_dir / f"raw{suffix}"
+    _write_file_atomic(raw_path, raw_bytes)
+    parquet_path = ds_dir / "data.parquet"
+    _write_frame_parquet(df, date_columns, parquet_path)
+
+    # Register dataset entry for version control
+    _datasets[dataset_id] = {
+        "status": "ready",
+        "filename": filename,
+        "suffix": suffix,
+        "file_size": len(raw_bytes),
+        "raw_path": str(raw_path),
+        "parquet_path": str(parquet_path),
+        "error": None,
+        "progress": 100,
+        "bytes_received": len(raw_bytes),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "numeric_columns": list(df.select_dtypes(include="number").columns),
+        "date_columns": date_columns,
+    }
+    _install_dataset(dataset_id, _DatasetHandle(parquet_path, date_columns), df, date_columns)
+
+    # Save version snapshot
+    _save_version_snapshot(dataset_id, df, date_columns)
+
+    # Check if file exists on disk for auto-reload
+    _track_disk_file(_datasets[dataset_id])
+    _active_dataset_id = dataset_id
+    _save_dataset_record(dataset_id)
+    _registry_append({"active": dataset_id})
+
+    return _build_upload_response(dataset_id)
+
+
+@app.get("/api/datasets")
+async def list_datasets():
+    """All known datasets, which of them hold a frame in memory, and the
+    frame cache budget."""
+    with _frames_lock:
+        loaded = {k: _frame_bytes.get(k, 0) for k in _frames}
+        dirty = set(_dirty_frames)
+    return {
+        "active_dataset_id": _active_dataset_id,
+        "datasets": [
+            {"dataset_id": k, "filename": ds["filename"], "status": ds["status"], "rows": ds["rows"],
+             "in_memory": k in loaded, "memory_bytes": loaded.get(k, 0), "dirty": k in dirty}
+            for k, ds in _datasets.items()
+        ],
+        "frame_cache": {**_frame_stats, "bytes": sum(loaded.values()), "budget": FRAME_CACHE_BUDGET},
+    }
+
+
+@app.get("/api/columns")
+async def get_columns(dataset_id: Optional[str] = Query(None)):
+    ds_id = _resolve_dataset(dataset_id, "No dataset loaded yet.")
+    return await _locked(ds_id, lambda: {
+        "columns": _dataset_columns(ds_id), "numeric_columns": _dataset_numeric_columns(ds_id)})
+
+
+@app.get("/api/current")
+async def get_current_dataset(dataset_id: Optional[str] = Query(None)):
+    """Return the full current dataset info (same shape as upload response).
+    Used by the frontend to restore the Import Data tab on page reload."""
+    ds_id = _resolve_dataset(dataset_id, "No dataset loaded yet.")
+    return await _locked(ds_id, _build_upload_response, ds_id)
+
+
+@app.get("/api/wells")
+async def get_wells(well_col: str, dataset_id: Optional[str] = Query(None)):
+    """Return unique well names from the specified column."""
+    ds_id = _resolve_dataset(dataset_id, "No dataset loaded yet.")
+    return {"wells": await _locked(ds_id, _well_names, ds_id, well_col)}
+
+
+def _well_names(ds_id: str, well_col: str) -> list:
+    """Unique well names of a column (caller holds the read lock)."""
+    if well_col not in _dataset_columns(ds_id):
+        raise HTTPException(status_code=400, detail=f"Column '{well_col}' not found.")
+    df = _peek_frame(ds_id)
+    if df is not None:
+        return _get_well_index(ds_id, df, well_col).well_names()
+    return _WellIndex(_handles[ds_id].read([well_col]), well_col).well_names()
+
+
+def _require_columns(ds_id: str, columns: list):
+    """400 unless every column exists (caller holds the read lock)."""
+    for col in columns:
+        if col not in _dataset_columns(ds_id):
+            raise HTTPException(status_code=400, detail=f"Column '{col}' not found.")
+
+
+def _prepare_dca_series(dataset_id: str, x: str, y: str, well_col: str, well_list: list, combine: bool, excl: set):
+    """Per-well (name, x_origin, t, xs, y, fit_mask) tuples for /api/dca, sorted
+    by x (`xs` are epoch nanoseconds for dates). Call under the dataset's read
+    lock. Returns (is_date, prepared)."""
+    frame = _peek_frame(dataset_id)
+    if frame is not None:
+        index = _get_well_index(dataset_id, frame, well_col)
+    else:
+        # Lazy dataset: read only the three columns and only the selected wells
+        frame = _handles[dataset_id].read([well_col, x, y], well_col=well_col, wells=well_list)
+        index = _WellIndex(frame, well_col)
+
+    # Check if x column is already a datetime (parsed at upload time)
+    is_date = pd.api.types.is_datetime64_any_dtype(frame[x])
+
+    # ---- Combine mode: sum y-values across selected wells by time ----
+    if combine and len(well_list) > 1:
+        rows = [index.rows(w) for w in well_list if w in index]
+        rows = np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+        combined = frame.iloc[rows][[x, y]].dropna().copy()
+        combined[y] = pd.to_numeric(combined[y], errors='coerce').fillna(0.0)
+        combined = combined.groupby(x, sort=True)[y].sum().reset_index()
+        combined = combined.sort_values(x).reset_index(drop=True)
+        # Treat as a single "well" named after all combined wells
+        combined_name = ' + '.join(well_list)
+        well_list = [combined_name]
+        _combined_override = (*_column_values(combined[x]), *_column_values(combined[y]))
+    else:
+        _combined_override = None
+
+    # Pre-converted x/y arrays; each well is a slice through the index
+    x_all, x_valid = index.column(x)
+    y_all, y_valid = index.column(y)
+
+    prepared = []
+    for well_name in well_list:
+        if _combined_override is not None:
+            xs, x_ok, ys, y_ok = _combined_override
+        else:
+            rows = index.rows(well_name)
+            if rows is None:
+                continue
+            xs, x_ok, ys, y_ok = x_all[rows], x_valid[rows], y_all[rows], y_valid[rows]
+
+        # Drop rows with a missing x or y
+        keep = x_ok & y_ok
+        xs, ys = xs[keep], ys[keep]
+
+        if len(xs) < 3:
+            continue
+
+        if not is_date:
+            xs = np.where(np.isnan(xs), 0.0, xs)
+        # Sort by x column
+        order = np.argsort(xs, kind="quicksort")
+        xs = xs[order]
+        y_vals = np.where(np.isnan(ys[order]), 0.0, ys[order])
+
+        # Build numeric t for curve fitting
+        if is_date:
+            x_origin = pd.Timestamp(int(xs[0]))
+            t = (xs - xs[0]) / 1e9 / 86400.0
+        else:
+            x_origin = xs[0]
+            t = xs - x_origin
+
+        fit_mask = np.ones(len(t), dtype=bool)
+        fit_mask[[i for i in excl if i < len(t)]] = False
+        prepared.append((well_name, x_origin, t, xs, y_vals, fit_mask))
+    return is_date, prepared
+
+
+def _downsample_indices(y: np.ndarray, max_points: int, keep: np.ndarray) -> np.ndarray:
+    """Sorted positions of the points to plot when a series is longer than
+    `max_points`: the first and last point plus the min and max of y in
+    equal-count buckets, so spikes and shut-ins survive. Positions in `keep`
+    (excluded points, which must stay clickable) are always included."""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, (max_points - 2) // 2)
+    inner = y[1:-1]
+    size = -(-len(inner) // buckets)
+    buckets = -(-len(inner) // size)   # no bucket made only of padding
+    pad = buckets * size - len(inner)
+    lo = np.concatenate([inner, np.full(pad, np.inf)]).reshape(buckets, size).argmin(axis=1)
+    hi = np.concatenate([inner, np.full(pad, -np.inf)]).reshape(buckets, size).argmax(axis=1)
+    starts = np.arange(buckets) * size + 1
+    picked = np.concatenate([[0, n - 1], starts + lo, starts + hi, keep[keep < n]])
+    return np.unique(picked)
+
+
+# ---------------------------------------------------------------------------
+# Response encoding: JSON, packed float64 buffers, Arrow IPC
+# ---------------------------------------------------------------------------
+# Large numeric payloads skip FastAPI's jsonable_encoder. Clients pick a
+# format with ?format= or the Accept header:
+#   json   - pre-serialized JSON (orjson when installed)
+#   binary - uint32 header length, JSON header, padding to 8 bytes, then one
+#            little-endian float64 body; the header gives each array as
+#            [offset, length] in float64 units (NaN = missing)
+#   arrow  - Arrow IPC stream
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "binary": "application/octet-stream",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _response_format(request: Request, fmt: Optional[str]) -> str:
+    if fmt:
+        if fmt not in RESPONSE_FORMATS:
+            raise HTTPException(400, f"Unknown format '{fmt}'. Use one of: {', '.join(RESPONSE_FORMATS)}.")
+        return fmt
+    accept = request.headers.get("accept", "")
+    for name in ("arrow", "binary"):
+        if RESPONSE_FORMATS[name] in accept:
+            return name
+    return "json"
+
+
+def _json_default(v):
+    if isinstance(v, np.ndarray):
+        return np.where(np.isnan(v), None, v).tolist() if v.dtype.kind == "f" else v.tolist()
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(v).__name__}")
+
+
+def _json_bytes(payload) -> bytes:
+    """JSON-encode; numpy arrays are written directly (NaN -> null)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, allow_nan=False).encode()
+
+
+def _json_response(payload) -> Response:
+    """Pre-serialized JSON response."""
+    return Response(_json_bytes(payload), media_type=RESPONSE_FORMATS["json"])
+
+
+def _packed_response(header: dict, arrays: list) -> Response:
+    """Binary response: `header` plus `arrays` laid end to end as float64.
+    Each array's [offset, length] is in header["buffers"][i]."""
+    lengths = [len(a) for a in arrays]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(int)
+    header = {**header, "buffers": [[int(o), n] for o, n in zip(offsets, lengths)]}
+    head = json.dumps(header, default=_json_default).encode()
+    pad = -(4 + len(head)) % 8
+    body = np.concatenate(arrays).astype("<f8") if arrays else np.empty(0, dtype="<f8")
+    parts = [len(head).to_bytes(4, "little"), head, b" " * pad, body.tobytes()]
+    return Response(b"".join(parts), media_type=RESPONSE_FORMATS["binary"])
+
+
+def _arrow_response(table: pa.Table) -> Response:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=RESPONSE_FORMATS["arrow"])
+
+
+def _list_column(arrays: list, dtype=float) -> pa.ListArray:
+    """One list cell per array (NaN -> null)."""
+    offsets = np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype(np.int32)
+    values = np.concatenate(arrays).astype(dtype) if arrays else np.empty(0, dtype=dtype)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, from_pandas=True))
+
+
+@app.get("/api/dca")
+async def decline_curve_analysis(
+    request: Request,
+    x: str,
+    y: str,
+    well_col: str,
+    wells: str = Query(..., description="Comma-separated well names"),
+    model: str = Query("exponential", description="exponential|hyperbolic|harmonic"),
+    forecast_months: float = Query(0, description="Months to forecast"),
+    econ_limit: Optional[float] = Query(None, gt=0, description="Economic-limit rate: forecast and reserves end there"),
+    eur_months: Optional[float] = Query(None, gt=0, description="Time cap for reserves, months after the last fitted point"),
+    d_min: Optional[float] = Query(None, gt=0, description="Terminal decline (per t unit, like di): modified hyperbolic"),
+    rate_period: float = Query(1.0, gt=0, description="t units per y rate unit (30.4375 for monthly volumes on a date axis)"),
+    exclude_indices: str = Query("", description="Comma-separated indices to exclude from fitting"),
+    combine: bool = Query(False, description="If true, sum y-values of selected wells by time period"),
+    dataset_id: Optional[str] = Query(None),
+    max_points: Optional[int] = Query(None, ge=4, description="Downsample each plotted series to about this many points"),
+    fmt: Optional[str] = Query(None, alias="format", description="json|binary|arrow (default: Accept header)"),
+):
+    """
+    Perform Decline Curve Analysis.
+    Returns actual production data + fitted decline curves per well + forecast.
+    If combine=true, sums y-values of all selected wells grouped by the x column
+    and returns a single combined "well" for DCA.
+    With max_points, the fit still uses every point but the returned series are
+    downsampled; each well then carries "index", the original position of every
+    returned point, which is what exclude_indices refers to.
+    In the binary and Arrow formats, dates are epoch milliseconds.
+    With econ_limit and/or eur_months, "reserves" holds production to date,
+    remaining reserves and EUR per well as columns (one entry per well, in
+    order), plus the field total.
+    """
+    ds_id = _resolve_dataset(dataset_id, "No dataset loaded yet.")
+    if model not in _MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'.")
+    out_format = _response_format(request, fmt)
+
+    well_list = [w.strip() for w in wells.split(",") if w.strip()]
+
+    # Parse forecast months
+    try:
+        f_months = float(forecast_months)
+    except ValueError:
+        f_months = 0.0
+
+    # Parse exclude indices (indices in sorted order)
+    excl = set()
+    if exclude_indices:
+        excl = {int(i) for i in exclude_indices.split(",") if i.strip().isdigit()}
+
+    def prepare():
+        _require_columns(ds_id, [x, y, well_col])
+        return _prepare_dca_series(ds_id, x, y, well_col, well_list, combine, excl)
+    is_date, prepared = await _locked(ds_id, prepare)
+
+    # Fit the model on non-excluded data — all wells in one vectorized pass
+    fit_series = [(t[m], yv[m]) for _, _, t, _, yv, m in prepared if m.sum() >= 3]
+    batch_params = iter(await _fit_wells_cached(ds_id, fit_series, model, excl))
+
+    func, param_names, eq_fmt = _MODELS[model][0], _MODELS[model][1], _MODELS[model][4]
+    params_list = [next(batch_params) if fit_mask.sum() >= 3 else {} for *_, fit_mask in prepared]
+    P = _param_matrix(params_list, model)
+    # Forecasts start at the last *included* point (not the last overall point)
+    t_last = _fit_origins(prepared)
+    t_forecast = Q = None
+    if f_months > 0 and prepared:
+        # Roughly 30.44 days per month for basic forecast stepping
+        t_forecast = t_last[:, None] + DAYS_PER_MONTH * np.arange(1, int(f_months) + 1)
+        Q = np.nan_to_num(_decline_rates(model, P, t_forecast, d_min), nan=0.0, posinf=0.0, neginf=0.0)
+        if econ_limit:
+            Q[Q < econ_limit] = np.nan   # trimmed per well below
+    reserves = None
+    if econ_limit or eur_months:
+        reserves = _series_reserves(prepared, P, model, econ_limit, eur_months, d_min, rate_period)
+
+    result = []
+    for i, (well_name, x_origin, t, xs, y_vals, fit_mask) in enumerate(prepared):
+        params = params_list[i]
+
+        # Generate fitted values only for the non-excluded range
+        fitted = None
+        equation = ""
+        if params:
+            p_values = [params[n] for n in param_names]
+            fitted = np.nan_to_num(func(t, *p_values), nan=0.0, posinf=0.0, neginf=0.0)
+            # Null-out fitted values for excluded points (including those before
+            # the first included point), so the line starts at the fitted range
+            fitted[~fit_mask] = np.nan
+
+            # Format equation string
+            try:
+                equation = eq_fmt.format(**params)
+            except Exception:
+                equation = ""
+
+        # Forecast — monthly intervals (starting 1 month after last INCLUDED data)
+        well_t_forecast = well_q_forecast = None
+        if params and t_forecast is not None:
+            keep = ~np.isnan(Q[i])
+            well_t_forecast, well_q_forecast = t_forecast[i][keep], Q[i][keep]
+
+        index = None
+        if max_points is not None:
+            index = _downsample_indices(y_vals, max_points, np.flatnonzero(~fit_mask))
+            xs, t, y_vals = xs[index], t[index], y_vals[index]
+            fitted = fitted[index] if fitted is not None else None
+
+        result.append({
+            "well": well_name,
+            "x_origin": x_origin,
+            "xs": xs,
+            "index": index,
+            "t": t,
+            "y_actual": y_vals,
+            "y_fitted": fitted,
+            "t_forecast": well_t_forecast,
+            "q_forecast": well_q_forecast,
+            "params": params,
+            "equation": equation,
+        })
+
+    meta = {"x_label": x, "y_label": y, "model": model}
+    if reserves is not None:
+        meta["reserves"] = {"well": [w["well"] for w in result], **reserves,
+                            "field_eur": float(np.nansum(reserves["eur"]))}
+    if out_format == "binary":
+        return _dca_packed(meta, result, is_date, sorted(excl))
+    if out_format == "arrow":
+        return _dca_arrow(meta, result, is_date, sorted(excl))
+    return _dca_json(meta, result, is_date, sorted(excl))
+
+
+def _dca_forecast_x(w: dict, is_date: bool) -> np.ndarray:
+    """Forecast x values: epoch nanoseconds for dates, else x units."""
+    if is_date:
+        # t was (date - min_date).days, so new_date = min_date + t_forecast
+        return (w["x_origin"] + pd.to_timedelta(w["t_forecast"], unit="D")).as_unit("ns").asi8
+    return w["t_forecast"] + w["x_origin"]
+
+
+def _date_labels(arrays: list) -> list:
+    """DD.MM.YYYY strings for arrays of epoch nanoseconds. Wells share most
+    dates, so each distinct date is formatted once."""
+    if not arrays:
+        return []
+    uniq, inverse = np.unique(np.concatenate(arrays).astype(np.int64), return_inverse=True)
+    text = pd.to_datetime(uniq).strftime('%d.%m.%Y').to_numpy(dtype=object)[inverse]
+    bounds = np.cumsum([0] + [len(a) for a in arrays])
+    return [text[a:b].tolist() for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _dca_json(meta: dict, result: list, is_date: bool, excluded: list) -> Response:
+    xs = [w["xs"] for w in result]
+    fore_x = [_dca_forecast_x(w, is_date) for w in result if w["t_forecast"] is not None]
+    if is_date:   # display strings in DD.MM.YYYY format
+        xs, fore_x = _date_labels(xs), _date_labels(fore_x)
+    fore_x = iter(fore_x)
+    wells = [_dca_json_well(w, x_display, next(fore_x) if w["t_forecast"] is not None else None,
+                            is_date, excluded)
+             for w, x_display in zip(result, xs)]
+    return _json_response({**meta, "wells": wells})
+
+
+def _dca_json_well(w: dict, x_display, fore_x, is_date: bool, excluded: list) -> dict:
+    forecast = {}   # empty dict so w.forecast.x checks work safely
+    if fore_x is not None:
+        forecast = {"x": fore_x, "y": w["q_forecast"], "t": w["t_forecast"]}
+    out = {
+        "well": w["well"],
+        "x": x_display,
+        "t": w["t"],
+        "y_actual": w["y_actual"],
+        "y_fitted": w["y_fitted"],
+        "forecast": forecast,
+        "params": w["params"],
+        "equation": w["equation"],
+        "is_date": is_date,
+        "excluded_indices": excluded,
+    }
+    if w["index"] is not None:
+        out["index"] = w["index"]
+    return out
+
+
+def _dca_x_ms(xs: np.ndarray, is_date: bool) -> np.ndarray:
+    return xs / 1e6 if is_date else xs   # epoch ns -> ms
+
+
+def _dca_packed(meta: dict, result: list, is_date: bool, excluded: list) -> Response:
+    wells, arrays = [], []
+    for w in result:
+        entry = {"well": w["well"], "params": w["params"], "equation": w["equation"],
+                 "is_date": is_date, "excluded_indices": excluded, "buffers": {}}
+        named = [("x", _dca_x_ms(w["xs"], is_date)), ("t", w["t"]), ("y_actual", w["y_actual"])]
+        if w["index"] is not None:
+            named.append(("index", w["index"]))
+        if w["y_fitted"] is not None:
+            named.append(("y_fitted", w["y_fitted"]))
+        if w["t_forecast"] is not None:
+            named += [("forecast_x", _dca_x_ms(_dca_forecast_x(w, is_date), is_date)),
+                      ("forecast_t", w["t_forecast"]), ("forecast_y", w["q_forecast"])]
+        for name, values in named:
+            entry["buffers"][name] = len(arrays)
+            arrays.append(np.asarray(values, dtype=float))
+        wells.append(entry)
+    return _packed_response({**meta, "wells": wells}, arrays)
+
+
+def _dca_arrow(meta: dict, result: list, is_date: bool, excluded: list) -> Response:
+    meta = dict(meta)
+    reserves = meta.pop("reserves", None)
+    empty = np.empty(0)
+    forecast_x = [_dca_x_ms(_dca_forecast_x(w, is_date), is_date) if w["t_forecast"] is not None else empty
+                  for w in result]
+    columns = {
+        "well": pa.array([str(w["well"]) for w in result], pa.string()),
+        "x": _list_column([_dca_x_ms(w["xs"], is_date) for w in result]),
+        "t": _list_column([w["t"] for w in result]),
+        "y_actual": _list_column([w["y_actual"] for w in result]),
+        "y_fitted": _list_column([w["y_fitted"] if w["y_fitted"] is not None else empty for w in result]),
+        "forecast_x": _list_column(forecast_x),
+        "forecast_t": _list_column([w["t_forecast"] if w["t_forecast"] is not None else empty for w in result]),
+        "forecast_y": _list_column([w["q_forecast"] if w["q_forecast"] is not None else empty for w in result]),
+        "params": pa.array([json.dumps(w["params"]) for w in result], pa.string()),
+        "equation": pa.array([w["equation"] for w in result], pa.string()),
+    }
+    if result and result[0]["index"] is not None:
+        columns["index"] = _list_column([w["index"] for w in result], np.int64)
+    if reserves is not None:   # one row per well already: plain columns
+        columns.update({k: pa.array(v, from_pandas=True) for k, v in reserves.items()
+                        if k not in ("well", "field_eur")})
+        meta["field_eur"] = json.dumps(reserves["field_eur"])
+    table = pa.table(columns)
+    schema_meta = {**meta, "is_date": json.dumps(is_date), "excluded_indices": json.dumps(excluded),
+                   "x_unit": "epoch_ms" if is_date else ""}
+    return _arrow_response(table.replace_schema_metadata(schema_meta))
+
+
+@app.get("/api/dca/cache")
+async def fit_cache_stats():
+    """Hit/miss counters for the fit-result cache."""
+    lookups = _fit_cache_stats["hits"] + _fit_cache_stats["disk_hits"] + _fit_cache_stats["misses"]
+    return {
+        **_fit_cache_stats,
+        "entries": len(_fit_cache),
+        "capacity": FIT_CACHE_SIZE,
+        "disk_enabled": FIT_CACHE_DISK,
+        "hit_rate": round((lookups - _fit_cache_stats["misses"]) / lookups, 4) if lookups else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Field-wide DCA jobs
+# ---------------------------------------------------------------------------
+# POST /api/dca/jobs fits a whole field (or a well list too long for a query
+# string) as a background task, independent of the client connection. Wells
+# are prepared and fitted in batches of DCA_JOB_BATCH through the same fit
+# cache and fitting workers as /api/dca; each finished batch is published to
+# any streaming readers (NDJSON or SSE, resumable by position) and, when the
+# job ends, the full result table is written to
+# STORAGE_DIR/<dataset_id>/dca_jobs/<job_id>.parquet for re-download.
+DCA_JOB_BATCH = int(os.environ.get("DCA_JOB_BATCH", "500"))
+MAX_DCA_JOBS = 50   # finished jobs kept in memory (their result files stay on disk)
+DCA_JOB_FIELDS = ("id", "dataset_id", "status", "model", "wells_total", "wells_done", "progress",
+                  "error", "created", "finished")
+_dca_jobs: "OrderedDict[str, dict]" = OrderedDict()   # job_id -> job state, see create_dca_job
+
+
+class DcaJobRequest(BaseModel):
+    x: str
+    y: str
+    well_col: str
+    wells: Optional[List[str]] = None   # None: every well in the dataset
+    model: str = "exponential"
+    exclude_indices: List[int] = []
+    econ_limit: Optional[float] = None
+    eur_months: Optional[float] = None
+    d_min: Optional[float] = None
+    rate_period: float = 1.0
+
+
+def _dca_job_dir(dataset_id: str) -> Path:
+    return STORAGE_DIR / dataset_id / "dca_jobs"
+
+
+def _dca_job_status(job: dict) -> dict:
+    return {k: job[k] for k in DCA_JOB_FIELDS}
+
+
+def _dca_job_table(job: dict, prepared: list, params_list: list) -> pa.Table:
+    """One row per well: point count, fitted parameters and, when the job
+    has a limit, reserves."""
+    req = job["request"]
+    names = _MODELS[req.model][1]
+    P = _param_matrix(params_list, req.model)
+    columns = {
+        "well": pa.array([str(w) for w, *_ in prepared], pa.string()),
+        "points": pa.array([int(m.sum()) for *_, m in prepared], pa.int64()),
+        **{n: pa.array(P[:, j], from_pandas=True) for j, n in enumerate(names)},
+    }
+    if req.econ_limit or req.eur_months:
+        reserves = _series_reserves(prepared, P, req.model, req.econ_limit, req.eur_months,
+                                    req.d_min, req.rate_period)
+        columns.update({k: pa.array(v, from_pandas=True) for k, v in reserves.items()})
+    return pa.table(columns)
+
+
+def _prepare_dca_batch(dataset_id: str, req: DcaJobRequest, wells: list, excl: set):
+    with _dataset_lock(dataset_id).read():
+        return _prepare_dca_series(dataset_id, req.x, req.y, req.well_col, wells, False, excl)[1]
+
+
+async def _run_dca_job(job: dict):
+    """Fit a job's wells batch by batch, publishing each batch as it finishes."""
+    ds_id, req = job["dataset_id"], job["request"]
+    loop = asyncio.get_running_loop()
+    excl = set(req.exclude_indices)
+    job["status"] = "running"
+    try:
+        await _load_frame(ds_id)   # field-wide: one load instead of a filtered read per batch
+        for start in range(0, len(job["wells"]), DCA_JOB_BATCH):
+            wells = job["wells"][start:start + DCA_JOB_BATCH]
+            prepared = await loop.run_in_executor(None, _prepare_dca_batch, ds_id, req, wells, excl)
+            fit_series = [(t[m], yv[m]) for _, _, t, _, yv, m in prepared if m.sum() >= 3]
+            fitted = iter(await _fit_wells_cached(ds_id, fit_series, req.model, excl))
+            params_list = [next(fitted) if m.sum() >= 3 else {} for *_, m in prepared]
+            job["tables"].append(_dca_job_table(job, prepared, params_list))
+            job["rows"].extend(job["tables"][-1].to_pylist())
+            job["wells_done"] = min(start + len(wells), job["wells_total"])
+            job["progress"] = round(job["wells_done"] / max(job["wells_total"], 1), 4)
+            _dca_job_notify(job)
+        path = _dca_job_dir(ds_id) / f"{job['id']}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.concat_tables(job["tables"]) if job["tables"] else _dca_job_table(job, [], [])
+        staged = path.with_suffix(".tmp")
+        await loop.run_in_executor(None, pq.write_table, table, staged)
+        os.replace(staged, path)
+        job["status"] = "done"
+    except asyncio.CancelledError:
+        job["status"] = "cancelled"
+    except Exception as e:
+        job["status"], job["error"] = "error", str(e)
+    finally:
+        job["tables"] = []
+        job["finished"] = datetime.now(timezone.utc).isoformat()
+        _dca_job_notify(job)
+
+
+def _dca_job_notify(job: dict):
+    """Wake the job's streaming readers."""
+    job["changed"].set()
+    job["changed"] = asyncio.Event()
+
+
+def _get_dca_job(job_id: str) -> dict:
+    job = _dca_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"DCA job '{job_id}' not found.")
+    return job
+
+
+@app.post("/api/dca/jobs")
+async def create_dca_job(req: DcaJobRequest, dataset_id: Optional[str] = Query(None)):
+    """Start a background DCA over a well list, or every well when none is given."""
+    ds_id = _resolve_dataset(dataset_id, "No dataset loaded yet.")
+    if req.model not in _MODELS:
+        raise HTTPException(400, f"Unknown model '{req.model}'.")
+    if any(v is not None and v <= 0 for v in (req.econ_limit, req.eur_months, req.d_min, req.rate_period)):
+        raise HTTPException(400, "econ_limit, eur_months, d_min and rate_period must be positive.")
+    await _locked(ds_id, _require_columns, ds_id, [req.x, req.y, req.well_col])
+    if req.wells is None:
+        wells = (await get_wells(req.well_col, ds_id))["wells"]
+    else:
+        wells = list(dict.fromkeys(w.strip() for w in req.wells if w.strip()))
+
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "dataset_id": ds_id,
+        "status": "queued",
+        "model": req.model,
+        "wells_total": len(wells),
+        "wells_done": 0,
+        "progress": 0.0,
+        "error": None,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "finished": None,
+        "request": req,
+        "wells": wells,
+        "tables": [],   # per-batch results, written out when the job ends
+        "rows": [],     # the same rows as dicts, for streaming readers
+        "changed": asyncio.Event(),
+    }
+    _dca_jobs[job["id"]] = job
+    while len(_dca_jobs) > MAX_DCA_JOBS:
+        oldest = next((k for k, j in _dca_jobs.items() if j["finished"]), None)
+        if oldest is None:
+            break
+        del _dca_jobs[oldest]
+    job["task"] = asyncio.create_task(_run_dca_job(job))
+    return _dca_job_status(job)
+
+
+@app.get("/api/dca/jobs")
+async def list_dca_jobs(dataset_id: Optional[str] = Query(None)):
+    """Jobs kept in memory, newest last (optionally for one dataset)."""
+    return {"jobs": [_dca_job_status(j) for j in _dca_jobs.values()
+                     if dataset_id is None or j["dataset_id"] == dataset_id]}
+
+
+@app.get("/api/dca/jobs/{job_id}")
+async def get_dca_job(job_id: str):
+    return _dca_job_status(_get_dca_job(job_id))
+
+
+@app.delete("/api/dca/jobs/{job_id}")
+async def cancel_dca_job(job_id: str):
+    """Cancel a job that has not finished; wells already fitted stay cached."""
+    job = _get_dca_job(job_id)
+    if job["finished"] is None:
+        job["task"].cancel()
+        await asyncio.gather(job["task"], return_exceptions=True)
+        if job["finished"] is None:   # cancelled before it started
+            job["status"], job["finished"] = "cancelled", datetime.now(timezone.utc).isoformat()
+            _dca_job_notify(job)
+    return _dca_job_status(job)
+
+
+@app.get("/api/dca/jobs/{job_id}/stream")
+async def stream_dca_job(job_id: str, request: Request,
+                         fmt: str = Query("ndjson", alias="format", description="ndjson|sse"),
+                         offset: int = Query(0, ge=0, description="Skip the first N well results (resume)")):
+    """Per-well results as they finish, then a final status line. NDJSON lines
+    are {"type": "well"|"progress"|"status", ...}; SSE events carry the same
+    objects, and the id of a well event is its position (Last-Event-ID resumes)."""
+    job = _get_dca_job(job_id)
+    if fmt not in ("ndjson", "sse"):
+        raise HTTPException(400, "format must be ndjson or sse.")
+    last_id = request.headers.get("last-event-id", "")
+    if fmt == "sse" and last_id.isdigit():
+        offset = max(offset, int(last_id) + 1)
+
+    def encode(kind: str, payload: dict, event_id=None) -> bytes:
+        line = _json_bytes({"type": kind, **payload})
+        if fmt == "ndjson":
+            return line + b"\n"
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{head}event: {kind}\n".encode() + b"data: " + line + b"\n\n"
+
+    async def lines():
+        sent = offset
+        while True:
+            changed = job["changed"]
+            rows = job["rows"]
+            if sent < len(rows):
+                yield b"".join(encode("well", rows[i], i) for i in range(sent, len(rows)))
+                sent = len(rows)
+                yield encode("progress", {k: job[k] for k in ("wells_done", "wells_total", "progress")})
+            if job["finished"] is not None and sent >= len(job["rows"]):
+                yield encode("status", _dca_job_status(job))
+                return
+            await changed.wait()
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return StreamingResponse(lines(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/dca/jobs/{job_id}/result")
+async def dca_job_result(job_id: str):
+    """The finished job's results as a Parquet file (one row per well)."""
+    job = _dca_jobs.get(job_id)
+    if job is not None:
+        if job["status"] != "done":
+            raise HTTPException(409, f"DCA job '{job_id}' is {job['status']}.")
+        path = _dca_job_dir(job["dataset_id"]) / f"{job_id}.parquet"
+    elif not job_id.isalnum():
+        raise HTTPException(404, f"No result for DCA job '{job_id}'.")
+    else:   # from before a restart
+        path = next(STORAGE_DIR.glob(f"*/dca_jobs/{job_id}.parquet"), None)
+    if path is None or not path.exists():
+        raise HTTPException(404, f"No result for DCA job '{job_id}'.")
+    return FileResponse(path, media_type="application/vnd.apache.parquet",
+                        filename=f"dca_{job_id}.parquet")
+
+
+# ---------------------------------------------------------------------------
+# Incremental sync (append / upsert by key)
+# ---------------------------------------------------------------------------
+# A monthly file mostly repeats history. Rows are matched by key (well, date):
+# only new rows and rows whose values changed are written, as one delta file,
+# and the loaded frame is patched in place of a full re-import. Fit-cache keys
+# hash each well's series, so only the wells the delta touches get refitted.
+SYNC_MODES = ("replace", "append", "upsert")
+
+
+def _sync_key(dataset_id: str, key: Optional[str]) -> list:
+    """Key columns for an incremental sync: `key` ("Well,Date"), or else the
+    first text column plus the first date column."""
+    columns = _dataset_columns(dataset_id)
+    if key:
+        cols = [c.strip() for c in key.split(",") if c.strip()]
+    else:
+        numeric = set(_dataset_numeric_columns(dataset_id))
+        dates = _datasets[dataset_id]["date_columns"]
+        well = next((c for c in columns if c not in numeric and c not in dates), None)
+        cols = [well, dates[0]] if well and dates else []
+    if not cols:
+        raise HTTPException(400, "Could not infer the key columns; pass key=<well column>,<date column>.")
+    missing = [c for c in cols if c not in columns]
+    if missing:
+        raise HTTPException(400, f"Key column(s) not found: {missing}")
+    return cols
+
+
+def _conform_columns(df: pd.DataFrame, reference: pd.DataFrame) -> pd.DataFrame:
+    """Cast an upload's columns to the stored dtypes so keys and values
+    compare like for like."""
+    out = df.copy(deep=False)
+    for col in reference.columns.intersection(out.columns):
+        ref, s = reference[col].dtype, out[col]
+        if s.dtype == ref:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(ref):
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                s = _parse_dates(s)
+        elif pd.api.types.is_numeric_dtype(ref):
+            s = pd.to_numeric(s, errors='coerce')
+        try:
+            out[col] = s.astype(ref)
+        except (TypeError, ValueError):
+            out[col] = s   # e.g. missing values in an integer column
+    return out
+
+
+def _row_hashes(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """One uint64 per row over `columns`. Numbers and dates are normalized
+    first, so equal values hash equal whatever their dtype."""
+    norm = {}
+    for col in columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s) or pd.api.types.is_numeric_dtype(s):
+            values, valid = _column_values(s)
+            norm[col] = np.where(valid, values, 0)
+            norm[col + " valid"] = valid
+        else:
+            # hash each distinct value once (well names repeat on every row)
+            codes, uniques = pd.factorize(s)
+            hashes = pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False)
+            norm[col] = np.append(hashes, 0)[codes]
+    return pd.util.hash_pandas_object(pd.DataFrame(norm), index=False).to_numpy()
+
+
+def _rows_differ(a: pd.DataFrame, b: pd.DataFrame, columns: list) -> np.ndarray:
+    """Row-wise "any value changed" between two aligned frames. Floats match
+    to a relative 1e-12 so parser round-off does not count as a change."""
+    differs = np.zeros(len(a), dtype=bool)
+    for col in columns:
+        sa, sb = a[col], b[col]
+        if pd.api.types.is_numeric_dtype(sa) or pd.api.types.is_datetime64_any_dtype(sa):
+            va, ok_a = _column_values(sa)
+            vb, ok_b = _column_values(sb)
+            same = va == vb if va.dtype.kind == "i" else np.isclose(va, vb, rtol=1e-12, atol=0.0)
+            differs |= (ok_a != ok_b) | (ok_a & ok_b & ~same)
+        else:
+            differs |= _row_hashes(a, [col]) != _row_hashes(b, [col])
+    return differs
+
+
+def _upsert_rows(dataset_id: str, new_df: pd.DataFrame, key_cols: list, mode: str) -> dict:
+    """Merge an upload into a dataset by key, persisting only the delta.
+
+    `append` adds rows whose key is new; `upsert` also replaces rows whose
+    values changed. Returns the counts and the wells (first key column) touched.
+    Matching, derived-column replay and the delta write run without the lock;
+    the write lock is only taken to check that the dataset did not change
+    meanwhile and swap the delta in (else the merge is done again)."""
+    ds = _datasets[dataset_id]
+    lock = _dataset_lock(dataset_id)
+    while True:
+        with lock.write():
+            _write_back(dataset_id)   # logged edits must not be replayed over the merged rows
+            handle = _handles[dataset_id]
+            frame = _peek_frame(dataset_id)   # stays lazy when not loaded
+            pipeline = list(_derived_columns.get(dataset_id, []))
+        derived = {d["name"] for d in pipeline}
+        current = list(frame.columns) if frame is not None else handle.columns
+        stored = [c for c in current if c not in derived]
+        missing = [c for c in stored if c not in new_df.columns]
+        extra = [c for c in new_df.columns if c not in current]
+        if missing or extra:
+            raise HTTPException(400, f"Incremental sync needs the dataset's columns (missing {missing}, "
+                                     f"unexpected {extra}); use mode=replace to change them.")
+
+        # Match keys against the current rows (the frame and the handle hold
+        # the same rows here: edits were just written back)
+        incoming = _conform_columns(new_df[stored], frame if frame is not None else handle.head(0))
+        new_keys = _row_hashes(incoming, key_cols)
+        last = ~pd.Index(new_keys).duplicated(keep="last")
+        incoming, new_keys = incoming[last].reset_index(drop=True), new_keys[last]
+        existing = frame[key_cols] if frame is not None else handle.read(key_cols)
+        n_rows = len(existing)
+        lookup = pd.Series(np.arange(n_rows), index=_row_hashes(existing, key_cols))
+        lookup = lookup[~lookup.index.duplicated(keep="last")]
+        matched = lookup.reindex(new_keys).to_numpy()
+        is_new = np.isnan(matched)
+
+        parts, positions = [], []
+        if mode == "upsert" and not is_new.all():
+            pos = matched[~is_new].astype(np.int64)
+            old_rows = frame.iloc[pos] if frame is not None else handle.take(pos, stored)
+            changed = incoming[~is_new]
+            compare = [c for c in stored if c in old_rows.columns]
+            differs = _rows_differ(old_rows, changed, compare)
+            if differs.any():
+                parts.append(changed[differs])
+                positions.append(pos[differs])
+        n_updated = len(positions[0]) if positions else 0
+        n_added = int(is_new.sum())
+        if n_added:
+            parts.append(incoming[is_new])
+            positions.append(n_rows + np.arange(n_added))
+        summary = {"mode": mode, "key": key_cols, "rows_added": n_added,
+                   "rows_updated": n_updated, "affected_wells": [], "replay_errors": []}
+        if not parts:
+            return summary
+
+        rows = pd.concat(parts, ignore_index=True)
+        positions = np.concatenate(positions)
+        rows, summary["replay_errors"] = _replay_derived_columns(dataset_id, rows)
+        summary["affected_wells"] = sorted(rows[key_cols[0]].dropna().astype(str).unique().tolist())
+        delta = _write_delta_object(dataset_id, rows.reindex(columns=handle.columns), positions,
+                                    handle.date_columns, n_rows + n_added)
+
+        with lock.write():
+            if (_handles.get(dataset_id) is not handle or dataset_id in _dirty_frames
+                    or _derived_columns.get(dataset_id, []) != pipeline or not Path(delta).exists()):
+                continue   # edited, synced or re-imported meanwhile: merge again
+            _set_handle(dataset_id, _DatasetHandle(handle.path, handle.date_columns, handle.deltas + [delta]))
+            _invalidate_column_caches(dataset_id)
+
+            frame = _peek_frame(dataset_id)   # may have been loaded or evicted meanwhile
+            if frame is not None:
+                frame_rows = rows.reindex(columns=frame.columns)
+                updated = frame.copy(deep=False)
+                if n_updated:
+                    updated = _patch_rows(frame, positions[:n_updated], frame_rows.iloc[:n_updated])
+                if n_added:
+                    updated = pd.concat([updated, frame_rows.iloc[n_updated:]], ignore_index=True)
+                _swap_frame(dataset_id, updated, resized=True, dirty=False)
+                _refresh_well_indexes(dataset_id, updated)
+            ds["rows"] = n_rows + n_added
+            ds["last_import"] = datetime.now(timezone.utc).isoformat()
+            _save_dataset_record(dataset_id)
+            break
+
+    _save_version_snapshot(dataset_id, _handles[dataset_id], handle.date_columns)
+    if len(ds["deltas"]) >= DELTA_COMPACT_FILES:
+        _worker_pool.submit(_compact_deltas, dataset_id)
+    return summary
+
+
+def _compact_deltas(dataset_id: str):
+    """Fold a dataset's delta files into a new data.parquet (background)."""
+    handle = _handles.get(dataset_id)
+    if handle is None or not handle.deltas:
+        return
+    ds_dir = STORAGE_DIR / dataset_id
+    staged_path = ds_dir / "data.compact.parquet"
+    _write_frame_parquet(handle.read(), handle.date_columns, staged_path)
+    with _dataset_lock(dataset_id).write():
+        if _handles.get(dataset_id) is not handle:
+            staged_path.unlink(missing_ok=True)   # changed meanwhile; the next delta retries
+            return
+        os.replace(staged_path, ds_dir / "data.parquet")
+        _set_handle(dataset_id, _DatasetHandle(ds_dir / "data.parquet", handle.date_columns))
+        _gc_dataset_files(dataset_id)
+        _save_dataset_record(dataset_id)
+
+
+# ---------------------------------------------------------------------------
+# Data editing & reload endpoints
+# ---------------------------------------------------------------------------
+class CellUpdate(BaseModel):
+    row: int
+    column: str
+    value: str
+
+
+class BulkCellUpdate(BaseModel):
+    """Columnar batch of (row, column, value) edits; `column` applies to all rows."""
+    rows: List[int]
+    columns: Optional[List[str]] = None
+    column: Optional[str] = None
+    values: list
+
+
+class NewColumn(BaseModel):
+    name: str
+    formula: str
+
+
+@app.get("/api/reload")
+async def reload_from_disk(
+    dataset_id: Optional[str] = Query(None),
+    mode: str = Query("replace"),
+    key: Optional[str] = Query(None),
+):
+    """Re-read the file from disk if available, otherwise re-parse stored bytes.
+    Saves a new version and replays derived columns. mode=append|upsert merges
+    the file by `key` instead of replacing the data (see _upsert_rows)."""
+    ds_id = _resolve_dataset(dataset_id)
+    if mode not in SYNC_MODES:
+        raise HTTPException(400, f"Unknown mode '{mode}'. Use one of {list(SYNC_MODES)}.")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _reload_dataset, ds_id, mode, key)
+
+
+def _reload_dataset(ds_id: str, mode: str, key: Optional[str]):
+    """Parse the dataset's source again and replace or merge its data
+    (blocking; runs in the executor)."""
+    ds = _datasets[ds_id]
+    disk_path = ds.get("disk_path")
+    if disk_path and Path(disk_path).exists():
+        df, date_columns = _read_source(Path(disk_path), ds["suffix"])
+        ds["disk_mtime"] = Path(disk_path).stat().st_mtime
+    else:
+        # raw bytes are not kept in memory — re-read the stored raw file
+        df, date_columns = _read_source(Path(ds["raw_path"]), ds["suffix"])
+
+    if mode != "replace":
+        with _dataset_lock(ds_id).read():
+            key_cols = _sync_key(ds_id, key)
+        summary = _upsert_rows(ds_id, df, key_cols, mode)
+        with _dataset_lock(ds_id).read():
+            return _build_upload_response(ds_id, **summary)
+
+    _invalidate_fit_cache(ds_id)
+
+    # Stage the new Parquet next to the live one (readers are not blocked)
+    staged_path = STORAGE_DIR / ds_id / "data.next.parquet"
+    _write_frame_parquet(df, date_columns, staged_path)
+
+    # Replay derived columns
+    replay_errors = []
+    replayed = bool(_derived_columns.get(ds_id))
+    if replayed:
+        df, replay_errors = _replay_derived_columns(ds_id, df)
+
+    # Swap it in + version snapshot
+    with _dataset_lock(ds_id).write():
+        ds["replay_errors"] = replay_errors
+        handle = _commit_import(ds_id, staged_path, df, date_columns, dirty=replayed)
+    _save_version_snapshot(ds_id, handle, date_columns)
+    with _dataset_lock(ds_id).read():
+        return _build_upload_response(ds_id, replay_errors=replay_errors)
+
+
+@app.post("/api/sync/upload")
+async def sync_upload(
+    file: UploadFile = File(...),
+    dataset_id: Optional[str] = Query(None),
+    mode: str = Query("replace"),
+    key: Optional[str] = Query(None),
+):
+    """Receive a re-synced file from the browser (File System Access API).
+    Creates a new version, replays pipeline, returns updated data.
+    mode=append|upsert merges the file into the dataset by `key` and stores
+    only the rows that are new or changed; the stored raw file is kept."""
+    ds_id = dataset_id or _active_dataset_id
+    if not ds_id or ds_id not in _datasets:
+        raise HTTPException(400, "No active dataset to sync.")
+    if mode not in SYNC_MODES:
+        raise HTTPException(400, f"Unknown mode '{mode}'. Use one of {list(SYNC_MODES)}.")
+
+    raw_bytes = await file.read()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _sync_dataset, ds_id, raw_bytes, file.filename, mode, key)
+
+
+def _sync_dataset(ds_id: str, raw_bytes: bytes, filename: str, mode: str, key: Optional[str]) -> dict:
+    """Parse a re-synced file and replace or merge the dataset's data
+    (blocking; runs in the executor)."""
+    suffix = Path(filename).suffix.lower()
+    try:
+        df, detected_dates = _parse_data(raw_bytes, suffix)
+    except Exception as e:
+        raise HTTPException(400, f"Failed to parse file: {e}")
+
+    if mode != "replace":
+        with _dataset_lock(ds_id).read():
+            key_cols = _sync_key(ds_id, key)
+        summary = _upsert_rows(ds_id, df, key_cols, mode)
+        ds = _datasets[ds_id]
+        with _dataset_lock(ds_id).read():
+            return {
+                "filename": ds["filename"],
+                "rows": _dataset_num_rows(ds_id),
+                "columns": _dataset_columns(ds_id),
+                "numeric_columns": _dataset_numeric_columns(ds_id),
+                "date_columns": ds["date_columns"],
+                "has_disk_path": ds.get("disk_path") is not None,
+                "last_import": ds["last_import"],
+                "dataset_id": ds_id,
+                "version": _get_current_version_number(ds_id),
+                **summary,
+            }
+
+    _invalidate_fit_cache(ds_id)
+
+    # Update stored raw file (never the file a path import points at)
+    ds = _datasets[ds_id]
+    if ds.pop("source_path", None):
+        ds["raw_path"] = str(STORAGE_DIR / ds_id / f"raw{suffix}")
+    raw_path = Path(ds["raw_path"])
+    _write_file_atomic(raw_path, raw_bytes)
+
+    # Stage new Parquet
+    staged_path = STORAGE_DIR / ds_id / "data.next.parquet"
+    _write_frame_parquet(df, detected_dates, staged_path)
+
+    # Replay derived columns
+    replay_errors = []
+    replayed = bool(_derived_columns.get(ds_id))
+    if replayed:
+        df, replay_errors = _replay_derived_columns(ds_id, df)
+
+    # Swap it in and update the dataset registry
+    with _dataset_lock(ds_id).write():
+        ds["filename"] = filename
+        ds["suffix"] = suffix
+        ds["replay_errors"] = replay_errors
+        _commit_import(ds_id, staged_path, df, detected_dates, dirty=replayed)
+
+    # Save version snapshot
+    _save_version_snapshot(ds_id, df, detected_dates)
+
+    resp = {
+        "filename": ds["filename"],
+        "rows": len(df),
+        "columns": list(df.columns),
+        "numeric_columns": list(df.select_dtypes(include="number").columns),
+        "date_columns": detected_dates,
+        "has_disk_path": ds.get("disk_path") is not None,
+        "last_import": ds["last_import"],
+        "dataset_id": ds_id,
+        "version": _get_current_version_number(ds_id),
+        "replay_errors": replay_errors,
+    }
+    return resp
+
+
+@app.get("/api/versions")
+async def list_versions(dataset_id: Optional[str] = Query(None)):
+    """List all stored versions for a dataset (default: the active one)."""
+    ds_id = dataset_id or _active_dataset_id
+    if not ds_id:
+        raise HTTPException(404, "No active dataset.")
+    versions, current = await _locked(
+        ds_id, lambda: (list(_versions.get(ds_id, [])), _get_current_version_number(ds_id)))
+    return {
+        "dataset_id": ds_id,
+        "versions": [
+            {"version": v["version"], "timestamp": v["timestamp"],
+             "rows": v["rows"], "columns": len(v["columns"]), "status": v["status"],
+             "bytes_added": v.get("bytes_added")}
+            for v in versions
+        ],
+        "current_version": current,
+    }
+
+
+@app.post("/api/versions/rollback")
+async def rollback_version(version: int = Query(...), dataset_id: Optional[str] = Query(None)):
+    """Rollback to a specific version by re-loading its Parquet snapshot."""
+    ds_id = dataset_id or _active_dataset_id
+    if not ds_id or ds_id not in _datasets:
+        raise HTTPException(404, "No active dataset.")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _rollback_dataset, ds_id, version)
+
+
+def _rollback_dataset(ds_id: str, version: int) -> dict:
+    """Install a stored version as the dataset's current state (blocking)."""
+    with _dataset_lock(ds_id).read():
+        versions = list(_versions.get(ds_id, []))
+    target = None
+    for v in versions:
+        if v["version"] == version:
+            target = v
+            break
+    if not target:
+        raise HTTPException(404, f"Version {version} not found.")
+
+    parquet_path = Path(target["parquet_path"])
+    with _dataset_lock(ds_id).write():
+        if not all(Path(p).exists() for p in [parquet_path, *target.get("deltas", [])]):
+            raise HTTPException(404, "Version Parquet file missing.")
+
+        # Stored objects are immutable, so the version's files are opened in
+        # place (nothing is copied). The frame is only materialized again
+        # when an editor needs it
+        if "date_columns" in target:
+            date_columns = list(target["date_columns"])
+        else:
+            # Older versions: re-detect dates from dtypes
+            schema = pq.read_schema(str(parquet_path))
+            date_columns = [f.name for f in schema if pa.types.is_timestamp(f.type)]
+        handle = _DatasetHandle(parquet_path, date_columns, target.get("deltas", []))
+        _install_dataset(ds_id, handle, None, date_columns)
+    _invalidate_fit_cache(ds_id)
+
+    ds = _datasets[ds_id]
+    return {
+        "ok": True,
+        "rolled_back_to": version,
+        "rows": ds["rows"],
+        "columns": ds["columns"],
+        "numeric_columns": ds["numeric_columns"],
+        "date_columns": date_columns,
+        "last_import": ds["last_import"],
+        "filename": ds["filename"],
+        "dataset_id": ds_id,
+        "has_disk_path": ds.get("disk_path") is not None,
+        "version": _get_current_version_number(ds_id),
+    }
+
+
+@app.get("/api/derived_columns")
+async def get_derived_columns(dataset_id: Optional[str] = Query(None)):
+    """Return the pipeline of derived columns for a dataset."""
+    ds_id = dataset_id or _active_dataset_id
+    if not ds_id:
+        return {"columns": []}
+    return {"columns": _derived_columns.get(ds_id, [])}
+
+
+@app.get("/api/file_status")
+async def file_status(dataset_id: Optional[str] = Query(None)):
+    """Check if the file on disk has been modified since last load."""
+    ds = _datasets.get(dataset_id or _active_dataset_id)
+    disk_path = ds.get("disk_path") if ds else None
+    if not disk_path or not Path(disk_path).exists():
+        return {"has_disk_path": False, "modified": False}
+    current_mtime = Path(disk_path).stat().st_mtime
+    return {
+        "has_disk_path": True,
+        "modified": current_mtime > ds["disk_mtime"],
+        "disk_mtime": current_mtime,
+    }
+
+
+@app.get("/api/data")
+async def get_data(
+    page: int = Query(1),
+    page_size: int = Query(50),
+    sort_col: Optional[str] = None,
+    sort_asc: bool = True,
+    filter_col: Optional[str] = None,
+    filter_val: Optional[str] = None,
+    dataset_id: Optional[str] = Query(None),
+):
+    """Get paginated data for the editor with sorting and filtering."""
+    ds_id = _resolve_dataset(dataset_id)
+
+    def page_rows():
+        chunk, total, _ = _view_page(ds_id, max(page - 1, 0) * page_size, page_size,
+                                     sort_col, sort_asc, filter_col, filter_val)
+        for col in _datasets[ds_id]["date_columns"]:
+            if col in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk[col]):
+                chunk[col] = chunk[col].dt.strftime('%d.%m.%Y').fillna("")
+        return chunk, total, _dataset_columns(ds_id)
+    chunk, total, columns = await _locked(ds_id, page_rows)
+
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": max(1, (total + page_size - 1) // page_size),
+        "columns": columns,
+        "rows": chunk.fillna("").to_dict(orient="records"),
+    }
+
+
+@app.post("/api/data/update")
+async def update_cell(update: CellUpdate, dataset_id: Optional[str] = Query(None)):
+    """Update a single cell value."""
+    ds_id = _resolve_dataset(dataset_id)
+    await _load_frame(ds_id)
+
+    def edit():
+        df = _editable_frame(ds_id)
+        if update.column not in df.columns:
+            raise HTTPException(400, f"Column '{update.column}' not found.")
+        if update.row < 0 or update.row >= len(df):
+            raise HTTPException(400, f"Row {update.row} out of range.")
+        new_df, _, changed = _apply_cell_edits(ds_id, df, [update.row], [update.column], [update.value])
+        derived = new_df.iloc[[update.row]][changed[1:]]
+        for c in derived.columns:
+            if pd.api.types.is_datetime64_any_dtype(derived[c]):
+                derived[c] = derived[c].dt.strftime('%d.%m.%Y').fillna("")
+        return derived
+    # dtype conversion, derived-column replay and the fsynced log append
+    # all run in the executor
+    derived = await _locked(ds_id, edit, write=True)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _invalidate_fit_cache, ds_id)
+    # recomputed derived cells of this row, for the editor to show
+    derived = derived.fillna("").to_dict(orient="records")
+    return {"ok": True, "derived": derived[0] if derived else {}}
+
+
+@app.post("/api/data/update/bulk")
+async def update_cells(update: BulkCellUpdate, dataset_id: Optional[str] = Query(None)):
+    """Apply many cell edits (a paste, a scripted correction) in one step."""
+    ds_id = _resolve_dataset(dataset_id)
+    columns = update.columns if update.columns is not None else [update.column] * len(update.rows)
+    if update.column is None and update.columns is None:
+        raise HTTPException(400, "Give 'column' or 'columns'.")
+    if not update.rows:
+        return {"ok": True, "cells": 0, "rows": 0, "columns": []}
+    await _load_frame(ds_id)
+
+    def edit():
+        df = _editable_frame(ds_id)
+        return _apply_cell_edits(ds_id, df, update.rows, columns, update.values)
+    _, positions, changed = await _locked(ds_id, edit, write=True)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _invalidate_fit_cache, ds_id)
+    return {"ok": True, "cells": len(update.rows), "rows": len(positions), "columns": changed}
+
+
+@app.post("/api/data/add_column")
+async def add_computed_column(col: NewColumn, dataset_id: Optional[str] = Query(None)):
+    """Add a computed column using a pandas-eval expression.
+    Also registers it in the derived-column pipeline for replay."""
+    ds_id = _resolve_dataset(dataset_id)
+    await _load_frame(ds_id)
+
+    def add():
+        df = _editable_frame(ds_id)
+        if col.name in df.columns:
+            raise HTTPException(400, f"Column '{col.name}' already exists.")
+        df = df.copy(deep=False)
+        try:
+            df[col.name] = _eval_formula(df, col.formula)
+        except Exception as e:
+            raise HTTPException(400, f"Formula error: {e}")
+        _swap_frame(ds_id, df, resized=True)
+
+        # Register in pipeline for replay
+        if ds_id not in _derived_columns:
+            _derived_columns[ds_id] = []
+        # Avoid duplicates
+        existing_names = {d["name"] for d in _derived_columns[ds_id]}
+        if col.name not in existing_names:
+            _derived_columns[ds_id].append({"name": col.name, "formula": col.formula})
+            _save_derived(ds_id)
+        return df
+    df = await _locked(ds_id, add, write=True)
+
+    return {
+        "ok": True,
+        "columns": list(df.columns),
+        "numeric_columns": list(df.select_dtypes(include="number").columns),
+    }
+
+
+@app.delete("/api/data/column")
+async def delete_column(column: str = Query(...), dataset_id: Optional[str] = Query(None)):
+    """Delete a column. Also removes it from the derived-column pipeline."""
+    ds_id = _resolve_dataset(dataset_id)
+    await _load_frame(ds_id)
+
+    def drop():
+        df = _editable_frame(ds_id)
+        if column not in df.columns:
+            raise HTTPException(400, f"Column '{column}' not found.")
+        df = df.drop(columns=[column])
+        _swap_frame(ds_id, df, resized=True)
+        _invalidate_column_caches(ds_id, [column])
+        with _frames_lock:
+            for key in [k for k in _well_indexes if k[0] == ds_id]:
+                if key[1] == column:
+                    del _well_indexes[key]
+                else:
+                    _well_indexes[key].drop_column(column)
+        ds = _datasets[ds_id]
+        ds["date_columns"] = [c for c in ds["date_columns"] if c != column]
+        # Remove from derived pipeline
+        if ds_id in _derived_columns:
+            _derived_columns[ds_id] = [
+                d for d in _derived_columns[ds_id] if d["name"] != column
+            ]
+            _save_derived(ds_id)
+        _save_dataset_record(ds_id)
+        return df
+    df = await _locked(ds_id, drop, write=True)
+    return {
+        "ok": True,
+        "columns": list(df.columns),
+        "numeric_columns": list(df.select_dtypes(include="number").columns),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Streaming export
+# ---------------------------------------------------------------------------
+# Exports are encoded EXPORT_BATCH_ROWS rows at a time and streamed as they
+# are produced, so memory stays flat and the first bytes leave at once. The
+# rows come from a snapshot taken under the read lock (the copy-on-write
+# frame, or the memory-mapped handle of a lazy dataset), so edits made while
+# an export runs do not tear it. Rows and order follow the editor's view
+# (filter_col/filter_val, sort_col/sort_asc). CSV is compressed batch by batch
+# (.csv.gz is a multi-member gzip file, .csv.zst a sequence of zstd frames,
+# both read by the standard tools); Parquet and Arrow use their own codecs, so
+# the file stays directly readable.
+EXPORT_BATCH_ROWS = 64 * 1024
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": (RESPONSE_FORMATS["arrow"], "arrows"),
+}
+EXPORT_COMPRESSION = {"gzip": ("application/gzip", ".gz"), "zstd": ("application/zstd", ".zst")}
+EXPORT_CSV_LEVELS = {"gzip": 6, "zstd": 1}   # gzip's usual level; zstd's fastest is no larger on CSV
+
+
+class _ExportSink(io.RawIOBase):
+    """File object the encoders write into; `drain` hands out what was written."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+def _export_frames(source, positions: Optional[np.ndarray], columns: list):
+    """The exported rows as DataFrames of at most EXPORT_BATCH_ROWS rows."""
+    if isinstance(source, pd.DataFrame):
+        n = len(source) if positions is None else len(positions)
+        for a in range(0, n, EXPORT_BATCH_ROWS):
+            rows = slice(a, a + EXPORT_BATCH_ROWS) if positions is None else positions[a:a + EXPORT_BATCH_ROWS]
+            yield source.iloc[rows][columns]
+    elif positions is None:
+        yield from source.iter_batches(columns, EXPORT_BATCH_ROWS)
+    else:
+        for a in range(0, len(positions), EXPORT_BATCH_ROWS):
+            yield source.take(positions[a:a + EXPORT_BATCH_ROWS], columns)
+
+
+def _export_stream(frames, fmt: str, compression: Optional[str], date_columns: list):
+    """Encode DataFrame batches as CSV, Parquet or Arrow IPC bytes, one
+    chunk per batch."""
+    sink = _ExportSink()
+    out = pa.PythonFile(sink, mode="w")
+    codec = None
+    if fmt == "csv" and compression:
+        codec = pa.Codec(compression, compression_level=EXPORT_CSV_LEVELS[compression])
+    writer = schema = None
+    for i, df in enumerate(frames):
+        if fmt == "csv":
+            df = df.copy(deep=False)
+            for col in date_columns:   # same text as the editor shows
+                if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.strftime('%d.%m.%Y')
+            text = df.to_csv(index=False, header=i == 0).encode()
+            out.write(codec.compress(text, asbytes=True) if codec else text)
+        else:
+            if schema is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                # a column that is empty in the first batch still holds text later on
+                schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in schema]).remove_metadata()
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(out, schema, compression=compression or "snappy")
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=compression)
+                    writer = pa.ipc.new_stream(out, schema, options=options)
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        out.flush()
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+@app.get("/api/data/export")
+async def export_data(
+    fmt: str = Query("csv", alias="format", description="csv|parquet|arrow"),
+    compression: Optional[str] = Query(None, description="gzip|zstd"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns (default: all)"),
+    sort_col: Optional[str] = None,
+    sort_asc: bool = True,
+    filter_col: Optional[str] = None,
+    filter_val: Optional[str] = None,
+    dataset_id: Optional[str] = Query(None),
+):
+    """Download the dataset (or the editor's filtered/sorted view of it) as
+    a streamed file."""
+    ds_id = _resolve_dataset(dataset_id)
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Unknown export format '{fmt}'; use csv, parquet or arrow.")
+    if compression is not None and compression not in EXPORT_COMPRESSION:
+        raise HTTPException(400, f"Unknown compression '{compression}'; use gzip or zstd.")
+    if fmt == "arrow" and compression == "gzip":
+        raise HTTPException(400, "Arrow streams compress with zstd (or lz4), not gzip.")
+
+    def snapshot():
+        available = _dataset_columns(ds_id)
+        names = [c.strip() for c in columns.split(",") if c.strip()] if columns else available
+        missing = [c for c in names if c not in available]
+        if missing:
+            raise HTTPException(400, f"Column(s) not found: {missing}")
+        positions = _view_positions(ds_id, sort_col, sort_asc, filter_col, filter_val)
+        frame = _peek_frame(ds_id)
+        source = frame if frame is not None else _handles[ds_id]
+        return names, positions, source, list(_datasets[ds_id]["date_columns"])
+    names, positions, source, date_columns = await _locked(ds_id, snapshot)
+
+    media_type, ext = EXPORT_FORMATS[fmt]
+    if fmt == "csv" and compression:
+        media_type, suffix = EXPORT_COMPRESSION[compression]
+        ext += suffix
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", Path(_datasets[ds_id].get("filename") or "").stem) or "data"
+    body = _export_stream(_export_frames(source, positions, names), fmt, compression, date_columns)
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{ext}"'})
+
+
+# ---------------------------------------------------------------------------
+# Virtual Scroll: on-demand row fetching for Data Preview
+# ---------------------------------------------------------------------------
+# Sorted and filtered views are cached as row positions, so scrolling one is
+# an array slice plus a take of `limit` rows. Substring filters run over the
+# distinct values of a column (a lower-cased string index) instead of
+# stringifying every row. A column's entries are dropped when it changes.
+VIEW_CACHE_BUDGET = int(os.environ.get("DCA_VIEW_BUDGET_MB", "512")) * 1024 * 1024
+_views: "OrderedDict[tuple, object]" = OrderedDict()   # (dataset_id, kind, columns, ...) -> positions / index
+_view_bytes: dict = {}
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+
+def _cached_view(key: tuple, build):
+    """LRU lookup in the view cache; `build()` runs on a miss. Callers hold
+    the dataset's read lock, so no edit can land between build and store."""
+    with _frames_lock:
+        value = _views.get(key)
+        if value is not None:
+            _views.move_to_end(key)
+            return value
+    value = build()
+    with _frames_lock:
+        _views[key] = value
+        _view_bytes[key] = sum(getattr(v, "nbytes", 0) for v in (value if isinstance(value, tuple) else (value,)))
+        while sum(_view_bytes.values()) > VIEW_CACHE_BUDGET and len(_views) > 1:
+            old, _ = _views.popitem(last=False)
+            _view_bytes.pop(old, None)
+    return value
+
+
+def _invalidate_column_caches(dataset_id: str, columns: Optional[list] = None):
+    """Forget cached stats and views that depend on some columns of a dataset
+    (all of them when None). Call under the dataset's write lock."""
+    with _frames_lock:
+        if columns is None:
+            _column_stats_cache.pop(dataset_id, None)
+        else:
+            cache = _column_stats_cache.get(dataset_id, {})
+            for key in [k for k in cache if k[0] in columns]:
+                del cache[key]
+        for key in [k for k in _views if k[0] == dataset_id
+                    and (columns is None or set(k[2]) & set(columns))]:
+            del _views[key]
+            _view_bytes.pop(key, None)
+
+
+def _view_column(dataset_id: str, col: str) -> pd.Series:
+    df = _peek_frame(dataset_id)
+    return df[col] if df is not None else _handles[dataset_id].read([col])[col]
+
+
+def _string_index(dataset_id: str, col: str):
+    """(codes, strings, lower-cased strings) of a column's distinct values,
+    stringified as `astype(str)` would."""
+    def build():
+        codes, uniques = pd.factorize(_view_column(dataset_id, col), use_na_sentinel=False)
+        strings = pd.Series(uniques).astype(str)
+        return codes, strings, strings.str.lower()
+    return _cached_view((dataset_id, "strings", (col,)), build)
+
+
+def _filter_positions(dataset_id: str, col: str, val: str) -> np.ndarray:
+    """Rows whose value contains `val` (case-insensitive, regex when it has
+    regex characters), in row order."""
+    def build():
+        codes, strings, lower = _string_index(dataset_id, col)
+        if _REGEX_CHARS.isdisjoint(val):
+            hits = lower.str.contains(val.lower(), regex=False, na=False)
+        else:
+            hits = strings.str.contains(val, case=False, na=False)
+        return np.flatnonzero(hits.to_numpy(dtype=bool)[codes])
+    return _cached_view((dataset_id, "filter", (col,), val), build)
+
+
+def _sort_permutation(dataset_id: str, col: str, ascending: bool) -> np.ndarray:
+    def build():
+        s = _view_column(dataset_id, col).reset_index(drop=True)
+        return s.sort_values(ascending=ascending).index.to_numpy()
+    return _cached_view((dataset_id, "sort", (col,), ascending), build)
+
+
+def _view_positions(dataset_id: str, sort_col, sort_asc, filter_col, filter_val) -> Optional[np.ndarray]:
+    """Row positions of a sorted/filtered view, or None for the identity
+    order. Call under the dataset's read lock."""
+    columns = _dataset_columns(dataset_id)
+    filtering = bool(filter_col and filter_val and filter_col in columns)
+    sorting = bool(sort_col and sort_col in columns)
+    positions = None   # None = identity order
+    if sorting and filtering:
+        def build():
+            perm = _sort_permutation(dataset_id, sort_col, sort_asc)
+            keep = np.zeros(len(perm), dtype=bool)
+            keep[_filter_positions(dataset_id, filter_col, filter_val)] = True
+            return perm[keep[perm]]
+        positions = _cached_view((dataset_id, "view", (sort_col, filter_col), sort_asc, filter_val), build)
+    elif sorting:
+        positions = _sort_permutation(dataset_id, sort_col, sort_asc)
+    elif filtering:
+        positions = _filter_positions(dataset_id, filter_col, filter_val)
+    return positions
+
+
+def _view_page(dataset_id: str, offset: int, limit: int, sort_col, sort_asc, filter_col, filter_val):
+    """One page of a sorted/filtered view: (rows, total, start). Only the
+    page's rows are materialized; lazy datasets read them from Parquet.
+    Call under the dataset's read lock."""
+    positions = _view_positions(dataset_id, sort_col, sort_asc, filter_col, filter_val)
+    total = _dataset_num_rows(dataset_id) if positions is None else len(positions)
+    start = min(offset, total)
+    end = min(start + limit, total)
+    page = np.arange(start, end) if positions is None else positions[start:end]
+    df = _peek_frame(dataset_id)
+    chunk = df.iloc[page].copy() if df is not None else _handles[dataset_id].take(page)
+    return chunk, total, start
+
+
+@app.get("/api/preview/rows")
+async def preview_rows(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    sort_col: Optional[str] = None,
+    sort_asc: bool = True,
+    filter_col: Optional[str] = None,
+    filter_val: Optional[str] = None,
+    dataset_id: Optional[str] = Query(None),
+    fmt: Optional[str] = Query(None, alias="format", description="json|arrow (default: Accept header)"),
+):
+    """Return a slice of rows for virtual-scroll preview.
+
+    The frontend requests rows by *offset* (absolute row index) so it can
+    map a scrollbar position directly to a data window.
+    """
+    ds_id = _resolve_dataset(dataset_id)
+    out_format = _response_format(request, fmt)
+    if out_format == "binary":
+        raise HTTPException(400, "Preview rows are available as json or arrow.")
+
+    # one lock for rows, columns and date formats: no mixing of two states
+    def page_response():
+        chunk, total, start = _view_page(ds_id, offset, limit, sort_col, sort_asc, filter_col, filter_val)
+        return _preview_rows_response(ds_id, chunk, total, start, limit, out_format)
+    return await _locked(ds_id, page_response)
+
+
+def _preview_rows_response(dataset_id: str, chunk: pd.DataFrame, total: int, start: int, limit: int,
+                           out_format: str = "json"):
+    for col in _datasets[dataset_id]["date_columns"]:
+        if col in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk[col]):
+            chunk[col] = chunk[col].dt.strftime('%d.%m.%Y').fillna("")
+
+    if out_format == "arrow":
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        meta = {"total": str(total), "offset": str(start), "limit": str(limit)}
+        return _arrow_response(table.replace_schema_metadata(meta))
+    return _json_response({
+        "total": total,
+        "offset": start,
+        "limit": limit,
+        "columns": _dataset_columns(dataset_id),
+        "rows": chunk.fillna("").to_dict(orient="records"),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Columnar Summary / Stats  (computed from Parquet when available)
+# ---------------------------------------------------------------------------
+# Per-column results are cached until the column changes (see
+# _invalidate_column_caches): edits drop only the edited column, new columns
+# are computed on the next call, and re-imports / syncs / rollbacks drop the
+# whole dataset.
+_column_stats_cache: dict = {}   # dataset_id -> {(column, approx): stats entry}
+STATS_SAMPLE_SIZE = 100_000      # values behind approximate quantiles
+HLL_PRECISION = 14               # 2**14 registers: ~0.8% error on unique counts
+
+
+@app.get("/api/preview/stats")
+async def preview_stats(dataset_id: Optional[str] = Query(None),
+                        approx: bool = Query(False, description="sketch unique counts and quantiles")):
+    """Return per-column statistics: type, count, nulls, min, max, mean,
+    std, and a 20-bin histogram for numeric columns. With `approx`, unique
+    counts come from a HyperLogLog sketch and quantiles from a sample."""
+    ds_id = _resolve_dataset(dataset_id)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _dataset_stats, ds_id, approx)
+
+
+def _dataset_stats(dataset_id: str, approx: bool) -> dict:
+    with _dataset_lock(dataset_id).read():
+        with _frames_lock:
+            cache = _column_stats_cache.setdefault(dataset_id, {})
+        df = _peek_frame(dataset_id)
+        handle = None if df is not None else _handles[dataset_id]
+        stats = []
+        for col in (df.columns if handle is None else handle.columns):
+            entry = cache.get((col, approx))
+            if entry is None:
+                # Lazy dataset: load one column at a time (only uncached ones)
+                s = df[col] if handle is None else handle.read([col])[col]
+                entry = _column_stats(col, s, approx)
+                with _frames_lock:
+                    cache[(col, approx)] = entry
+            stats.append(entry)
+        return {"columns": stats, "total_rows": _dataset_num_rows(dataset_id)}
+
+
+def _column_stats(col: str, s: pd.Series, approx: bool = False) -> dict:
+    """Summary statistics for one column (see /api/preview/stats).
+    Numeric and date columns are sorted once; min, max, quantiles, the
+    unique count and the histogram are all read off the sorted values."""
+    total = len(s)
+    null_count = int(s.isna().sum())
+    clean = s.dropna()
+
+    entry = {
+        "column": col,
+        "dtype": str(s.dtype),
+        "total": total,
+        "non_null": total - null_count,
+        "null_count": null_count,
+    }
+    if approx:
+        entry["approximate"] = True
+
+    if pd.api.types.is_numeric_dtype(s):
+        values = clean.to_numpy(dtype=getattr(s.dtype, "numpy_dtype", None))
+        n = len(values)
+        entry["type"] = "numeric"
+        if approx:
+            entry["unique"] = _hll_unique(values)
+            sample = _sample(values)
+            lo, hi = (values.min(), values.max()) if n else (None, None)
+            q25, q50, q75 = np.quantile(sample.astype(float), [0.25, 0.5, 0.75]) if n else (None,) * 3
+        else:
+            values = np.sort(values)
+            entry["unique"] = _sorted_unique(values)
+            lo, hi = (values[0], values[-1]) if n else (None, None)
+            q25, q50, q75 = (_sorted_quantile(values, q) for q in (0.25, 0.5, 0.75)) if n else (None,) * 3
+        entry["min"] = _safe_json(lo)
+        entry["max"] = _safe_json(hi)
+        entry["mean"] = _safe_json(values.mean(dtype=float)) if n else None
+        entry["std"] = _safe_json(values.std(dtype=float, ddof=1)) if n > 1 else None
+        entry["median"] = _safe_json(q50)
+        entry["p25"] = _safe_json(q25)
+        entry["p75"] = _safe_json(q75)
+
+        # Histogram (20 bins)
+        entry["histogram"] = None
+        if n >= 2 and np.isfinite(float(lo)) and np.isfinite(float(hi)):
+            if approx:   # shape from the sample, scaled to the column
+                counts, edges = np.histogram(sample, bins=20, range=(float(lo), float(hi)))
+                counts = np.round(counts * (n / len(sample))).astype(np.int64)
+            else:
+                counts, edges = _sorted_histogram(values, 20)
+            entry["histogram"] = {
+                "counts": counts.tolist(),
+                "edges": [round(float(e), 6) for e in edges],
+            }
+    elif pd.api.types.is_datetime64_any_dtype(s):
+        values = clean.to_numpy(dtype="int64")
+        entry["type"] = "datetime"
+        entry["unique"] = _hll_unique(values) if approx else _sorted_unique(np.sort(values))
+        entry["min"] = str(clean.min()) if len(clean) else None
+        entry["max"] = str(clean.max()) if len(clean) else None
+        entry["histogram"] = None
+    else:
+        entry["type"] = "string"
+        # One hash pass gives both the unique count and the top 10 values
+        # (exact in both modes: hashing strings for a sketch costs more)
+        counts = clean.value_counts()
+        counts = counts[counts > 0]   # unused categories
+        entry["unique"] = len(counts)
+        entry["top_values"] = [{"value": str(k), "count": int(v)} for k, v in counts.head(10).items()]
+        entry["histogram"] = None
+
+    return entry
+
+
+def _sorted_unique(values: np.ndarray) -> int:
+    return int(np.count_nonzero(values[1:] != values[:-1])) + 1 if len(values) else 0
+
+
+def _sorted_quantile(values: np.ndarray, q: float) -> float:
+    """Linear-interpolated quantile of sorted values (numpy's default method)."""
+    pos = q * (len(values) - 1)
+    i = int(pos)
+    lo = float(values[i])
+    if i + 1 == len(values):
+        return lo
+    return lo + (float(values[i + 1]) - lo) * (pos - i)
+
+
+def _sorted_histogram(values: np.ndarray, bins: int):
+    """np.histogram(values, bins) for sorted values, by binary search."""
+    lo, hi = float(values[0]), float(values[-1])
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, bins + 1)
+    cum = np.searchsorted(values, edges, side="left")
+    cum[-1] = len(values)   # the last bin includes its right edge
+    return np.diff(cum), edges
+
+
+def _sample(values: np.ndarray) -> np.ndarray:
+    if len(values) <= STATS_SAMPLE_SIZE:
+        return values
+    rng = np.random.default_rng(0)
+    return values[rng.integers(0, len(values), STATS_SAMPLE_SIZE)]
+
+
+def _hll_unique(values: np.ndarray) -> int:
+    """HyperLogLog estimate of the number of distinct values."""
+    if not len(values):
+        return 0
+    p = HLL_PRECISION
+    m = 1 << p
+    h = pd.util.hash_array(values)
+    register = (h >> np.uint64(64 - p)).astype(np.intp)
+    # rank = position of the first 1-bit in the remaining bits, read off the
+    # float exponent (a guard bit keeps it finite)
+    rest = (h << np.uint64(p)) | np.uint64(1 << (p - 1))
+    rank = 65 - np.frexp(rest.astype(float))[1]
+    registers = np.zeros(m, dtype=np.int32)
+    np.maximum.at(registers, register, rank)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-registers.astype(float)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)   # small-range correction
+    return int(round(min(estimate, len(values))))
+
+
+def _safe_json(v):
+    """Convert numpy numeric to JSON-safe float."""
+    if v is None:
+        return None
+    f = float(v)
+    if not np.isfinite(f):
+        return None
+    return round(f, 6)
+
+
+# ---------------------------------------------------------------------------
+# Serve the single-page frontend
+# ---------------------------------------------------------------------------
+FRONTEND_PATH = Path(__file__).parent / "templates" / "index.html"
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    return FRONTEND_PATH.read_text(encoding="utf-8")
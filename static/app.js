@@ -119,8 +119,22 @@ let previewState = { data: [], columns: [], sortCol: null, sortAsc: true, filter
 
 let activeDatasetId = null;
 
+// Scope API calls to this tab's dataset so several sessions can work side by side
+
+function dsUrl(url) {
+
+  if (!activeDatasetId) return url;
+
+  return url + (url.includes('?') ? '&' : '?') + 'dataset_id=' + encodeURIComponent(activeDatasetId);
+
+}
+
 const CHUNK_SIZE = 5 * 1024 * 1024; // 5 MB
 
+const UPLOAD_PARALLEL = 4;           // chunks in flight at once
+
+const UPLOAD_RETRIES = 3;            // attempts per chunk / finalize rounds
+
 
 
 // --- Sync/Pipeline state ---
@@ -283,7 +297,7 @@ fileInput.addEventListener('click', async function (e) {
 
       const [handle] = await window.showOpenFilePicker({
 
-        types: [{ description: 'Data files', accept: { 'text/csv': ['.csv'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx', '.xls'] } }],
+        types: [{ description: 'Data files', accept: { 'text/csv': ['.csv'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx', '.xls'], 'application/octet-stream': ['.parquet', '.feather', '.arrow'] } }],
 
         multiple: false
 
@@ -371,7 +385,7 @@ async function handleFileWithObj(file) {
 
       headers: { 'Content-Type': 'application/json' },
 
-      body: JSON.stringify({ filename: file.name, file_size: file.size })
+      body: JSON.stringify({ filename: file.name, file_size: file.size, chunk_size: CHUNK_SIZE })
 
     });
 
@@ -387,57 +401,95 @@ async function handleFileWithObj(file) {
 
 
 
-    // Step 2: Upload chunks
+    // Step 2: Upload chunks — UPLOAD_PARALLEL at a time; the server writes each
 
-    const totalChunks = Math.ceil(file.size / CHUNK_SIZE);
+    // at its own offset, so order does not matter. Failed chunks are retried.
 
-    for (let i = 0; i < totalChunks; i++) {
+    // CSVs are parsed on the server while they upload; show how far it got.
 
-      const start = i * CHUNK_SIZE;
+    const totalChunks = initData.total_chunks;
 
-      const end = Math.min(start + CHUNK_SIZE, file.size);
+    let sent = 0, rowsParsed = 0;
 
-      const blob = file.slice(start, end);
+    const sendChunk = async (i) => {
 
-      const chunkForm = new FormData();
+      const blob = file.slice(i * CHUNK_SIZE, Math.min((i + 1) * CHUNK_SIZE, file.size));
 
-      chunkForm.append('file', blob, `chunk_${i}`);
+      const checksum = await chunkChecksum(blob);
 
-      const chunkRes = await fetch(`/api/upload/chunk?dataset_id=${datasetId}&chunk_index=${i}`, {
+      for (let attempt = 1; ; attempt++) {
 
-        method: 'POST', body: chunkForm
+        const chunkForm = new FormData();
 
-      });
+        chunkForm.append('file', blob, `chunk_${i}`);
+
+        const chunkRes = await fetch(`/api/upload/chunk?dataset_id=${datasetId}&chunk_index=${i}` + (checksum ? `&checksum=${checksum}` : ''), {
+
+          method: 'POST', body: chunkForm
+
+        }).catch(() => null);
+
+        if (chunkRes && chunkRes.ok) { rowsParsed = Math.max(rowsParsed, (await chunkRes.json()).rows_parsed || 0); break; }
 
-      if (!chunkRes.ok) {
+        if (attempt >= UPLOAD_RETRIES) {
 
-        const err = await chunkRes.json();
+          const err = chunkRes ? await chunkRes.json().catch(() => ({})) : {};
 
-        throw new Error(err.detail || `Chunk ${i} failed`);
+          throw new Error(err.detail || `Chunk ${i} failed`);
+
+        }
 
       }
 
-      const pct = Math.round(((i + 1) / totalChunks) * 100);
+      sent++;
+
+      const pct = Math.min(100, Math.round((sent / totalChunks) * 100));
 
       progressBar.style.width = pct + '%';
 
-      progressText.textContent = pct + '%';
+      progressText.textContent = pct + '%' + (rowsParsed ? ` — ${rowsParsed.toLocaleString()} rows parsed` : '');
 
-    }
+    };
+
+    const sendChunks = async (indices) => {
+
+      let next = 0;
+
+      const worker = async () => { while (next < indices.length) await sendChunk(indices[next++]); };
+
+      await Promise.all(Array.from({ length: Math.min(UPLOAD_PARALLEL, indices.length) }, worker));
+
+    };
+
+    await sendChunks([...Array(totalChunks).keys()]);
 
 
 
-    // Step 3: Finalize upload — trigger server-side parsing
+    // Step 3: Finalize upload — the server checks every chunk, reports missing or
+
+    // damaged ones (409) for us to send again, then starts parsing
 
     info.innerHTML = '<span class="loader"></span> Processing file on server…';
 
-    const finRes = await fetch(`/api/upload/finalize?dataset_id=${datasetId}`, { method: 'POST' });
+    const finalize = () => fetch(`/api/upload/finalize?dataset_id=${datasetId}`, { method: 'POST' });
+
+    let finRes = await finalize();
+
+    for (let round = 1; finRes.status === 409 && round < UPLOAD_RETRIES; round++) {
+
+      const err = await finRes.json();
+
+      await sendChunks(err.detail.missing_chunks);
+
+      finRes = await finalize();
+
+    }
 
     if (!finRes.ok) {
 
       const err = await finRes.json();
 
-      throw new Error(err.detail || 'Finalize failed');
+      throw new Error((err.detail && err.detail.message) || err.detail || 'Finalize failed');
 
     }
 
@@ -463,6 +515,22 @@ async function handleFileWithObj(file) {
 
 
 
+/* SHA-256 of a chunk as hex, checked by the server; null where the browser has
+
+   no WebCrypto (plain-http origins), in which case the server's own checksum is used. */
+
+async function chunkChecksum(blob) {
+
+  if (!(window.crypto && crypto.subtle)) return null;
+
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+
+  return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+
+}
+
+
+
 async function pollDatasetStatus(datasetId) {
 
   const info = document.getElementById('fileInfo');
@@ -495,7 +563,7 @@ async function pollDatasetStatus(datasetId) {
 
         progressBar.style.width = pct + '%';
 
-        progressText.textContent = pct + '% — ' + (data.status === 'processing' ? 'Converting to Parquet…' : data.status);
+        progressText.textContent = pct + '% — ' + (data.status === 'processing' ? 'Converting to Parquet…' : data.status) + (data.rows_parsed ? ` (${data.rows_parsed.toLocaleString()} rows)` : '');
 
 
 
@@ -884,7 +952,7 @@ async function fetchPreviewBatch(offset) {
 
     if (previewState.filterCol && previewState.filterVal) url += `&filter_col=${enc(previewState.filterCol)}&filter_val=${enc(previewState.filterVal)}`;
 
-    const res = await fetch(url);
+    const res = await fetch(dsUrl(url));
 
     if (!res.ok) return;
 
@@ -994,7 +1062,7 @@ async function loadStats() {
 
   try {
 
-    const res = await fetch('/api/preview/stats');
+    const res = await fetch(dsUrl('/api/preview/stats'));
 
     if (!res.ok) throw new Error('Failed to load stats');
 
@@ -1236,7 +1304,7 @@ async function fetchWells() {
 
   if (!wellCol) { allWells = []; return; }
 
-  const res = await fetch(`/api/wells?well_col=${encodeURIComponent(wellCol)}`);
+  const res = await fetch(dsUrl(`/api/wells?well_col=${encodeURIComponent(wellCol)}`));
 
   const data = await res.json();
 
@@ -1990,6 +2058,78 @@ function removeCard(id) {
 
    ==================================================================== */
 
+/* DCA results come as packed little-endian float64 buffers (/api/dca?format=binary):
+
+   a uint32 header length, a JSON header, padding to 8 bytes, then the body.
+
+   t / y / forecast arrays are used as Float64Array views of the body; dates
+
+   arrive as epoch milliseconds and are formatted to the DD.MM.YYYY labels here.
+
+   Series longer than DCA_MAX_POINTS are downsampled on the server (the fit still
+
+   uses every point); w.index then holds each returned point's original position,
+
+   which is what exclusions refer to — use dcaIndex(w, i) to look it up. */
+
+const DCA_MAX_POINTS = 2000;
+
+function dcaIndex(w, i) { return w.index ? w.index[i] : i; }
+
+async function fetchDCA(url, full = false) {
+
+  const res = await fetch(dsUrl(url + (full ? '' : `&max_points=${DCA_MAX_POINTS}`) + '&format=binary'));
+
+  if (!res.ok) { const err = await res.json().catch(() => ({})); throw new Error(err.detail || 'Error'); }
+
+  return decodeDCABinary(await res.arrayBuffer());
+
+}
+
+function decodeDCABinary(buf) {
+
+  const headerLen = new DataView(buf).getUint32(0, true);
+
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 4, headerLen)));
+
+  const bodyStart = Math.ceil((4 + headerLen) / 8) * 8;
+
+  const body = new Float64Array(buf, bodyStart, (buf.byteLength - bodyStart) / 8);
+
+  const pad2 = n => String(n).padStart(2, '0');
+
+  const fmtDate = ms => { const d = new Date(ms); return `${pad2(d.getUTCDate())}.${pad2(d.getUTCMonth() + 1)}.${d.getUTCFullYear()}`; };
+
+  const wells = header.wells.map(w => {
+
+    const get = name => { const [off, len] = header.buffers[w.buffers[name]]; return body.subarray(off, off + len); };
+
+    const xs = arr => w.is_date ? Array.from(arr, fmtDate) : Array.from(arr);
+
+    const has = name => name in w.buffers;
+
+    return {
+
+      well: w.well, params: w.params, equation: w.equation, is_date: w.is_date, excluded_indices: w.excluded_indices,
+
+      x: xs(get('x')), t: get('t'), y_actual: get('y_actual'),
+
+      y_fitted: has('y_fitted') ? Array.from(get('y_fitted'), v => Number.isNaN(v) ? null : v) : null,
+
+      index: has('index') ? Array.from(get('index')) : null,
+
+      forecast: has('forecast_t') ? { x: xs(get('forecast_x')), t: get('forecast_t'), y: get('forecast_y') } : {},
+
+    };
+
+  });
+
+  return { x_label: header.x_label, y_label: header.y_label, model: header.model, wells };
+
+}
+
+
+
 async function runSingleDCA(cardId) {
 
   const card = document.getElementById(cardId);
@@ -2026,11 +2166,9 @@ async function runSingleDCA(cardId) {
 
     const url = `/api/dca?x=${enc(xVal)}&y=${enc(yVal)}&well_col=${enc(wellCol)}&wells=${enc(well)}&model=${enc(model)}&forecast_months=${months}&exclude_indices=${enc(exclStr)}&combine=${combine}`;
 
-    const res = await fetch(url);
+    const data = await fetchDCA(url);
 
-    const data = await res.json();
-
-    if (!res.ok) throw new Error(data.detail || 'Error');
+    data.url = url;   // re-fetched without downsampling by box selections
 
     cardLastData[cardId] = data;
 
@@ -2850,7 +2988,7 @@ function renderSingleChart(cardId, data, forecastMonths) {
 
     const exclSet = new Set(sw.excluded_indices || []);
 
-    const actualVals = sw.y_actual.filter((v, i) => v != null && !exclSet.has(i));
+    const actualVals = sw.y_actual.filter((v, i) => v != null && !exclSet.has(dcaIndex(sw, i)));
 
     const fittedVals = sw.y_fitted ? sw.y_fitted.filter(v => v != null) : [];
 
@@ -3000,7 +3138,7 @@ function renderSingleChart(cardId, data, forecastMonths) {
 
         if (ci === undefined) continue;
 
-        if (isSingle && excluded.has(i)) { exY[ci] = w.y_actual[i]; }
+        if (isSingle && excluded.has(dcaIndex(w, i))) { exY[ci] = w.y_actual[i]; }
 
         else { inY[ci] = w.y_actual[i]; }
 
@@ -3052,7 +3190,7 @@ function renderSingleChart(cardId, data, forecastMonths) {
 
       const incD = [], exclD = [];
 
-      for (let i = 0; i < actualLen; i++) { const pt = [w.x[i], w.y_actual[i], i]; if (isSingle && excluded.has(i)) exclD.push(pt); else incD.push(pt); }
+      for (let i = 0; i < actualLen; i++) { const pt = [w.x[i], w.y_actual[i], dcaIndex(w, i)]; if (isSingle && excluded.has(pt[2])) exclD.push(pt); else incD.push(pt); }
 
       series.push({ name: prefix + 'Actual', type: 'scatter', symbolSize: st.actualSize, symbol: st.actualSymbol, itemStyle: { color: wColor }, data: incD });
 
@@ -3418,7 +3556,7 @@ function renderSingleChart(cardId, data, forecastMonths) {
 
       let idx;
 
-      if (isDate) { idx = params.dataIndex; if (idx >= actualLen) return; }
+      if (isDate) { idx = params.dataIndex; if (idx >= actualLen) return; idx = dcaIndex(firstW, idx); }
 
       else { idx = params.data && params.data[2]; }
 
@@ -3484,7 +3622,7 @@ function renderSingleChart(cardId, data, forecastMonths) {
 
       for (let i = 0; i < w.x.length; i++) {
 
-        if (wExcl.has(i)) continue;
+        if (wExcl.has(dcaIndex(w, i))) continue;
 
         let xDisp = w.x[i];
 
@@ -3746,13 +3884,19 @@ function resetAll(cardId) {
 
 
 
-/* Fit curve to selected area only */
+/* Original indices of the points inside a selection box. The plot may show a
+
+   downsampled series, so the well's full series is fetched and tested; on a
+
+   date axis x is the category position of a returned point, which bounds the
 
-function fitSelectionOnly(cardId, chart, selRect) {
+   original index range (the series is sorted by x). */
+
+async function pointsInSelection(cardId, chart, selRect) {
 
   const lastData = cardLastData[cardId];
 
-  if (!lastData || !lastData.wells || !lastData.wells[0]) return;
+  if (!lastData || !lastData.wells || !lastData.wells[0]) return null;
 
   const w = lastData.wells[0];
 
@@ -3760,13 +3904,15 @@ function fitSelectionOnly(cardId, chart, selRect) {
 
   const p2 = chart.convertFromPixel('grid', [selRect.x2, selRect.y2]);
 
-  if (!p1 || !p2) return;
+  if (!p1 || !p2) return null;
 
 
 
   const isDate = w.is_date || false;
 
-  let xMin, xMax, yMin, yMax;
+  let xMin, xMax;
+
+  const yMin = Math.min(p1[1], p2[1]), yMax = Math.max(p1[1], p2[1]);
 
   if (isDate) {
 
@@ -3774,107 +3920,85 @@ function fitSelectionOnly(cardId, chart, selRect) {
 
     xMax = Math.ceil(Math.max(p1[0], p2[0]));
 
-    yMin = Math.min(p1[1], p2[1]);
-
-    yMax = Math.max(p1[1], p2[1]);
-
   } else {
 
     xMin = Math.min(p1[0], p2[0]); xMax = Math.max(p1[0], p2[0]);
 
-    yMin = Math.min(p1[1], p2[1]); yMax = Math.max(p1[1], p2[1]);
-
   }
 
 
 
-  const newExcl = new Set();
-
-  for (let i = 0; i < w.x.length; i++) {
+  let full = w;
 
-    let xVal, yVal = w.y_actual[i];
+  if (w.index && lastData.url) full = (await fetchDCA(lastData.url, true)).wells[0];
 
-    if (isDate) { xVal = i; } else { xVal = w.x[i]; }
+  let lo = 0, hi = -1;   // original index range of a date-axis selection
 
-    if (xVal < xMin || xVal > xMax || yVal < yMin || yVal > yMax) {
+  if (isDate) {
 
-      newExcl.add(i);
+    const a = Math.max(0, Math.ceil(xMin)), b = Math.min(w.x.length - 1, Math.floor(xMax));
 
-    }
+    if (a <= b) { lo = dcaIndex(w, a); hi = dcaIndex(w, b); }
 
   }
 
-  cardExclusions[cardId] = newExcl;
+  const inside = new Array(full.y_actual.length);
 
-  saveZoomState(cardId);
+  for (let j = 0; j < full.y_actual.length; j++) {
 
-  runSingleDCA(cardId);
+    const yVal = full.y_actual[j];
 
-}
+    const xIn = isDate ? (j >= lo && j <= hi) : (full.x[j] >= xMin && full.x[j] <= xMax);
 
+    inside[j] = xIn && yVal >= yMin && yVal <= yMax;
 
+  }
 
-/* Exclude selected points */
+  return inside;
 
-function excludeSelection(cardId, chart, selRect) {
+}
 
-  const lastData = cardLastData[cardId];
 
-  if (!lastData || !lastData.wells || !lastData.wells[0]) return;
 
-  const w = lastData.wells[0];
-
-  const p1 = chart.convertFromPixel('grid', [selRect.x1, selRect.y1]);
+/* Fit curve to selected area only */
 
-  const p2 = chart.convertFromPixel('grid', [selRect.x2, selRect.y2]);
+async function fitSelectionOnly(cardId, chart, selRect) {
 
-  if (!p1 || !p2) return;
+  let inside;
 
+  try { inside = await pointsInSelection(cardId, chart, selRect); } catch (e) { alert(e.message); return; }
 
+  if (!inside) return;
 
-  const isDate = w.is_date || false;
+  const newExcl = new Set();
 
-  let xMin, xMax, yMin, yMax;
+  inside.forEach((isIn, j) => { if (!isIn) newExcl.add(j); });
 
-  if (isDate) {
+  cardExclusions[cardId] = newExcl;
 
-    xMin = Math.floor(Math.min(p1[0], p2[0]));
+  saveZoomState(cardId);
 
-    xMax = Math.ceil(Math.max(p1[0], p2[0]));
+  runSingleDCA(cardId);
 
-    yMin = Math.min(p1[1], p2[1]);
+}
 
-    yMax = Math.max(p1[1], p2[1]);
 
-  } else {
 
-    xMin = Math.min(p1[0], p2[0]); xMax = Math.max(p1[0], p2[0]);
+/* Exclude selected points */
 
-    yMin = Math.min(p1[1], p2[1]); yMax = Math.max(p1[1], p2[1]);
+async function excludeSelection(cardId, chart, selRect) {
 
-  }
+  let inside;
 
+  try { inside = await pointsInSelection(cardId, chart, selRect); } catch (e) { alert(e.message); return; }
 
+  if (!inside) return;
 
   if (!cardExclusions[cardId]) cardExclusions[cardId] = new Set();
 
   const existing = cardExclusions[cardId];
 
-
-
-  for (let i = 0; i < w.x.length; i++) {
-
-    let xVal, yVal = w.y_actual[i];
-
-    if (isDate) { xVal = i; } else { xVal = w.x[i]; }
-
-    if (xVal >= xMin && xVal <= xMax && yVal >= yMin && yVal <= yMax) {
-
-      existing.add(i);
-
-    }
-
-  }
+  inside.forEach((isIn, j) => { if (isIn) existing.add(j); });
 
   saveZoomState(cardId);
 
@@ -4767,7 +4891,7 @@ async function loadEditorPage(page) {
 
 
 
-    const res = await fetch(url);
+    const res = await fetch(dsUrl(url));
 
     const data = await res.json();
 
@@ -4825,7 +4949,7 @@ function renderEditorTable(data) {
 
     data.columns.forEach(c => {
 
-      html += `<td contenteditable="true" data-row="${absRow}" data-col="${c}" onblur="handleCellEdit(this)">${r[c] ?? ''}</td>`;
+      html += `<td contenteditable="true" data-row="${absRow}" data-col="${c}" onblur="handleCellEdit(this)" onpaste="handleCellPaste(event, this)">${r[c] ?? ''}</td>`;
 
     });
 
@@ -4873,7 +4997,7 @@ async function handleCellEdit(td) {
 
   try {
 
-    await fetch('/api/data/update', {
+    const resp = await fetch(dsUrl('/api/data/update'), {
 
       method: 'POST',
 
@@ -4883,12 +5007,80 @@ async function handleCellEdit(td) {
 
     });
 
+    // derived columns that read the edited cell were recomputed on the server
+
+    const { derived = {} } = await resp.json();
+
+    Object.entries(derived).forEach(([name, v]) => {
+
+      const cell = td.parentElement.querySelector(`td[data-col="${CSS.escape(name)}"]`);
+
+      if (cell) cell.textContent = v ?? '';
+
+    });
+
   } catch (e) { /* silent */ }
 
 }
 
 
 
+// A pasted block (tab/newline separated, e.g. from a spreadsheet) fills the
+
+// cells right of and below the target in one bulk request
+
+async function handleCellPaste(event, td) {
+
+  const text = (event.clipboardData || window.clipboardData).getData('text');
+
+  if (!/[\t\n]/.test(text.replace(/\r?\n$/, ''))) return;   // single value: edit as usual
+
+  event.preventDefault();
+
+  const columns = [...td.parentElement.querySelectorAll('td[data-col]')].map(c => c.dataset.col);
+
+  const row0 = parseInt(td.dataset.row);
+
+  const col0 = columns.indexOf(td.dataset.col);
+
+  const rows = [], cols = [], values = [];
+
+  text.replace(/\r?\n$/, '').split(/\r?\n/).forEach((line, i) => {
+
+    line.split('\t').forEach((v, j) => {
+
+      if (col0 + j >= columns.length) return;
+
+      rows.push(row0 + i); cols.push(columns[col0 + j]); values.push(v.trim());
+
+    });
+
+  });
+
+  try {
+
+    const resp = await fetch(dsUrl('/api/data/update/bulk'), {
+
+      method: 'POST',
+
+      headers: { 'Content-Type': 'application/json' },
+
+      body: JSON.stringify({ rows, columns: cols, values })
+
+    });
+
+    const data = await resp.json();
+
+    if (!resp.ok) { alert(data.detail || 'Paste failed.'); return; }
+
+    loadEditorPage(editorPage);
+
+  } catch (e) { alert('Paste failed: ' + e.message); }
+
+}
+
+
+
 function showAddColumnModal() {
 
   const mc = document.getElementById('modalContainer');
@@ -4933,7 +5125,7 @@ async function doAddColumn() {
 
   try {
 
-    const res = await fetch('/api/data/add_column', {
+    const res = await fetch(dsUrl('/api/data/add_column'), {
 
       method: 'POST', headers: { 'Content-Type': 'application/json' },
 
@@ -5005,7 +5197,7 @@ async function doDeleteColumn() {
 
   try {
 
-    const res = await fetch(`/api/data/column?column=${enc(col)}`, { method: 'DELETE' });
+    const res = await fetch(dsUrl(`/api/data/column?column=${enc(col)}`), { method: 'DELETE' });
 
     const data = await res.json();
 
@@ -5029,27 +5221,17 @@ async function doDeleteColumn() {
 
 
 
-async function exportCSV() {
+function exportCSV() {
 
-  try {
-
-    const res = await fetch('/api/data/export');
-
-    const data = await res.json();
-
-    if (!res.ok) throw new Error('Export failed');
-
-    const blob = new Blob([data.csv], { type: 'text/csv' });
+  // streamed by the server straight into the browser's download
 
-    const a = document.createElement('a');
-
-    a.href = URL.createObjectURL(blob);
+  const a = document.createElement('a');
 
-    a.download = 'data_export.csv';
+  a.href = dsUrl('/api/data/export?format=csv');
 
-    a.click();
+  a.download = 'data_export.csv';
 
-  } catch (e) { alert(e.message); }
+  a.click();
 
 }
 
@@ -5261,7 +5443,7 @@ async function checkFileStatus() {
 
   try {
 
-    const res = await fetch('/api/file_status');
+    const res = await fetch(dsUrl('/api/file_status'));
 
     const data = await res.json();
 
@@ -5283,7 +5465,7 @@ async function reloadData() {
 
   try {
 
-    const res = await fetch('/api/reload');
+    const res = await fetch(dsUrl('/api/reload'));
 
     const data = await res.json();
 
@@ -5577,7 +5759,7 @@ async function scheduledSyncCheck() {
 
   try {
 
-    const res = await fetch('/api/file_status');
+    const res = await fetch(dsUrl('/api/file_status'));
 
     const data = await res.json();
 
@@ -5691,7 +5873,7 @@ async function performSync(file) {
 
 
 
-    const res = await fetch('/api/sync/upload', { method: 'POST', body: formData });
+    const res = await fetch(dsUrl('/api/sync/upload'), { method: 'POST', body: formData });
 
 
 
@@ -5791,7 +5973,7 @@ async function grantFileAccess() {
 
     const [handle] = await window.showOpenFilePicker({
 
-      types: [{ description: 'Data files', accept: { 'text/csv': ['.csv'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx', '.xls'] } }],
+      types: [{ description: 'Data files', accept: { 'text/csv': ['.csv'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx', '.xls'], 'application/octet-stream': ['.parquet', '.feather', '.arrow'] } }],
 
       multiple: false
 
@@ -5859,7 +6041,7 @@ async function showVersionPanel() {
 
   try {
 
-    const res = await fetch('/api/versions');
+    const res = await fetch(dsUrl('/api/versions'));
 
     if (!res.ok) throw new Error('Failed to load versions');
 
@@ -5947,7 +6129,7 @@ async function rollbackToVersion(version) {
 
   try {
 
-    const res = await fetch(`/api/versions/rollback?version=${version}`, { method: 'POST' });
+    const res = await fetch(dsUrl(`/api/versions/rollback?version=${version}`), { method: 'POST' });
 
     if (!res.ok) {
 
@@ -6332,7 +6514,7 @@ async function doDeleteColumnByName(col) {
   if (overlay) overlay.remove(); // Close any open modal just in case
 
   try {
-    const res = await fetch(`/api/data/column?column=${enc(col)}`, { method: 'DELETE' });
+    const res = await fetch(dsUrl(`/api/data/column?column=${enc(col)}`), { method: 'DELETE' });
     const data = await res.json();
     if (!res.ok) throw new Error(data.detail || 'Error');
     uploadedColumns = data.columns;
@@ -6970,7 +7152,7 @@ function _debouncedAutoSave() {
 // Restore the Import Data tab from server-side dataset info
 async function _restoreImportTab() {
   try {
-    const res = await fetch('/api/current');
+    const res = await fetch(dsUrl('/api/current'));
     if (!res.ok) return;
     const data = await res.json();
 
@@ -7026,7 +7208,7 @@ async function loadWorkspace() {
     // Check if the server still has data loaded
     let serverHasData = false;
     try {
-      const res = await fetch('/api/columns');
+      const res = await fetch(dsUrl('/api/columns'));
       if (res.ok) {
         const colData = await res.json();
         uploadedColumns = colData.columns || [];
@@ -7042,7 +7224,7 @@ async function loadWorkspace() {
       // Fetch wells for the saved well column
       if (state.selWellCol) {
         try {
-          const wRes = await fetch('/api/wells?well_col=' + encodeURIComponent(state.selWellCol));
+          const wRes = await fetch(dsUrl('/api/wells?well_col=' + encodeURIComponent(state.selWellCol)));
           const wData = await wRes.json();
           allWells = wData.wells || [];
         } catch (e) { allWells = state.allWells || []; }
@@ -0,0 +1,104 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+
+
+def field_frame(wells: int = 20, months: int = 24, seed: int = 0) -> pd.DataFrame:
+    """Exponential-ish monthly rates with noise, one block of rows per well."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(months, dtype=float)
+    frames = []
+    for w in range(wells):
+        qi, di = rng.uniform(500, 3000), rng.uniform(0.02, 0.1)
+        frames.append(pd.DataFrame({
+            "well": f"W-{w:05d}",
+            "date": pd.date_range("2010-01-01", periods=months, freq="MS"),
+            "rate": qi * np.exp(-di * t) * rng.normal(1, 0.02, months),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Point the app's storage (datasets, registry) at a temporary folder."""
+    monkeypatch.setattr(main, "STORAGE_DIR", tmp_path)
+    monkeypatch.setattr(main, "REGISTRY_PATH", tmp_path / "registry.jsonl")
+    return tmp_path
+
+
+@pytest.fixture
+def client(storage):
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def upload(client):
+    """Upload a frame as CSV and return its dataset id."""
+    def _upload(df: pd.DataFrame, name: str = "field.csv") -> str:
+        r = client.post("/api/upload", files={"file": (name, df.to_csv(index=False).encode(), "text/csv")})
+        assert r.status_code == 200, r.text
+        return r.json()["dataset_id"]
+    return _upload
+
+
+def wait_ready(client, ds_id: str) -> dict:
+    """Poll a dataset's status until its background import has finished."""
+    for _ in range(400):
+        status = client.get(f"/api/dataset/{ds_id}/status").json()
+        if status["status"] in ("ready", "error"):
+            return status
+        time.sleep(0.025)
+    raise AssertionError(f"import of {ds_id} did not finish")
+
+
+@pytest.fixture
+def chunked_upload(client):
+    """Upload bytes through /api/upload/init, /chunk and /finalize and wait
+    for the import; returns the dataset id."""
+    def _upload(data: bytes, filename: str, chunk_size: int = 1024) -> str:
+        r = client.post("/api/upload/init", json={"filename": filename, "file_size": len(data),
+                                                  "chunk_size": chunk_size})
+        assert r.status_code == 200, r.text
+        ds_id = r.json()["dataset_id"]
+        for i in range(0, max(len(data), 1), chunk_size):
+            r = client.post(f"/api/upload/chunk?dataset_id={ds_id}&chunk_index={i // chunk_size}",
+                            files={"file": ("chunk", data[i:i + chunk_size])})
+            assert r.status_code == 200, r.text
+        r = client.post(f"/api/upload/finalize?dataset_id={ds_id}")
+        assert r.status_code == 200, r.text
+        assert wait_ready(client, ds_id)["status"] == "ready"
+        return ds_id
+    return _upload
+
+
+# In-memory state a process restart loses (nothing is flushed first: a crash).
+_PROCESS_STATE = (
+    "_datasets", "_versions", "_derived_columns", "_handles", "_frames", "_frame_bytes",
+    "_dirty_frames", "_dirty_rows", "_dataset_locks", "_load_locks", "_edit_logs",
+    "_unversioned_edits", "_object_ids", "_well_indexes", "_fit_cache", "_fit_cache_disk",
+    "_fit_cache_lines", "_views", "_view_bytes", "_column_stats_cache",
+)
+
+
+@pytest.fixture
+def restart(storage, monkeypatch):
+    """Simulate a crash and restart: drop all in-memory state and rebuild
+    it from the registry on disk, as importing main does."""
+    def _restart():
+        for name in _PROCESS_STATE:
+            getattr(main, name).clear()
+        monkeypatch.setattr(main, "_active_dataset_id", None)
+        monkeypatch.setattr(main, "_registry_lines", 0)
+        main._load_registry()
+    return _restart
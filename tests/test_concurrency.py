@@ -0,0 +1,216 @@
+import random
+import threading
+import time
+
+import pandas as pd
+
+import main
+from conftest import field_frame
+
+THREADS = 4
+EDITS_PER_THREAD = 60
+LONG_WRITE = 1.5   # seconds
+FAST = 0.5   # a request that does not wait for the long write
+
+
+def _run(threads):
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_writers_keep_every_edit(client, upload, monkeypatch):
+    monkeypatch.setattr(main, "FRAME_CACHE_BUDGET", 1)   # only the frame in use stays loaded
+    base = field_frame(wells=40, months=24)
+    ds_id = upload(base)
+    n_rows = len(base)
+    written, appended, errors = {}, [0], []
+    lock = threading.Lock()
+
+    def check(r, name):
+        if r.status_code != 200:
+            with lock:
+                errors.append(f"{name}: HTTP {r.status_code} {r.text[:200]}")
+        return r
+
+    def editor(k):
+        rng = random.Random(k)
+        for i in range(EDITS_PER_THREAD):
+            rows = [rng.randrange(k, n_rows, THREADS) for _ in range(3)]   # each editor owns its rows
+            values = [round(rng.uniform(1, 1000), 6) for _ in rows]
+            if i % 2:
+                check(client.post(f"/api/data/update/bulk?dataset_id={ds_id}",
+                                  json={"rows": rows, "column": "rate", "values": values}), "bulk")
+            else:
+                rows, values = rows[:1], values[:1]
+                check(client.post(f"/api/data/update?dataset_id={ds_id}",
+                                  json={"row": rows[0], "column": "rate", "value": str(values[0])}), "update")
+            with lock:
+                written.update(zip(rows, values))
+
+    def reader():
+        for _ in range(EDITS_PER_THREAD // 2):
+            page = check(client.get(f"/api/preview/rows?offset=0&limit=50&dataset_id={ds_id}"), "preview").json()
+            if page.get("rows") and set(page["rows"][0]) != set(page["columns"]):
+                with lock:
+                    errors.append("preview: page mixes two column sets")
+            check(client.get(f"/api/preview/stats?dataset_id={ds_id}"), "stats")
+
+    def syncer():
+        for k in range(10):
+            rows = pd.DataFrame({"well": f"S-{k:05d}", "rate": [3.0, 2.0, 1.0],
+                                 "date": pd.date_range("2010-01-01", periods=3, freq="MS")})
+            r = check(client.post(f"/api/sync/upload?dataset_id={ds_id}&mode=append&key=well,date",
+                                  files={"file": ("sync.csv", rows.to_csv(index=False).encode(), "text/csv")}),
+                      "sync")
+            if r.status_code == 200:
+                with lock:
+                    appended[0] += r.json()["rows_added"]
+
+    def other_dataset():
+        others = [upload(field_frame(wells=20, months=24, seed=seed + 1), "other.csv") for seed in range(2)]
+        for i in range(EDITS_PER_THREAD):   # frames of other datasets compete for the budget
+            check(client.post(f"/api/data/update?dataset_id={others[i % 2]}",
+                              json={"row": i, "column": "rate", "value": "1.5"}), "other")
+
+    threads = [threading.Thread(target=editor, args=(k,)) for k in range(THREADS)]
+    threads += [threading.Thread(target=reader) for _ in range(2)]
+    threads += [threading.Thread(target=syncer), threading.Thread(target=other_dataset)]
+    _run(threads)
+
+    assert errors == []
+    assert appended[0] == 30
+    frame = main._get_frame(ds_id)
+    assert len(frame) == n_rows + appended[0]
+    assert {row: frame["rate"].iat[row] for row in written} == written
+
+    # what is on disk after the periodic flush agrees with memory
+    main._flush_edit_logs()
+    main._flush_dirty_frames()
+    stored = main._handles[ds_id].read()
+    assert len(stored) == len(frame)
+    assert {row: stored["rate"].iat[row] for row in written} == written
+
+
+def test_reload_waits_for_concurrent_edits(client, upload, storage):
+    base = field_frame(wells=10, months=12)
+    ds_id = upload(base)
+    extra = field_frame(wells=12, months=12).iloc[len(base):]
+    source = storage / "source.csv"
+    pd.concat([base, extra]).to_csv(source, index=False)
+    main._datasets[ds_id]["disk_path"] = str(source)
+    results = {}
+
+    def editor():
+        for row in range(0, 60, 3):
+            r = client.post(f"/api/data/update?dataset_id={ds_id}",
+                            json={"row": row, "column": "rate", "value": "7.5"})
+            results.setdefault("edit", []).append(r.status_code)
+
+    def reloader():
+        r = client.get(f"/api/reload?dataset_id={ds_id}&mode=append&key=well,date")
+        results["reload"] = (r.status_code, r.json())
+
+    _run([threading.Thread(target=editor), threading.Thread(target=reloader)])
+
+    status, body = results["reload"]
+    assert status == 200
+    assert body["rows_added"] == len(extra)
+    assert set(results["edit"]) == {200}
+    frame = main._get_frame(ds_id)
+    assert len(frame) == len(base) + len(extra)
+    assert (frame["rate"].iloc[0:60:3] == 7.5).all()
+
+
+def _timed_get(client, url):
+    start = time.perf_counter()
+    r = client.get(url)
+    return r.status_code, time.perf_counter() - start
+
+
+def test_long_sync_does_not_block_readers(client, upload, monkeypatch):
+    a = upload(field_frame(wells=10, months=12))
+    b = upload(field_frame(wells=5, months=12, seed=1), "other.csv")
+    write_delta = main._write_delta_object
+
+    def slow_write_delta(*args):
+        time.sleep(LONG_WRITE)
+        return write_delta(*args)
+
+    monkeypatch.setattr(main, "_write_delta_object", slow_write_delta)
+    rows = pd.DataFrame({"well": "N-00000", "rate": [3.0, 2.0, 1.0],
+                         "date": pd.date_range("2010-01-01", periods=3, freq="MS")})
+    results = {}
+
+    def syncer():
+        results["sync"] = client.post(f"/api/sync/upload?dataset_id={a}&mode=append&key=well,date",
+                                      files={"file": ("sync.csv", rows.to_csv(index=False).encode(), "text/csv")})
+
+    sync = threading.Thread(target=syncer)
+    sync.start()
+    time.sleep(0.3)   # the delta write is under way
+    same = _timed_get(client, f"/api/columns?dataset_id={a}")
+    other = _timed_get(client, f"/api/columns?dataset_id={b}")
+    sync.join()
+
+    assert same[0] == other[0] == 200
+    assert same[1] < FAST and other[1] < FAST
+    assert results["sync"].status_code == 200
+    assert results["sync"].json()["rows_added"] == 3
+
+
+def test_lock_wait_does_not_block_the_event_loop(client, upload):
+    a = upload(field_frame(wells=10, months=12))
+    b = upload(field_frame(wells=5, months=12, seed=1), "other.csv")
+    held, release = threading.Event(), threading.Event()
+    results = {}
+
+    def writer():
+        with main._dataset_lock(a).write():
+            held.set()
+            release.wait(5)
+
+    def reader():
+        results["a"] = client.get(f"/api/columns?dataset_id={a}").status_code
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    threads[0].start()
+    held.wait(5)
+    threads[1].start()
+    time.sleep(0.2)   # the reader is waiting for the lock
+    other = _timed_get(client, f"/api/columns?dataset_id={b}")
+    waiting = threads[1].is_alive()
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert other[0] == 200 and other[1] < FAST
+    assert waiting and results["a"] == 200
+
+
+def test_slow_edit_log_does_not_block_the_event_loop(client, upload, monkeypatch):
+    a = upload(field_frame(wells=10, months=12))
+    b = upload(field_frame(wells=5, months=12, seed=1), "other.csv")
+    log_edits = main._log_cell_edits
+
+    def slow_log_edits(*args):
+        time.sleep(LONG_WRITE)   # a slow fsync
+        return log_edits(*args)
+
+    monkeypatch.setattr(main, "_log_cell_edits", slow_log_edits)
+    results = {}
+
+    def editor():
+        results["edit"] = client.post(f"/api/data/update/bulk?dataset_id={a}",
+                                      json={"rows": [0, 1], "column": "rate", "values": [1.0, 2.0]})
+
+    edit = threading.Thread(target=editor)
+    edit.start()
+    time.sleep(0.3)   # the log append is under way
+    other = _timed_get(client, f"/api/columns?dataset_id={b}")
+    edit.join()
+
+    assert other[0] == 200 and other[1] < FAST
+    assert results["edit"].status_code == 200
+    assert main._get_frame(a)["rate"].iloc[:2].tolist() == [1.0, 2.0]
@@ -0,0 +1,120 @@
+import io
+import json
+import time
+
+import numpy as np
+import pyarrow.parquet as pq
+
+import main
+from conftest import field_frame
+
+WELLS = 10
+JOB = {"x": "date", "y": "rate", "well_col": "well", "model": "exponential"}
+
+
+def _wait_finished(client, job_id: str) -> dict:
+    for _ in range(400):
+        status = client.get(f"/api/dca/jobs/{job_id}").json()
+        if status["finished"] is not None:
+            return status
+        time.sleep(0.025)
+    raise AssertionError(f"DCA job {job_id} did not finish")
+
+
+def _ndjson(text: str) -> list:
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def _sse(text: str) -> list:
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_job_streams_every_well_and_writes_the_result(client, upload, monkeypatch):
+    monkeypatch.setattr(main, "DCA_JOB_BATCH", 4)   # 3 batches
+    ds_id = upload(field_frame(wells=WELLS, months=24))
+    r = client.post(f"/api/dca/jobs?dataset_id={ds_id}", json={**JOB, "econ_limit": 50.0})
+    assert r.status_code == 200, r.text
+    job = r.json()
+    assert job["wells_total"] == WELLS and job["status"] in ("queued", "running")
+
+    lines = _ndjson(client.get(f"/api/dca/jobs/{job['id']}/stream").text)
+    wells = [line for line in lines if line["type"] == "well"]
+    assert [w["well"] for w in wells] == [f"W-{i:05d}" for i in range(WELLS)]
+    assert [line["wells_done"] for line in lines if line["type"] == "progress"][-1] == WELLS
+    assert lines[-1]["type"] == "status" and lines[-1]["status"] == "done"
+    assert _wait_finished(client, job["id"])["progress"] == 1.0
+
+    # each well matches an interactive fit of the same series
+    single = client.get(f"/api/dca?x=date&y=rate&well_col=well&wells=W-00003&dataset_id={ds_id}").json()
+    params = single["wells"][0]["params"]
+    assert np.isclose(wells[3]["qi"], params["qi"]) and np.isclose(wells[3]["di"], params["di"])
+    assert wells[3]["points"] == 24
+
+    r = client.get(f"/api/dca/jobs/{job['id']}/result")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(r.content))
+    assert table.column_names == ["well", "points", "qi", "di", "cum_actual", "remaining", "eur",
+                                  "t_end", "t_switch"]
+    rows = table.to_pylist()
+    assert [row["well"] for row in rows] == [w["well"] for w in wells]
+    np.testing.assert_allclose([row["eur"] for row in rows], [w["eur"] for w in wells])
+
+
+def test_sse_stream_resumes_after_last_event_id(client, upload, monkeypatch):
+    monkeypatch.setattr(main, "DCA_JOB_BATCH", 3)
+    ds_id = upload(field_frame(wells=WELLS, months=12))
+    wells = ["W-00001", "W-00004", "W-00007", "W-00009"]
+    job = client.post(f"/api/dca/jobs?dataset_id={ds_id}", json={**JOB, "wells": wells}).json()
+    assert job["wells_total"] == 4
+    r = client.get(f"/api/dca/jobs/{job['id']}/stream?format=sse")
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _sse(r.text)
+    assert [(i, d["well"]) for i, kind, d in events if kind == "well"] == [
+        (str(k), w) for k, w in enumerate(wells)]
+    assert events[-1][1] == "status" and events[-1][2]["status"] == "done"
+
+    resumed = _sse(client.get(f"/api/dca/jobs/{job['id']}/stream?format=sse",
+                              headers={"Last-Event-ID": "1"}).text)
+    assert [d["well"] for _, kind, d in resumed if kind == "well"] == wells[2:]
+    assert _ndjson(client.get(f"/api/dca/jobs/{job['id']}/stream?offset=4").text)[-1]["type"] == "status"
+
+
+def test_cancel_stops_a_running_job(client, upload, monkeypatch):
+    monkeypatch.setattr(main, "DCA_JOB_BATCH", 1)
+    prepare = main._prepare_dca_batch
+
+    def slow_prepare(*args):
+        time.sleep(0.05)
+        return prepare(*args)
+
+    monkeypatch.setattr(main, "_prepare_dca_batch", slow_prepare)
+    ds_id = upload(field_frame(wells=40, months=12))
+    job = client.post(f"/api/dca/jobs?dataset_id={ds_id}", json=JOB).json()
+    time.sleep(0.2)
+
+    r = client.delete(f"/api/dca/jobs/{job['id']}")
+    assert r.status_code == 200
+    status = r.json()
+    assert status["status"] == "cancelled" and status["finished"] is not None
+    assert 0 < status["wells_done"] < 40
+    lines = _ndjson(client.get(f"/api/dca/jobs/{job['id']}/stream").text)
+    assert len([line for line in lines if line["type"] == "well"]) == status["wells_done"]
+    assert lines[-1] == {"type": "status", **status}
+    assert client.get(f"/api/dca/jobs/{job['id']}/result").status_code == 409
+    assert client.delete(f"/api/dca/jobs/{job['id']}").json()["status"] == "cancelled"
+    assert [j["id"] for j in client.get(f"/api/dca/jobs?dataset_id={ds_id}").json()["jobs"]] == [job["id"]]
+
+
+def test_job_requests_are_validated(client, upload):
+    ds_id = upload(field_frame(wells=2, months=12))
+    assert client.post(f"/api/dca/jobs?dataset_id={ds_id}", json={**JOB, "model": "linear"}).status_code == 400
+    assert client.post(f"/api/dca/jobs?dataset_id={ds_id}", json={**JOB, "y": "oil"}).status_code == 400
+    assert client.post(f"/api/dca/jobs?dataset_id={ds_id}", json={**JOB, "d_min": 0}).status_code == 400
+    assert client.get("/api/dca/jobs/nope").status_code == 404
+    assert client.get("/api/dca/jobs/nope/result").status_code == 404
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from scipy.integrate import quad
+
+import main
+
+MODELS = list(main._MODELS)
+
+
+def _noisy_wells(n_wells: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    series = []
+    for _ in range(n_wells):
+        n = int(rng.integers(12, 120))
+        t = np.arange(n) * main.DAYS_PER_MONTH
+        qi, di, b = rng.uniform(100, 5000), rng.uniform(1e-4, 5e-3), rng.uniform(0.1, 1.5)
+        q = main._hyperbolic(t, qi, di, b) * (1 + 0.05 * rng.standard_normal(n))
+        series.append((t, np.maximum(q, 0)))
+    return series
+
+
+@pytest.mark.parametrize("model", MODELS)
+def test_batched_fit_matches_scipy(model):
+    series = _noisy_wells(60)
+    batched = main._fit_decline_batch(series, model)
+    for (t, q), got in zip(series, batched):
+        ref = main._fit_decline(t, q, model)
+        assert got.keys() == ref.keys()
+        for name in ref:
+            assert got[name] == pytest.approx(ref[name], rel=2e-3, abs=1e-9)
+
+
+@pytest.mark.parametrize("model", MODELS)
+def test_fit_pinned_to_a_bound_falls_back_to_scipy(model, monkeypatch):
+    t = np.arange(24) * main.DAYS_PER_MONTH
+    rising = 100 + 2 * np.arange(24.0)   # best decline is di -> 0, on the lower bound
+    func, _, p0, _, _ = main._MODELS[model]
+    declining = func(t, 1000.0, 2e-3, *p0[2:])
+    calls = []
+    fit_decline = main._fit_decline
+
+    def spy(t, q, model_name):
+        calls.append(len(t))
+        return fit_decline(t, q, model_name)
+
+    monkeypatch.setattr(main, "_fit_decline", spy)
+    got = main._fit_decline_batch([(t[:20], declining[:20]), (t, rising)], model)
+    assert calls == [24]   # only the pinned well went to scipy
+    assert got[1] == fit_decline(t, rising, model)
+    assert got[0]["di"] == pytest.approx(2e-3, rel=1e-6)
+
+
+PARAMS = {
+    "exponential": [[1000.0, 2e-3], [50.0, 1e-4]],
+    "hyperbolic": [[1000.0, 5e-3, 0.5], [800.0, 2e-3, 1.0], [300.0, 1e-2, 1.8], [90.0, 1e-3, 0.05]],
+    "harmonic": [[1000.0, 2e-3], [400.0, 5e-2]],
+}
+
+
+def _integral(model, P, a, b, d_min):
+    rate = lambda x: main._decline_rates(model, P, np.array([[x]]), d_min)[0, 0]   # noqa: E731
+    return quad(rate, a, b, limit=500)[0]
+
+
+@pytest.mark.parametrize("d_min", [None, 1e-4])
+@pytest.mark.parametrize("model", MODELS)
+def test_closed_form_cumulative_matches_integration(model, d_min):
+    for params in PARAMS[model]:
+        P = np.array([params])
+        t_sw, _ = main._terminal_switch(model, P, d_min)
+        for t in (30.0, 3650.0, 20000.0):
+            expected = _integral(model, P, 0, min(t, t_sw[0]), d_min)
+            if t > t_sw[0]:
+                expected += _integral(model, P, t_sw[0], t, d_min)
+            got = main._decline_cumulative(model, P, np.array([t]), d_min)[0]
+            assert got == pytest.approx(expected, rel=1e-7)
+
+
+@pytest.mark.parametrize("d_min", [None, 1e-4])
+@pytest.mark.parametrize("model", MODELS)
+def test_time_to_rate_inverts_the_rate(model, d_min):
+    P = np.array(PARAMS[model])
+    t = main._decline_time_to_rate(model, P, 5.0, d_min)
+    assert np.isfinite(t).all()
+    q = main._decline_rates(model, P, t[:, None], d_min)[:, 0]
+    assert q == pytest.approx(np.full(len(P), 5.0), rel=1e-9)
+
+
+@pytest.mark.parametrize("model", MODELS)
+def test_eur_is_production_until_the_economic_limit(model):
+    P = np.array(PARAMS[model])
+    t_last = np.full(len(P), 720.0)
+    cum_actual = np.arange(len(P), dtype=float) * 1000
+    d_min = 1e-4 if model != "exponential" else None
+    res = main._well_reserves(model, P, t_last, cum_actual, econ_limit=5.0, d_min=d_min)
+    for i in range(len(P)):
+        t_end = res["t_end"][i]
+        remaining = _integral(model, P[i:i + 1], 720.0, t_end, d_min)
+        if np.isfinite(res["t_switch"][i]) and 720.0 < res["t_switch"][i] < t_end:
+            remaining = (_integral(model, P[i:i + 1], 720.0, res["t_switch"][i], d_min)
+                         + _integral(model, P[i:i + 1], res["t_switch"][i], t_end, d_min))
+        assert res["remaining"][i] == pytest.approx(remaining, rel=1e-6)
+        assert res["eur"][i] == pytest.approx(cum_actual[i] + remaining, rel=1e-6)
+
+    # with a time cap the forecast stops there instead
+    capped = main._well_reserves(model, P, t_last, cum_actual, econ_limit=5.0, t_cap=365.0, d_min=d_min)
+    assert (capped["t_end"] <= t_last + 365.0).all()
+    assert (capped["remaining"] <= res["remaining"]).all()
@@ -0,0 +1,54 @@
+import numpy as np
+
+import main
+from conftest import field_frame
+
+MONTHS = 600
+SPIKE, SHUT_IN = 217, 431
+
+
+def _series_url(ds_id: str, **params) -> str:
+    query = "".join(f"&{k}={v}" for k, v in params.items())
+    return f"/api/dca?x=date&y=rate&well_col=well&wells=W-00000&dataset_id={ds_id}{query}"
+
+
+def test_downsample_indices_keep_extremes_and_endpoints():
+    rng = np.random.default_rng(3)
+    y = rng.normal(100, 5, 1000)
+    y[[0, 999]] = 100.0
+    y[123], y[777] = 500.0, 0.0
+    index = main._downsample_indices(y, 100, np.array([5, 6]))
+    assert len(index) <= 100 + 2
+    assert np.all(np.diff(index) > 0)
+    assert {0, 999, 123, 777, 5, 6} <= set(index.tolist())
+    assert main._downsample_indices(y[:80], 100, np.array([], dtype=int)).tolist() == list(range(80))
+
+
+def test_dca_max_points_maps_back_to_the_full_series(client, upload):
+    df = field_frame(wells=1, months=MONTHS)
+    df.loc[SPIKE, "rate"] *= 4
+    df.loc[SHUT_IN, "rate"] = 0.0
+    ds_id = upload(df)
+    full = client.get(_series_url(ds_id, exclude_indices="3,300")).json()["wells"][0]
+    r = client.get(_series_url(ds_id, exclude_indices="3,300", max_points=60))
+    assert r.status_code == 200
+    sampled = r.json()["wells"][0]
+
+    index = np.array(sampled["index"])
+    assert len(index) <= 60 + 2
+    assert np.all(np.diff(index) > 0)
+    assert {0, MONTHS - 1, SPIKE, SHUT_IN, 3, 300} <= set(index.tolist())
+    # every returned point is the original point at its index
+    assert sampled["x"] == [full["x"][i] for i in index]
+    np.testing.assert_allclose(sampled["t"], np.asarray(full["t"])[index])
+    np.testing.assert_allclose(sampled["y_actual"], np.asarray(full["y_actual"])[index])
+    # the fit still uses every point
+    assert sampled["params"] == full["params"]
+    fitted = np.array([np.nan if v is None else v for v in full["y_fitted"]])
+    np.testing.assert_allclose([np.nan if v is None else v for v in sampled["y_fitted"]], fitted[index])
+
+    # an index from the sampled series excludes that original point
+    again = client.get(_series_url(ds_id, exclude_indices=f"3,300,{SPIKE}", max_points=60)).json()["wells"][0]
+    assert again["excluded_indices"] == [3, SPIKE, 300]
+    assert again["params"] != full["params"]
+    assert "index" not in full
@@ -0,0 +1,67 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import main
+from conftest import field_frame
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_fit_cache_file_is_appended_per_request_and_compacted(client, upload, storage, monkeypatch):
+    monkeypatch.setattr(main, "FIT_CACHE_SIZE", 4)
+    monkeypatch.setattr(main, "FIT_CACHE_COMPACT_LINES", 8)
+    ds_id = upload(field_frame(wells=3, months=24))
+    path = storage / ds_id / "fit_cache.jsonl"
+    url = f"/api/dca?x=date&y=rate&well_col=well&wells=W-00000,W-00001,W-00002&dataset_id={ds_id}"
+
+    assert client.get(url + "&model=exponential").status_code == 200
+    assert len(_lines(path)) == 3
+
+    # a restart reads the disk tier back instead of refitting
+    main._fit_cache.clear()
+    main._fit_cache_disk.pop(ds_id)
+    before = dict(main._fit_cache_stats)
+    assert client.get(url + "&model=exponential").status_code == 200
+    assert main._fit_cache_stats["disk_hits"] - before["disk_hits"] == 3
+    assert len(_lines(path)) == 3
+
+    assert client.get(url + "&model=harmonic").status_code == 200
+    assert len(_lines(path)) == 6
+    # 6 + 3 lines pass the threshold: only the newest FIT_CACHE_SIZE entries stay
+    assert client.get(url + "&model=hyperbolic").status_code == 200
+    records = _lines(path)
+    assert len(records) == 4
+    assert list(main._fit_cache_disk[ds_id]) == [r["key"] for r in records]
+
+    main._invalidate_fit_cache(ds_id)
+    assert not path.exists()
+
+
+def test_compaction_writes_without_the_lock_and_keeps_late_appends(storage, monkeypatch):
+    monkeypatch.setattr(main, "FIT_CACHE_SIZE", 4)
+    monkeypatch.setattr(main, "FIT_CACHE_COMPACT_LINES", 8)
+    (storage / "ds").mkdir()
+    path = storage / "ds" / "fit_cache.jsonl"
+    main._fit_cache_persist("ds", {f"k{i}": {"qi": i} for i in range(8)})
+    assert len(_lines(path)) == 8
+    unlocked = []
+
+    def dumps(obj):
+        if "ds" in main._fit_cache_compacting and not main._fit_cache_lock.locked():
+            if not unlocked:   # another request appends while the copy is written
+                late = threading.Thread(target=main._fit_cache_persist, args=("ds", {"late": {"qi": -1}}))
+                late.start()
+                late.join(5)
+            unlocked.append(obj["key"])
+        return json.dumps(obj)
+
+    monkeypatch.setattr(main, "json", SimpleNamespace(dumps=dumps, loads=json.loads))
+    main._fit_cache_persist("ds", {"k8": {"qi": 8}})
+
+    assert unlocked == ["k5", "k6", "k7", "k8"]
+    assert [r["key"] for r in _lines(path)] == ["k5", "k6", "k7", "k8", "late"]
+    assert main._fit_cache_lines["ds"] == 5
+    assert "ds" not in main._fit_cache_compacting
@@ -0,0 +1,123 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from conftest import field_frame
+
+DCA = "/api/dca?x=date&y=rate&well_col=well&wells=W-00000,W-00002&forecast_months=6&exclude_indices=1,5"
+
+
+def _decode_packed(content: bytes) -> dict:
+    """The layout decodeDCABinary in static/app.js reads: a little-endian
+    uint32 header length, the JSON header, padding to 8 bytes, then float64s;
+    header["buffers"][i] is the [offset, length] of array i."""
+    (head_len,) = struct.unpack_from("<I", content, 0)
+    header = json.loads(content[4:4 + head_len])
+    body_start = -(-(4 + head_len) // 8) * 8
+    assert content[4 + head_len:body_start] == b" " * (body_start - 4 - head_len)
+    body = np.frombuffer(content, dtype="<f8", offset=body_start)
+    assert body_start + 8 * sum(n for _, n in header["buffers"]) == len(content)
+    for w in header["wells"]:
+        w["arrays"] = {name: body[off:off + n]
+                       for name, i in w["buffers"].items() for off, n in [header["buffers"][i]]}
+    return header
+
+
+def _dates(ms) -> list:
+    return pd.to_datetime(np.asarray(ms), unit="ms").strftime("%d.%m.%Y").tolist()
+
+
+def _floats(values) -> np.ndarray:
+    """JSON and Arrow carry NaN as null."""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _read_arrow(content: bytes) -> pa.Table:
+    return pa.ipc.open_stream(content).read_all()
+
+
+def test_dca_binary_matches_json(client, upload):
+    ds_id = upload(field_frame(wells=3, months=24))
+    url = f"{DCA}&dataset_id={ds_id}"
+    expected = client.get(url).json()
+    r = client.get(url, headers={"Accept": "application/octet-stream"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/octet-stream"
+    assert r.content == client.get(url + "&format=binary").content
+    packed = _decode_packed(r.content)
+
+    assert {k: packed[k] for k in ("x_label", "y_label", "model")} == \
+        {k: expected[k] for k in ("x_label", "y_label", "model")}
+    assert len(packed["wells"]) == len(expected["wells"]) == 2
+    for got, want in zip(packed["wells"], expected["wells"]):
+        a = got["arrays"]
+        assert got["well"] == want["well"] and got["params"] == want["params"]
+        assert got["equation"] == want["equation"]
+        assert got["is_date"] is True and got["excluded_indices"] == [1, 5]
+        assert _dates(a["x"]) == want["x"]
+        np.testing.assert_allclose(a["t"], want["t"])
+        np.testing.assert_allclose(a["y_actual"], want["y_actual"])
+        np.testing.assert_allclose(a["y_fitted"], _floats(want["y_fitted"]))
+        assert _dates(a["forecast_x"]) == want["forecast"]["x"]
+        np.testing.assert_allclose(a["forecast_t"], want["forecast"]["t"])
+        np.testing.assert_allclose(a["forecast_y"], want["forecast"]["y"])
+        assert "index" not in a
+
+
+def test_dca_arrow_matches_json(client, upload):
+    ds_id = upload(field_frame(wells=3, months=24))
+    url = f"{DCA}&dataset_id={ds_id}&econ_limit=50&max_points=8"
+    expected = client.get(url).json()
+    r = client.get(url, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert r.status_code == 200
+    table = _read_arrow(r.content)
+    meta = {k.decode(): v.decode() for k, v in table.schema.metadata.items()}
+    assert meta["model"] == "exponential" and meta["x_unit"] == "epoch_ms"
+    assert json.loads(meta["is_date"]) is True and json.loads(meta["excluded_indices"]) == [1, 5]
+    assert np.isclose(json.loads(meta["field_eur"]), expected["reserves"]["field_eur"])
+
+    rows = table.to_pylist()
+    assert [row["well"] for row in rows] == [w["well"] for w in expected["wells"]]
+    for row, want in zip(rows, expected["wells"]):
+        assert json.loads(row["params"]) == want["params"]
+        assert row["index"] == want["index"]
+        assert _dates(row["x"]) == want["x"]
+        np.testing.assert_allclose(row["t"], want["t"])
+        np.testing.assert_allclose(row["y_actual"], want["y_actual"])
+        np.testing.assert_allclose(_floats(row["y_fitted"]), _floats(want["y_fitted"]))
+        np.testing.assert_allclose(row["forecast_y"], want["forecast"]["y"])
+    np.testing.assert_allclose([row["eur"] for row in rows], expected["reserves"]["eur"])
+
+
+def test_dca_binary_keeps_index_and_missing_forecast(client, upload):
+    ds_id = upload(field_frame(wells=1, months=40))
+    url = f"/api/dca?x=date&y=rate&well_col=well&wells=W-00000&max_points=10&dataset_id={ds_id}"
+    want = client.get(url).json()["wells"][0]
+    got = _decode_packed(client.get(url + "&format=binary").content)["wells"][0]
+    assert got["arrays"]["index"].tolist() == want["index"]
+    assert not any(name.startswith("forecast") for name in got["buffers"])
+    assert want["forecast"] == {}
+
+
+def test_preview_rows_arrow_matches_json(client, upload):
+    ds_id = upload(field_frame(wells=4, months=12))
+    url = f"/api/preview/rows?offset=10&limit=20&sort_col=rate&sort_asc=false&dataset_id={ds_id}"
+    expected = client.get(url).json()
+    r = client.get(url + "&format=arrow")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = _read_arrow(r.content)
+    meta = {k.decode(): v.decode() for k, v in table.schema.metadata.items()}
+    assert meta == {"total": "48", "offset": "10", "limit": "20"}
+    assert table.column_names == expected["columns"]
+    rows = table.to_pylist()
+    assert [row["well"] for row in rows] == [row["well"] for row in expected["rows"]]
+    assert [row["date"] for row in rows] == [row["date"] for row in expected["rows"]]
+    np.testing.assert_allclose([row["rate"] for row in rows], [row["rate"] for row in expected["rows"]])
+
+    accepted = client.get(url, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert accepted.content == r.content
+    assert client.get(url + "&format=binary").status_code == 400
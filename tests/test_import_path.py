@@ -0,0 +1,26 @@
+import main
+from conftest import field_frame, wait_ready
+
+
+def test_import_path_disabled_without_root(client, monkeypatch):
+    monkeypatch.setattr(main, "IMPORT_ROOT", None)
+    assert client.post("/api/import/path", json={"path": "main.py"}).status_code == 404
+
+
+def test_import_path_below_root(client, upload, storage, tmp_path_factory, monkeypatch):
+    root = tmp_path_factory.mktemp("imports")
+    field_frame(wells=3, months=6).to_csv(root / "field.csv", index=False)
+    monkeypatch.setattr(main, "IMPORT_ROOT", root.resolve())
+
+    r = client.post("/api/import/path", json={"path": "field.csv"})
+    assert r.status_code == 200
+    status = wait_ready(client, r.json()["dataset_id"])
+    assert status["status"] == "ready" and status["rows"] == 18
+
+    assert client.post("/api/import/path", json={"path": "../x.csv"}).status_code == 403
+
+    # the app's own storage stays private even below the root
+    ds_id = upload(field_frame(wells=2, months=3))
+    monkeypatch.setattr(main, "IMPORT_ROOT", storage.resolve().parent)
+    r = client.post("/api/import/path", json={"path": f"{storage.name}/{ds_id}/data.parquet"})
+    assert r.status_code == 403
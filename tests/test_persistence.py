@@ -0,0 +1,132 @@
+import gzip
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import main
+from conftest import field_frame
+
+
+def _edit(client, ds_id, row, value):
+    r = client.post(f"/api/data/update?dataset_id={ds_id}", json={"row": row, "column": "rate", "value": value})
+    assert r.status_code == 200, r.text
+
+
+def test_logged_edits_survive_a_crash(client, upload, storage, restart):
+    ds_id = upload(field_frame(wells=5, months=12))
+    _edit(client, ds_id, 3, "11.25")
+    r = client.post(f"/api/data/update/bulk?dataset_id={ds_id}",
+                    json={"rows": [7, 8], "column": "rate", "values": [1.5, 2.5]})
+    assert r.status_code == 200, r.text
+    wal = storage / ds_id / main.EDIT_LOG_NAME
+    with open(wal, "a", encoding="utf-8") as f:
+        f.write('{"rows": [9], "colu')   # torn by the crash mid-write
+    versions = len(main._versions[ds_id])
+
+    restart()   # nothing was flushed: the edits exist only in the log
+    assert main._handles[ds_id].read()["rate"].iat[3] != 11.25
+    main._recover_edit_logs()
+
+    assert not wal.exists()
+    stored = main._handles[ds_id].read()
+    assert stored["rate"].iloc[[3, 7, 8]].tolist() == [11.25, 1.5, 2.5]
+    assert len(main._versions[ds_id]) == versions + 1
+
+
+def test_versions_survive_a_restart(client, upload, restart):
+    base = field_frame(wells=4, months=12)
+    ds_id = upload(base)
+    _edit(client, ds_id, 0, "42")
+    main._flush_edit_logs()
+    extra = field_frame(wells=5, months=12).iloc[len(base):]
+    r = client.post(f"/api/sync/upload?dataset_id={ds_id}&mode=append&key=well,date",
+                    files={"file": ("sync.csv", extra.to_csv(index=False).encode(), "text/csv")})
+    assert r.status_code == 200, r.text
+    before = client.get(f"/api/versions?dataset_id={ds_id}").json()
+    assert [v["rows"] for v in before["versions"]] == [len(base), len(base), len(base) + len(extra)]
+
+    restart()
+    assert client.get(f"/api/versions?dataset_id={ds_id}").json() == before
+    assert main._handles[ds_id].num_rows == len(base) + len(extra)
+
+    # every recorded version can still be restored
+    r = client.post(f"/api/versions/rollback?version=2&dataset_id={ds_id}")
+    assert r.status_code == 200, r.text
+    stored = main._handles[ds_id].read()
+    assert len(stored) == len(base) and stored["rate"].iat[0] == 42.0
+    r = client.post(f"/api/versions/rollback?version=1&dataset_id={ds_id}")
+    assert r.status_code == 200, r.text
+    assert main._handles[ds_id].read()["rate"].iat[0] == pytest.approx(base["rate"].iat[0])
+
+
+def test_replace_sync_leaves_stored_versions_intact(client, chunked_upload, storage):
+    base = field_frame(wells=3, months=6)
+    buf = io.BytesIO()
+    base.to_parquet(buf, index=False)
+    ds_id = chunked_upload(buf.getvalue(), "field.parquet")
+    objects = {p: p.read_bytes() for p in (storage / ds_id / "objects").iterdir()}
+
+    bigger = io.BytesIO()
+    field_frame(wells=5, months=6).to_parquet(bigger, index=False)
+    r = client.post(f"/api/sync/upload?dataset_id={ds_id}",
+                    files={"file": ("field.parquet", bigger.getvalue(), "application/octet-stream")})
+    assert r.status_code == 200 and r.json()["rows"] == 30
+    assert {p: p.read_bytes() for p in objects} == objects   # content-addressed objects never change
+
+    r = client.post(f"/api/versions/rollback?version=1&dataset_id={ds_id}")
+    assert r.status_code == 200, r.text
+    assert main._handles[ds_id].read()["rate"].tolist() == base["rate"].tolist()
+
+
+def _read_export(content: bytes, fmt: str, compression):
+    if fmt == "csv":
+        if compression == "gzip":
+            content = gzip.decompress(content)
+        elif compression == "zstd":
+            content = pa.input_stream(pa.py_buffer(content), compression="zstd").read()
+        return pd.read_csv(io.BytesIO(content))
+    if fmt == "parquet":
+        return pq.read_table(io.BytesIO(content)).to_pandas()
+    return pa.ipc.open_stream(content).read_all().to_pandas()
+
+
+@pytest.mark.parametrize("fmt,compression", [
+    ("csv", None), ("csv", "gzip"), ("csv", "zstd"),
+    ("parquet", None), ("parquet", "zstd"), ("arrow", None), ("arrow", "zstd"),
+])
+@pytest.mark.parametrize("loaded", [True, False])
+def test_export_row_counts(client, upload, monkeypatch, fmt, compression, loaded):
+    monkeypatch.setattr(main, "EXPORT_BATCH_ROWS", 100)   # several batches per export
+    base = field_frame(wells=30, months=12)
+    ds_id = upload(base)
+    _edit(client, ds_id, 2, "7")
+    if not loaded:
+        main._flush_dirty_frames()
+        main._set_frame(ds_id, None)   # exported straight from the Parquet handle
+    url = f"/api/data/export?dataset_id={ds_id}&format={fmt}" + (f"&compression={compression}" if compression else "")
+
+    got = _read_export(client.get(url).content, fmt, compression)
+    assert len(got) == len(base)
+    assert list(got.columns) == list(base.columns)
+    assert got["rate"].iat[2] == 7.0
+
+    view = _read_export(client.get(url + "&filter_col=well&filter_val=W-00003&columns=well,rate").content,
+                        fmt, compression)
+    assert len(view) == 12 and list(view.columns) == ["well", "rate"]
+
+
+def test_reload_reports_derived_column_replay_errors(client, upload, storage):
+    base = field_frame(wells=3, months=6)
+    ds_id = upload(base)
+    r = client.post(f"/api/data/add_column?dataset_id={ds_id}", json={"name": "r2", "formula": "rate * 2"})
+    assert r.status_code == 200, r.text
+    source = storage / "source.csv"
+    base.rename(columns={"rate": "oil"}).to_csv(source, index=False)
+    main._datasets[ds_id]["disk_path"] = str(source)
+
+    body = client.get(f"/api/reload?dataset_id={ds_id}").json()
+    assert [e["name"] for e in body["replay_errors"]] == ["r2"]
+    assert client.get(f"/api/dataset/{ds_id}/status").json()["replay_errors"] == body["replay_errors"]
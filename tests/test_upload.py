@@ -0,0 +1,129 @@
+import hashlib
+import io
+
+import numpy as np
+
+import main
+from conftest import field_frame, wait_ready
+
+CHUNK = 1024
+
+
+def _csv_bytes(wells=10, months=12):
+    df = field_frame(wells=wells, months=months)
+    return df, df.to_csv(index=False).encode()
+
+
+def _init(client, data: bytes, filename: str = "field.csv") -> tuple:
+    r = client.post("/api/upload/init", json={"filename": filename, "file_size": len(data), "chunk_size": CHUNK})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["total_chunks"] == -(-len(data) // CHUNK)
+    return body["dataset_id"], body["total_chunks"]
+
+
+def _send(client, ds_id: str, i: int, data: bytes, checksum: str = None):
+    url = f"/api/upload/chunk?dataset_id={ds_id}&chunk_index={i}"
+    if checksum:
+        url += f"&checksum={checksum}"
+    return client.post(url, files={"file": ("chunk", data)})
+
+
+def _chunk(data: bytes, i: int) -> bytes:
+    return data[i * CHUNK:(i + 1) * CHUNK]
+
+
+def _assert_imported(client, ds_id: str, df):
+    assert wait_ready(client, ds_id)["status"] == "ready"
+    frame = main._get_frame(ds_id)
+    assert len(frame) == len(df)
+    assert frame["well"].tolist() == df["well"].tolist()
+    np.testing.assert_allclose(frame["rate"].to_numpy(), df["rate"].to_numpy(), rtol=1e-12)
+    assert "date" in main._datasets[ds_id]["date_columns"]
+
+
+def test_chunks_out_of_order_and_duplicates(client):
+    df, data = _csv_bytes()
+    ds_id, n = _init(client, data)
+    assert n >= 3
+    for i in reversed(range(n)):
+        r = _send(client, ds_id, i, _chunk(data, i), hashlib.sha256(_chunk(data, i)).hexdigest())
+        assert r.status_code == 200, r.text
+        assert r.json()["duplicate"] is False
+    r = _send(client, ds_id, 0, b"x" * CHUNK)   # a re-sent chunk is ignored, whatever it holds
+    assert r.status_code == 200
+    assert r.json()["duplicate"] is True
+    assert r.json()["bytes_received"] == len(data)
+
+    assert client.post(f"/api/upload/finalize?dataset_id={ds_id}").status_code == 200
+    _assert_imported(client, ds_id, df)
+
+
+def test_wrong_chunk_length_is_rejected(client):
+    df, data = _csv_bytes()
+    ds_id, n = _init(client, data)
+    r = _send(client, ds_id, 1, _chunk(data, 1)[:-1])
+    assert r.status_code == 400
+    assert "must be 1024 bytes" in r.json()["detail"]
+    r = _send(client, ds_id, n - 1, _chunk(data, n - 1) + b"\n")   # the last chunk is short, not padded
+    assert r.status_code == 400
+    assert client.get(f"/api/dataset/{ds_id}/status").json()["missing_chunks"] == list(range(n))
+
+    for i in range(n):
+        assert _send(client, ds_id, i, _chunk(data, i)).status_code == 200
+    assert client.post(f"/api/upload/finalize?dataset_id={ds_id}").status_code == 200
+    _assert_imported(client, ds_id, df)
+
+
+def test_checksum_mismatch_asks_for_the_chunk_again(client):
+    df, data = _csv_bytes()
+    ds_id, n = _init(client, data)
+    r = _send(client, ds_id, 0, _chunk(data, 0), hashlib.sha256(b"other bytes").hexdigest())
+    assert r.status_code == 400
+    assert "Checksum mismatch" in r.json()["detail"]
+    status = client.get(f"/api/dataset/{ds_id}/status").json()
+    assert status["missing_chunks"] == list(range(n))
+    assert status["bytes_received"] == 0
+
+    for i in range(n):
+        assert _send(client, ds_id, i, _chunk(data, i), hashlib.sha256(_chunk(data, i)).hexdigest()).status_code == 200
+    assert client.post(f"/api/upload/finalize?dataset_id={ds_id}").status_code == 200
+    _assert_imported(client, ds_id, df)
+
+
+def test_finalize_lists_missing_and_damaged_chunks_until_resent(client):
+    df, data = _csv_bytes()
+    ds_id, n = _init(client, data)
+    for i in range(n):
+        if i != 1:
+            assert _send(client, ds_id, i, _chunk(data, i)).status_code == 200
+
+    r = client.post(f"/api/upload/finalize?dataset_id={ds_id}")
+    assert r.status_code == 409
+    assert r.json()["detail"]["missing_chunks"] == [1]
+    assert client.get(f"/api/dataset/{ds_id}/status").json()["missing_chunks"] == [1]
+    assert _send(client, ds_id, 1, _chunk(data, 1)).status_code == 200
+
+    # bytes damaged on disk after they were received fail verification
+    with open(main._datasets[ds_id]["raw_path"], "r+b") as f:
+        f.seek(2 * CHUNK + 10)
+        f.write(b"#")
+    r = client.post(f"/api/upload/finalize?dataset_id={ds_id}")
+    assert r.status_code == 409
+    assert r.json()["detail"]["missing_chunks"] == [2]
+    status = client.get(f"/api/dataset/{ds_id}/status").json()
+    assert status["status"] == "uploading"
+    assert status["missing_chunks"] == [2]
+
+    assert _send(client, ds_id, 2, _chunk(data, 2)).json()["duplicate"] is False
+    assert client.post(f"/api/upload/finalize?dataset_id={ds_id}").status_code == 200
+    _assert_imported(client, ds_id, df)
+
+
+def test_parquet_upload_through_chunks(client, chunked_upload):
+    df = field_frame(wells=10, months=12)
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    ds_id = chunked_upload(buf.getvalue(), "field.parquet", chunk_size=CHUNK)
+    _assert_imported(client, ds_id, df)
+    assert main._datasets[ds_id]["suffix"] == ".parquet"
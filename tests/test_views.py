@@ -0,0 +1,81 @@
+import pandas as pd
+
+import main
+from conftest import field_frame
+
+SORTED = {"sort_col": "rate", "sort_asc": "false"}
+FILTERED = {"filter_col": "well", "filter_val": "w-00001"}
+
+
+def _page(client, ds_id: str, **params) -> dict:
+    query = "".join(f"&{k}={v}" for k, v in params.items())
+    r = client.get(f"/api/preview/rows?offset=0&limit=50&dataset_id={ds_id}{query}")
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _sync(client, ds_id: str, rows: pd.DataFrame) -> dict:
+    r = client.post(f"/api/sync/upload?dataset_id={ds_id}&mode=append&key=well,date",
+                    files={"file": ("sync.csv", rows.to_csv(index=False).encode(), "text/csv")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_edits_show_up_in_cached_views(client, upload):
+    df = field_frame(wells=5, months=12)
+    ds_id = upload(df)
+    assert _page(client, ds_id, **SORTED)["rows"][0]["rate"] == df["rate"].max()
+    assert _page(client, ds_id, **FILTERED)["total"] == 12
+
+    r = client.post(f"/api/data/update?dataset_id={ds_id}", json={"row": 40, "column": "rate", "value": "99999"})
+    assert r.status_code == 200
+    top = _page(client, ds_id, **SORTED)["rows"][0]
+    assert (top["well"], top["rate"]) == (df["well"][40], 99999.0)
+    # the well filter does not read the rate column: its view stays cached
+    assert any(k[0] == ds_id and k[1] == "filter" for k in main._views)
+
+    r = client.post(f"/api/data/update/bulk?dataset_id={ds_id}",
+                    json={"rows": [50, 51], "column": "well", "values": ["W-00001", "W-00001"]})
+    assert r.status_code == 200
+    filtered = _page(client, ds_id, **FILTERED)
+    assert filtered["total"] == 14
+    assert [row["date"] for row in filtered["rows"][-2:]] == ["01.03.2010", "01.04.2010"]
+    both = _page(client, ds_id, **SORTED, **FILTERED)
+    assert both["total"] == 14
+    assert [row["rate"] for row in both["rows"]] == sorted((row["rate"] for row in both["rows"]), reverse=True)
+
+    data = client.get(f"/api/data?page=1&page_size=5&sort_col=rate&sort_asc=false&dataset_id={ds_id}").json()
+    assert data["rows"][0]["rate"] == 99999.0
+
+
+def test_appends_show_up_in_cached_views(client, upload):
+    ds_id = upload(field_frame(wells=5, months=12))
+    assert _page(client, ds_id, **FILTERED)["total"] == 12
+    before = _page(client, ds_id, **SORTED)["total"]
+
+    new = pd.DataFrame({"well": ["W-00001", "W-00001", "W-00009"],
+                        "date": pd.date_range("2011-01-01", periods=3, freq="MS"),
+                        "rate": [77777.0, 1.0, 88888.0]})
+    assert _sync(client, ds_id, new)["rows_added"] == 3
+
+    assert _page(client, ds_id, **FILTERED)["total"] == 14
+    ranked = _page(client, ds_id, **SORTED)
+    assert ranked["total"] == before + 3
+    assert [row["rate"] for row in ranked["rows"][:2]] == [88888.0, 77777.0]
+
+
+def test_rollback_shows_up_in_cached_views(client, upload):
+    df = field_frame(wells=5, months=12)
+    ds_id = upload(df)
+    original = _page(client, ds_id, **SORTED)["rows"]
+
+    new = pd.DataFrame({"well": ["W-00001"], "date": [pd.Timestamp("2011-01-01")], "rate": [77777.0]})
+    _sync(client, ds_id, new)
+    client.post(f"/api/data/update?dataset_id={ds_id}", json={"row": 3, "column": "well", "value": "W-00001"})
+    assert _page(client, ds_id, **SORTED)["rows"][0]["rate"] == 77777.0
+    assert _page(client, ds_id, **FILTERED)["total"] == 14
+
+    r = client.post(f"/api/versions/rollback?version=1&dataset_id={ds_id}")
+    assert r.status_code == 200, r.text
+    assert _page(client, ds_id, **SORTED)["rows"] == original
+    assert _page(client, ds_id, **FILTERED)["total"] == 12